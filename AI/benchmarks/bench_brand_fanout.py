@@ -0,0 +1,89 @@
+# Brand fan-out latency as the number of registered brands grows: one brand_collector task per brand (LangGraph Send)
+# vs collecting the brands one after another. Each brand source sleeps --source-latency; with --straggler one brand
+# takes far longer than the per-source timeout, and the run should still finish in about the timeout.
+# The LLM is FakeGeminiModel with no latency, so the numbers are collection + graph overhead.
+# Run from the AI/ directory:  python -m benchmarks.bench_brand_fanout --brands 3 10 30 60 --source-latency 0.05
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+os.environ.setdefault("SNEAKER_FAST_PATH_ENABLED", "0")
+
+import workflow
+from tools.agent_registry import set_gemini_model
+from tools.brand_registry import BrandRegistry, BrandSource, set_brand_registry
+from tools.collector import BrandCollectorAgent
+from benchmarks.fakes import FakeGeminiModel
+from benchmarks.synthetic import make_catalog
+
+class DelayedBrandSource(BrandSource):
+    """A brand behind a slow API: a fixed delay, then a few in-budget sneakers."""
+
+    def __init__(self, name, delay, seed, rows=5):
+        super().__init__(name)
+        self.delay = delay
+        self.sneakers = [{**sneaker, "brand": name, "name": f"{name} {sneaker['name']}", "gender": "male"}
+                         for sneaker in make_catalog(rows, seed=seed)]
+
+    def fetch(self, gender, min_price, max_price, facets=None):
+        time.sleep(self.delay)
+        return [s for s in self.sneakers if min_price <= s["price"] <= max_price]
+
+    async def afetch(self, gender, min_price, max_price, facets=None):
+        await asyncio.sleep(self.delay)
+        return [s for s in self.sneakers if min_price <= s["price"] <= max_price]
+
+def preferences_for(brands):
+    return {"preferred_brands": brands, "gender_age_group": "male", "budget_range": (0.0, 1000.0),
+            "style": "casual", "color": "black", "use_case": "daily wear"}
+
+def serial(brands):
+    # The pre-registry shape at its best: every brand collected in turn before aggregation
+    agent = BrandCollectorAgent()
+    preferences = preferences_for(brands)
+    for brand in brands:
+        agent.collect_brand({"user_preferences": preferences, "brand": brand})
+
+def fanout(brands):
+    result = workflow.run_sneaker_workflow(preferences_for(brands), "fake-key", use_cache=False)
+    assert result.get("recommendations"), result
+
+def afanout(brands):
+    result = asyncio.run(workflow.arun_sneaker_workflow(preferences_for(brands), "fake-key", use_cache=False))
+    assert result.get("recommendations"), result
+
+def median_time(fn, brands, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(brands)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Brand fan-out latency benchmark")
+    parser.add_argument("--brands", type=int, nargs="+", default=[3, 10, 30, 60])
+    parser.add_argument("--source-latency", type=float, default=0.05)
+    parser.add_argument("--straggler", type=float, default=0.0, help="Delay of one extra-slow brand (0: none)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # Collectors log per brand, and the straggler warns each run
+
+    set_gemini_model("fake-key", FakeGeminiModel(latency_seconds=0.0))
+    timeout = float(os.getenv("SNEAKER_COLLECT_TIMEOUT_SECONDS", "5"))
+    print(f"per-source timeout {timeout:g}s, max concurrency {os.getenv('SNEAKER_COLLECT_MAX_CONCURRENCY', '8')}")
+    print(f"{'brands':>7} {'serial (s)':>11} {'fan-out (s)':>12} {'async fan-out (s)':>18}")
+    for count in args.brands:
+        names = [f"Brand{i:02d}" for i in range(count)]
+        sources = [DelayedBrandSource(name, args.source_latency, seed=i) for i, name in enumerate(names)]
+        if args.straggler:
+            sources[-1].delay = args.straggler
+        set_brand_registry(BrandRegistry(sources))
+        print(f"{count:>7} {median_time(serial, names, args.runs):>11.3f} {median_time(fanout, names, args.runs):>12.3f} "
+              f"{median_time(afanout, names, args.runs):>18.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Compares the old per-brand linear scan with CatalogIndex range lookups.
+# Run from the AI/ directory:  python -m benchmarks.bench_catalog_index [--sizes 1000 100000 1000000]
+import argparse
+import random
+import time
+from typing import List
+
+from tools.catalog_index import CatalogIndex
+from tools.state_management import Sneaker
+from benchmarks.synthetic import BRANDS, GENDERS, make_catalog
+
+def linear_scan(catalog: List[Sneaker], brand: str, gender: str, min_price: float, max_price: float) -> List[Sneaker]:
+    # Same loop the collectors ran before the index existed (one brand list per collector)
+    collected = []
+    for sneaker in catalog:
+        if sneaker["brand"] == brand and sneaker["gender"] == gender and min_price <= sneaker["price"] <= max_price:
+            collected.append(sneaker)
+    return collected
+
+def time_queries(fn, queries, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in queries:
+            fn(*q)
+    return (time.perf_counter() - start) / (repeat * len(queries))
+
+def main():
+    parser = argparse.ArgumentParser(description="CatalogIndex vs linear scan")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    queries = []
+    for _ in range(args.queries):
+        low = rng.uniform(20.0, 400.0)
+        queries.append((rng.choice(BRANDS), rng.choice(GENDERS), low, low + rng.uniform(10.0, 150.0)))
+
+    print(f"{'rows':>10} {'build (ms)':>12} {'scan (us/q)':>14} {'index (us/q)':>14} {'speedup':>9}")
+    for size in args.sizes:
+        catalog = make_catalog(size)
+        # Each collector only scanned its own brand list, so give the scan the same advantage
+        per_brand = {brand: [s for s in catalog if s["brand"] == brand] for brand in BRANDS}
+
+        start = time.perf_counter()
+        index = CatalogIndex(catalog)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for q in queries:
+            assert sorted(s["name"] for s in index.query(*q)) == sorted(s["name"] for s in linear_scan(per_brand[q[0]], *q))
+
+        repeat = max(1, 200_000 // size)
+        scan_s = time_queries(lambda b, g, lo, hi: linear_scan(per_brand[b], b, g, lo, hi), queries, repeat)
+        index_s = time_queries(index.query, queries, repeat * 10)
+        print(f"{size:>10} {build_ms:>12.1f} {scan_s * 1e6:>14.1f} {index_s * 1e6:>14.1f} {scan_s / index_s:>8.0f}x")
+
+if __name__ == "__main__":
+    main()
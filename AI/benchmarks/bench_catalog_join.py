@@ -0,0 +1,53 @@
+# Joining LLM picks back to the catalog: the old linear next(...) scan per pick vs the aggregator's keyed index.
+# Picks are taken from the end of the candidate list, the scan's worst case (and where hallucinations end up too).
+# Run from the AI/ directory:  python -m benchmarks.bench_catalog_join --sizes 1000 100000 1000000
+import argparse
+import logging
+import time
+
+from tools.aggregator import build_sneaker_index
+from tools.general_agent import GeneralAgent
+from benchmarks.synthetic import make_catalog
+
+def linear_join(llm_recommendations, candidates):
+    # The join as it was: one full scan of the candidates per recommendation
+    joined = []
+    for rec in llm_recommendations:
+        original = next((s for s in candidates if s["name"] == rec["name"] and s["brand"] == rec["brand"]), None)
+        joined.append((rec, original))
+    return joined
+
+def picks_for(candidates, count):
+    picks = [{"name": s["name"], "brand": s["brand"], "price": s["price"], "url": s["url"], "reason": "fits"}
+             for s in candidates[-count:]]
+    picks.append({"name": "Imaginary Runner", "brand": "Nike", "price": 99.0, "url": "https://example.com/none", "reason": "fits"})
+    return picks
+
+def best_of(fn, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommendation-to-catalog join benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--picks", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("tools.general_agent").setLevel(logging.ERROR)  # The hallucinated pick is dropped with a warning each run
+    agent = GeneralAgent("fake-key", model=object())
+    print(f"{'candidates':>10} {'scan (ms)':>10} {'index build (ms)':>17} {'index join (ms)':>16} {'speedup':>8}")
+    for size in args.sizes:
+        candidates = make_catalog(size)
+        picks = picks_for(candidates, args.picks)
+        scan = best_of(lambda: linear_join(picks, candidates))
+        build = best_of(lambda: build_sneaker_index(candidates), repeats=2)  # Paid once, inside the aggregator's dedup pass
+        index = build_sneaker_index(candidates)
+        join = best_of(lambda: agent._validate_recommendations(picks, index))
+        print(f"{size:>10} {scan * 1000:>10.2f} {build * 1000:>17.2f} {join * 1000:>16.4f} {scan / join:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
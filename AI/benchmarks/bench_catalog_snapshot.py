@@ -0,0 +1,133 @@
+# In-process catalog snapshot vs querying SQLite per fetch, while a writer keeps changing the catalog.
+#   reads    - collector-style fetches from reader threads: SQLSneakerSource vs SnapshotSneakerSource, with the
+#              snapshot's listener (SQLite: polling) swapping in each writer batch as it lands
+#   refresh  - cost of catching up on --batch changed rows (delta) vs reloading the whole catalog (full)
+# Staleness is how long a committed change took to show up in the snapshot (bounded by --poll).
+# Run from the AI/ directory:  python -m benchmarks.bench_catalog_snapshot --rows 100000 --seconds 5
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from threading import Event, Thread
+
+from tools.catalog_snapshot import create_snapshot_source
+from tools.data_source import SQLSneakerSource, create_sqlite_catalog
+from tools.tracing import CATALOG_SWAPS
+from benchmarks.synthetic import BRANDS, GENDERS, make_catalog
+
+def random_query(rng):
+    low = rng.uniform(20.0, 400.0)
+    return rng.choice(BRANDS), rng.choice(GENDERS), low, low + rng.uniform(10.0, 150.0)
+
+def writer(pool, rows, batch, interval, stop, commits):
+    # Batches of price updates and a delete + insert, like an ingest touching a few products at a time
+    rng = random.Random(11)
+    conn = pool.getconn()
+    try:
+        while not stop.wait(interval):
+            ids = [rng.randint(1, rows) for _ in range(batch)]
+            conn.executemany("UPDATE shoes SET price = price + 1 WHERE id = ?", [(i,) for i in ids])
+            conn.execute("DELETE FROM shoes WHERE id = (SELECT MAX(id) FROM shoes)")
+            conn.execute("INSERT INTO shoes (brand, name, price, url, gender, description, image_url) "
+                         "VALUES (?, 'Bench Runner', ?, ?, ?, '', '')",
+                         (rng.choice(BRANDS), rng.uniform(20.0, 400.0), f"bench-{time.time_ns()}", rng.choice(GENDERS)))
+            conn.commit()
+            version = conn.execute("SELECT value FROM shoes_change_seq WHERE id = 1").fetchone()[0]
+            commits.append((version, time.perf_counter()))
+    finally:
+        pool.putconn(conn)
+
+def reader(source, stop, latencies, seed):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        query = random_query(rng)
+        start = time.perf_counter()
+        source.fetch_sneakers(*query)
+        latencies.append(time.perf_counter() - start)
+
+def staleness(snapshot_source, commits, stop, lags):
+    # Polls the snapshot version and records when each committed version became visible
+    pending = 0
+    while not stop.is_set() or pending < len(commits):
+        version = snapshot_source.catalog_version
+        while pending < len(commits) and commits[pending][0] <= version:
+            lags.append(time.perf_counter() - commits[pending][1])
+            pending += 1
+        if stop.is_set() and pending < len(commits) and time.perf_counter() - commits[pending][1] > 5:
+            break
+        time.sleep(0.001)
+
+def measure_reads(name, source, snapshot_source, pool, args):
+    stop, commits, lags, per_thread = Event(), [], [], [[] for _ in range(args.readers)]
+    swaps = CATALOG_SWAPS.value(kind="delta")
+    threads = [Thread(target=reader, args=(source, stop, per_thread[i], i)) for i in range(args.readers)]
+    threads.append(Thread(target=writer, args=(pool, args.rows, args.batch, args.write_interval, stop, commits)))
+    watcher = Thread(target=staleness, args=(snapshot_source, commits, stop, lags))
+    for thread in threads + [watcher]:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads + [watcher]:
+        thread.join()
+    latencies = sorted(latency for thread_latencies in per_thread for latency in thread_latencies)
+    return {
+        "source": name,
+        "reads_per_s": len(latencies) / args.seconds,
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[int(0.99 * (len(latencies) - 1))] * 1e6,
+        "max_us": latencies[-1] * 1e6,
+        "swaps": CATALOG_SWAPS.value(kind="delta") - swaps,
+        "staleness_ms": statistics.median(lags) * 1000 if lags else float("nan"),
+    }
+
+def measure_refresh(source, pool, batch, repeat=5):
+    conn = pool.getconn()
+    delta, full = [], []
+    try:
+        for _ in range(repeat):
+            conn.execute(f"UPDATE shoes SET price = price + 1 WHERE id IN (SELECT id FROM shoes ORDER BY RANDOM() LIMIT {batch})")
+            conn.commit()
+            start = time.perf_counter()
+            source.refresh()
+            delta.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            source.load()
+            full.append(time.perf_counter() - start)
+    finally:
+        pool.putconn(conn)
+    return statistics.median(delta) * 1000, statistics.median(full) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process catalog snapshot vs per-fetch SQL under concurrent catalog writes")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch", type=int, default=100, help="Rows updated per writer commit")
+    parser.add_argument("--write-interval", type=float, default=0.1)
+    parser.add_argument("--poll", type=float, default=0.05, help="Snapshot listener poll interval (SQLite has no NOTIFY)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = create_sqlite_catalog(os.path.join(tmp, "shoes.db"), make_catalog(args.rows))
+        start = time.perf_counter()
+        snapshot = create_snapshot_source(pool, "?", "sqlite")  # Also installs the change-tracking triggers
+        print(f"snapshot load: {len(snapshot.snapshot)} rows in {(time.perf_counter() - start) * 1000:.0f} ms")
+        snapshot.poll_seconds = args.poll
+        snapshot.start_listener()
+        sql = SQLSneakerSource(pool, placeholder="?", dialect="sqlite")
+
+        print(f"{'source':>9} {'reads/s':>10} {'p50 (us)':>9} {'p99 (us)':>9} {'max (us)':>9} {'swaps':>6} {'staleness (ms)':>15}")
+        for name, source in (("sql", sql), ("snapshot", snapshot)):
+            stats = measure_reads(name, source, snapshot, pool, args)
+            print(f"{name:>9} {stats['reads_per_s']:>10.0f} {stats['p50_us']:>9.1f} {stats['p99_us']:>9.1f} {stats['max_us']:>9.0f} "
+                  f"{stats['swaps']:>6.0f} {stats['staleness_ms']:>15.1f}")
+        snapshot.stop_listener()
+
+        delta_ms, full_ms = measure_refresh(snapshot, pool, args.batch)
+        print(f"refresh after {args.batch} changed rows: delta {delta_ms:.1f} ms, full reload {full_ms:.1f} ms")
+        pool.closeall()
+
+if __name__ == "__main__":
+    main()
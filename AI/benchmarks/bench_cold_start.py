@@ -0,0 +1,53 @@
+# Cold start: time to import the workflow module and time to the first recommendation, in fresh interpreters.
+# Each run is a new `python` process, the way a freshly forked/spawned worker starts. Gemini is FakeGeminiModel.
+# Run from the AI/ directory:  python -m benchmarks.bench_cold_start --runs 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child process; prints one JSON line with the timings
+CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+import workflow
+imported = time.perf_counter()
+
+from tools.general_agent import GeneralAgent
+from benchmarks.fakes import FakeGeminiModel
+model = FakeGeminiModel(latency_seconds=0.0)
+workflow.GeneralAgent = lambda api_key: GeneralAgent(api_key, model=model)
+preferences = {"preferred_brands": ["Nike", "Adidas", "Puma"], "gender_age_group": "male",
+               "budget_range": (10.0, 520.0), "style": "casual", "color": "black", "use_case": "daily wear"}
+result = workflow.run_sneaker_workflow(preferences, "fake-key", use_cache=False)
+first = time.perf_counter()
+assert result.get("recommendations"), result
+
+heavy = [name for name in ("google.generativeai", "langchain_core", "langgraph") if name in sys.modules]
+print(json.dumps({"import_s": imported - started, "first_recommendation_s": first - started, "modules": heavy}))
+"""
+
+def run_once() -> dict:
+    env = {**os.environ, "SNEAKER_FAST_PATH_ENABLED": "0"}  # The first request should go through the (fake) LLM node
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=AI_DIR, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the sneaker workflow")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    for key, label in (("import_s", "import workflow"), ("first_recommendation_s", "first recommendation")):
+        values = [sample[key] for sample in samples]
+        print(f"{label:>22}: median {statistics.median(values) * 1000:8.1f} ms   "
+              f"min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+    print(f"{'loaded by first request':>22}: {', '.join(samples[-1]['modules']) or 'none'}")
+
+if __name__ == "__main__":
+    main()
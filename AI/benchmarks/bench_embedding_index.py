@@ -0,0 +1,38 @@
+# Build time and masked cosine top-k latency of the embedding index on a synthetic catalog.
+# Run from the AI/ directory:  python -m benchmarks.bench_embedding_index --rows 100000
+import argparse
+import tempfile
+import time
+
+from tools.embedding_index import EmbeddingIndex, HashingEmbedder
+from benchmarks.synthetic import make_catalog
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding index build and search benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.rows)
+    index = EmbeddingIndex(HashingEmbedder(dim=args.dim))
+    start = time.perf_counter()
+    index.add(catalog)
+    print(f"build: {time.perf_counter() - start:.1f}s for {len(index)} rows")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        index = EmbeddingIndex.load(directory)  # Searches below run against the memory-mapped matrix
+
+        start = time.perf_counter()
+        added = index.add(make_catalog(args.rows + 1_000)[args.rows:])
+        print(f"incremental add: {added} rows in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        mask = index.filter_mask(["Nike", "Puma"], "male", 50.0, 250.0)
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            index.search("black retro running", k=20, mask=mask)
+        print(f"search: {(time.perf_counter() - start) * 1000 / args.queries:.2f}ms per query (k=20, masked)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Candidate-set size and collector latency with and without facet pushdown, on a tagged SQLite catalog.
+# "budget" is the old collector query (brand + gender + price range); "pushdown" adds the color/use-case/style
+# tags from the preferences, so the source returns only matching rows and the pre-ranker scores fewer of them.
+# Run from the AI/ directory:  python -m benchmarks.bench_facet_pushdown --sizes 1000 10000 100000
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from tools.data_source import SQLSneakerSource, create_sqlite_catalog
+from tools.enrichment import preference_facets
+from tools.ranker import PreRankerAgent
+from benchmarks.synthetic import BRANDS, COLORS, STYLES, USE_CASES, make_catalog
+
+def preference_sets(count, seed=7):
+    rng = random.Random(seed)
+    return [{"preferred_brands": [rng.choice(BRANDS)], "gender_age_group": "male", "budget_range": (50.0, 400.0),
+             "style": rng.choice(STYLES), "color": rng.choice(COLORS), "use_case": rng.choice(USE_CASES)}
+            for _ in range(count)]
+
+def measure(source, preferences, pushdown, ranker):
+    rows, fetch_ms, rank_ms = [], [], []
+    for prefs in preferences:
+        min_price, max_price = prefs["budget_range"]
+        facets = preference_facets(prefs) if pushdown else None
+        start = time.perf_counter()
+        sneakers = source.fetch_sneakers(prefs["preferred_brands"][0], "male", min_price, max_price, facets)
+        fetched = time.perf_counter()
+        ranker.score_candidates(sneakers, prefs)
+        fetch_ms.append((fetched - start) * 1000)
+        rank_ms.append((time.perf_counter() - fetched) * 1000)
+        rows.append(len(sneakers))
+    return statistics.mean(rows), statistics.median(fetch_ms), statistics.median(rank_ms)
+
+def main():
+    parser = argparse.ArgumentParser(description="Facet pushdown benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    ranker = PreRankerAgent()
+    preferences = preference_sets(args.queries)
+    print(f"{'rows':>8} {'mode':>9} {'candidates':>11} {'fetch p50 (ms)':>15} {'score p50 (ms)':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            pool = create_sqlite_catalog(os.path.join(tmp, f"shoes_{size}.db"), make_catalog(size))
+            source = SQLSneakerSource(pool, placeholder="?", dialect="sqlite")
+            for mode, pushdown in (("budget", False), ("pushdown", True)):
+                candidates, fetch_p50, score_p50 = measure(source, preferences, pushdown, ranker)
+                print(f"{size:>8} {mode:>9} {candidates:>11.1f} {fetch_p50:>15.2f} {score_p50:>15.2f}")
+            pool.closeall()
+
+if __name__ == "__main__":
+    main()
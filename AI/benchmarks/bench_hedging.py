@@ -0,0 +1,86 @@
+# Tail latency of the LLM node against a provider with a heavy latency tail, by how the call is bounded:
+#   plain     - no hedging, no deadline (the old behaviour): the slowest responses set p99
+#   hedged    - a second request after the recent p95 latency; the first answer wins
+#   deadline  - hedged, and the request has --budget seconds; past it the answer is the local pre-ranked fallback
+# Most calls take --llm-latency; --tail-rate of them take --tail-factor times longer (seeded, so runs repeat).
+# Run from the AI/ directory:  python -m benchmarks.bench_hedging --requests 300 --tail-rate 0.03 --budget 0.8
+import argparse
+import logging
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SNEAKER_FAST_PATH_ENABLED", "0")
+os.environ.setdefault("GEMINI_RATE_PER_SECOND", "1000")  # The default 5/s limit would dominate the latencies
+
+import workflow
+from tools.agent_registry import clear_registry, set_gemini_model
+from tools.catalog_index import CatalogIndex
+from tools.data_source import InMemorySneakerSource, set_sneaker_source
+from tools.tracing import LLM_FALLBACKS, LLM_HEDGES
+from benchmarks.fakes import FakeGeminiModel
+from benchmarks.synthetic import make_catalog
+
+API_KEY = "fake-key"
+PREFERENCES = {"preferred_brands": ["Nike", "Adidas", "Puma"], "gender_age_group": "male", "budget_range": (20.0, 600.0),
+               "style": "casual", "color": "black", "use_case": "daily wear"}
+
+class TailLatencyModel(FakeGeminiModel):
+    """FakeGeminiModel whose latency is `latency_seconds`, or `tail_factor` times that for a `tail_rate` share of calls."""
+
+    def __init__(self, tail_rate: float, tail_factor: float, seed: int = 3, **kwargs):
+        super().__init__(**kwargs)
+        self.tail_rate = tail_rate
+        self.tail_factor = tail_factor
+        self._tail_rng = random.Random(seed)
+
+    def _latency(self, prompt):
+        with self._lock:
+            slow = self._tail_rng.random() < self.tail_rate
+        return super()._latency(prompt) * (self.tail_factor if slow else 1.0)
+
+def measure(mode, args):
+    os.environ["SNEAKER_LLM_HEDGE"] = "0" if mode == "plain" else "1"
+    clear_registry()  # Fresh agents: hedging setting and latency window
+    model = TailLatencyModel(args.tail_rate, args.tail_factor, latency_seconds=args.llm_latency)
+    set_gemini_model(API_KEY, model)
+    budget = args.budget if mode == "deadline" else 0.0
+    hedges, fallbacks = LLM_HEDGES.value(outcome="sent"), LLM_FALLBACKS.value(fallback="local", cause="deadline")
+    latencies = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        result = workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, budget_seconds=budget)
+        latencies.append(time.perf_counter() - start)
+        assert result.get("recommendations"), result
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+        "llm_calls": model.calls / args.requests,
+        "hedge_rate": (LLM_HEDGES.value(outcome="sent") - hedges) / args.requests,
+        "fallback_rate": (LLM_FALLBACKS.value(fallback="local", cause="deadline") - fallbacks) / args.requests,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged LLM requests and deadline fallback against a heavy latency tail")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--catalog", type=int, default=5000)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--tail-rate", type=float, default=0.03)
+    parser.add_argument("--tail-factor", type=float, default=20.0)
+    parser.add_argument("--budget", type=float, default=0.8, help="Request budget in deadline mode (seconds)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # Every fallback logs a warning
+    os.environ["SNEAKER_LLM_HEDGE_INITIAL_DELAY"] = str(args.llm_latency * 4)  # Until the p95 is known
+
+    set_sneaker_source(InMemorySneakerSource(CatalogIndex(make_catalog(args.catalog))))
+    print(f"{'mode':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'LLM calls':>10} {'hedged':>7} {'fallback':>9}")
+    for mode in ("plain", "hedged", "deadline"):
+        stats = measure(mode, args)
+        print(f"{mode:>9} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['llm_calls']:>10.2f} "
+              f"{stats['hedge_rate']:>7.1%} {stats['fallback_rate']:>9.1%}")
+
+if __name__ == "__main__":
+    main()
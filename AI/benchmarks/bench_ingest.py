@@ -0,0 +1,68 @@
+# Bulk catalog ingestion into SQLite: a first load, an unchanged re-run (every row skipped by content hash)
+# and a re-run with a share of the feed changed. The feed streams from disk, so peak RSS should stay flat
+# as --sizes grows (each size runs in a fresh process via --one, so RSS isn't carried over).
+# Run from the AI/ directory:  python -m benchmarks.bench_ingest --sizes 100000 1000000
+import argparse
+import csv
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from tools.data_source import SNEAKER_COLUMNS, create_sqlite_catalog
+from tools.ingest import CatalogIngestor, read_feed
+from benchmarks.synthetic import BRANDS, COLORS, GENDERS, STYLES
+
+def write_feed(path, n_rows, brand, changed_fraction=0.0, seed=7):
+    # Streams rows straight to disk; make_catalog would hold the whole feed in memory
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SNEAKER_COLUMNS)
+        for i in range(n_rows):
+            price = round(20.0 + (i * 37 % 58000) / 100, 2)
+            if rng.random() < changed_fraction:
+                price = round(price + 1.0, 2)
+            style, color = STYLES[i % len(STYLES)], COLORS[i % len(COLORS)]
+            writer.writerow((brand, f"{brand} {style.title()} {i}", price, f"https://example.com/{brand.lower()}/sneaker-{i}",
+                             GENDERS[i % len(GENDERS)], f"A {color} {style} sneaker.", f"https://example.com/{brand.lower()}/sneaker-{i}.jpg"))
+
+def run(ingestor, brand, path):
+    start = time.perf_counter()
+    report = ingestor.ingest(brand, read_feed(path), delete_missing=True)
+    return report, time.perf_counter() - start
+
+def run_size(size, changed):
+    brand = BRANDS[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = create_sqlite_catalog(os.path.join(tmp, "shoes.db"), [])
+        ingestor = CatalogIngestor(pool, dialect="sqlite")
+        feed, changed_feed = os.path.join(tmp, "feed.csv"), os.path.join(tmp, "changed.csv")
+        write_feed(feed, size, brand)
+        write_feed(changed_feed, size, brand, changed_fraction=changed)
+        for label, path in (("first", feed), ("unchanged", feed), ("changed", changed_feed)):
+            report, elapsed = run(ingestor, brand, path)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+            print(f"{size:>8} {label:>10} {elapsed:>9.2f} {size / elapsed:>9.0f} {peak:>10.1f} {report['inserted']:>9} "
+                  f"{report['updated']:>8} {report['unchanged']:>10} {report['catalog_version']:>8}", flush=True)
+        pool.closeall()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingestion benchmark (SQLite)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--changed", type=float, default=0.1, help="Share of rows changed in the third run")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one is not None:
+        run_size(args.one, args.changed)
+        return
+    print(f"{'rows':>8} {'run':>10} {'time (s)':>9} {'rows/s':>9} {'RSS (MB)':>10} {'inserted':>9} {'updated':>8} {'unchanged':>10} {'version':>8}")
+    for size in args.sizes:
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_ingest", "--one", str(size), "--changed", str(args.changed)], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Wasted work and tail latency when the LLM fails some of the time. Each request is retried by its client until
+# it succeeds (up to --client-attempts), under three recovery strategies:
+#   rerun   - no node retries, no checkpoints: every client retry runs the whole graph again (the old behaviour)
+#   resume  - no node retries; the in-memory checkpointer keeps the failed run, and the retry with the same
+#             request id resumes at the LLM node
+#   retry   - the LLM node retries itself with jittered exponential backoff, plus salvage / repair of bad JSON
+# Injected failures, split evenly: the call raises, the answer is cut off mid-array (salvageable locally),
+# or the answer is not JSON (needs the repair call). Brand sources sleep --fetch-latency per fetch.
+# "wasted" counts fetches and LLM calls beyond what one clean run needs.
+# Run from the AI/ directory:  python -m benchmarks.bench_llm_failures --rates 0 0.1 0.3 0.5 --requests 200
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import time
+import uuid
+from threading import Lock
+
+os.environ.setdefault("SNEAKER_FAST_PATH_ENABLED", "0")
+os.environ.setdefault("GEMINI_RATE_PER_SECOND", "1000")  # The default 5/s limit would dominate the latencies
+
+import workflow
+from tools.agent_registry import clear_registry, set_gemini_model
+from tools.brand_registry import BrandRegistry, set_brand_registry
+from tools.general_agent import REPAIR_PROMPT
+from tools.retry import Backoff
+from benchmarks.bench_brand_fanout import DelayedBrandSource
+from benchmarks.fakes import FakeGeminiModel, FakeResponse
+
+API_KEY = "fake-key"
+BRANDS = ["Nike", "Adidas", "Puma"]
+PREFERENCES = {"preferred_brands": BRANDS, "gender_age_group": "male", "budget_range": (0.0, 1000.0),
+               "style": "casual", "color": "black", "use_case": "daily wear"}
+
+class FlakyGeminiModel(FakeGeminiModel):
+    """FakeGeminiModel failing a `failure_rate` share of calls: raising, truncating its JSON, or answering in prose."""
+
+    def __init__(self, failure_rate: float, seed: int = 5, **kwargs):
+        super().__init__(**kwargs)
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = Lock()
+
+    def _respond(self, prompt):
+        if prompt.startswith(REPAIR_PROMPT):
+            # The repair call gets back the "prose" answer below; fixing it is taking the JSON out again
+            self.calls += 1
+            return FakeResponse(prompt[len(REPAIR_PROMPT):].split("Answer: ", 1)[-1].replace("'", '"'), prompt)
+        with self._lock:
+            roll = self._rng.random()
+        response = super()._respond(prompt)
+        if roll >= self.failure_rate:
+            return response
+        kind = int(roll / self.failure_rate * 3)
+        if kind == 0:
+            raise RuntimeError("503 Service Unavailable (injected)")
+        if kind == 1:
+            return FakeResponse(response.text[: len(response.text) * 2 // 3], prompt)
+        picks = response.text.strip("`\n").removeprefix("json\n")
+        return FakeResponse(f"Here are my picks! Answer: {picks.replace(chr(34), chr(39))}", prompt)
+
+class CountingBrandSource(DelayedBrandSource):
+    fetches = 0
+    _lock = Lock()
+
+    def fetch(self, gender, min_price, max_price, facets=None):
+        with CountingBrandSource._lock:
+            CountingBrandSource.fetches += 1
+        return super().fetch(gender, min_price, max_price, facets)
+
+def configure(strategy, failure_rate, latency):
+    os.environ["SNEAKER_CHECKPOINTER"] = "memory" if strategy == "resume" else "none"
+    os.environ["SNEAKER_LLM_MAX_ATTEMPTS"] = "3" if strategy == "retry" else "1"
+    os.environ["SNEAKER_LLM_REPAIR_CALL"] = "1" if strategy == "retry" else "0"
+    workflow._compiled_graphs.clear()  # Recompiled with this strategy's checkpointer
+    clear_registry()  # Agents re-read the repair setting
+    model = FlakyGeminiModel(failure_rate, latency_seconds=latency)
+    set_gemini_model(API_KEY, model)
+    return model
+
+def run_request(strategy, client_attempts, backoff):
+    # One client request, retried as a client would (same request id, same backoff as the node retry)
+    request_id = uuid.uuid4().hex if strategy == "resume" else None
+    for attempt in range(1, client_attempts + 1):
+        result = workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id=request_id)
+        if result.get("recommendations"):
+            return True
+        if attempt < client_attempts:
+            time.sleep(backoff.delay(attempt))
+    return False
+
+def measure(strategy, failure_rate, requests, client_attempts, latency):
+    model = configure(strategy, failure_rate, latency)
+    backoff = Backoff()
+    CountingBrandSource.fetches = 0
+    latencies, successes = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        successes += run_request(strategy, client_attempts, backoff)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "success": successes / requests,
+        "fetches": CountingBrandSource.fetches / requests,
+        "llm_calls": model.calls / requests,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Recovery from injected LLM failures: rerun vs resume vs node retry")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.0, 0.1, 0.3, 0.5])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--client-attempts", type=int, default=3)
+    parser.add_argument("--fetch-latency", type=float, default=0.03)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--retry-initial", type=float, default=0.05)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # Every injected failure logs a warning
+    os.environ["SNEAKER_LLM_RETRY_INITIAL"] = str(args.retry_initial)
+
+    set_brand_registry(BrandRegistry([CountingBrandSource(name, args.fetch_latency, seed=i) for i, name in enumerate(BRANDS)]))
+    clean_fetches = len(BRANDS)  # One clean run: a fetch per brand and one LLM call
+    results = []
+    print(f"{'rate':>5} {'strategy':>8} {'success':>8} {'fetches':>8} {'wasted':>7} {'LLM calls':>10} {'wasted':>7} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for rate in args.rates:
+        for strategy in ("rerun", "resume", "retry"):
+            stats = measure(strategy, rate, args.requests, args.client_attempts, args.llm_latency)
+            results.append({"failure_rate": rate, "strategy": strategy, **stats})
+            print(f"{rate:>5.2f} {strategy:>8} {stats['success']:>8.1%} {stats['fetches']:>8.2f} {stats['fetches'] - clean_fetches:>7.2f} "
+                  f"{stats['llm_calls']:>10.2f} {stats['llm_calls'] - 1:>7.2f} {stats['p50_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
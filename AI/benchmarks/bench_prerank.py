@@ -0,0 +1,63 @@
+# Prompt bytes and end-to-end latency vs catalog size, with and without the pre-ranking stage.
+# "baseline" sends every aggregated sneaker as indent=2 JSON (the old prompt); "prerank" sends the top K, compact.
+# The fake LLM charges a fixed latency plus a per-KB cost, so prompt size shows up in latency.
+# Run from the AI/ directory:  python -m benchmarks.bench_prerank --sizes 100 1000 10000 --top-k 15
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from tools.aggregator import AggregatorAgent
+from tools.general_agent import GeneralAgent
+from tools.ranker import PreRankerAgent
+from benchmarks.fakes import FakeGeminiModel
+from benchmarks.synthetic import make_catalog
+
+PREFERENCES = {
+    "preferred_brands": ["Nike", "Adidas", "Puma"],
+    "gender_age_group": "male",
+    "budget_range": (20.0, 600.0),
+    "style": "retro",
+    "color": "black",
+    "use_case": "running",
+}
+
+class IndentedPromptAgent(GeneralAgent):
+    # Reproduces the pre-ranking prompt format for the baseline
+    def _sneakers_json(self, sneakers):
+        return json.dumps([{k: s.get(k) for k in ("brand", "name", "price", "description", "url", "image_url")} for s in sneakers], indent=2)
+
+def run_once(agent, catalog, top_k):
+    state = {"user_preferences": PREFERENCES, "brand_data": {"all": catalog}}
+    start = time.perf_counter()
+    state.update(AggregatorAgent().aggregate_sneakers(state))
+    if top_k:
+        state.update(PreRankerAgent(top_k=top_k).rank_sneakers(state))
+    prompt_bytes = len(agent.build_prompt(state["aggregated_sneakers"], PREFERENCES).encode("utf-8"))
+    result = agent.get_recommendations(state)
+    assert result.get("final_recommendations"), result
+    return prompt_bytes, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-ranking prompt size and latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixed fake LLM latency (s)")
+    parser.add_argument("--latency-per-kb", type=float, default=0.002, help="Fake LLM latency per prompt KB (s)")
+    args = parser.parse_args()
+
+    model = FakeGeminiModel(latency_seconds=args.latency, latency_per_kb=args.latency_per_kb)
+    baseline = IndentedPromptAgent("fake-key", model=model)
+    prerank = GeneralAgent("fake-key", model=model)
+
+    print(f"{'catalog':>8} {'baseline KB':>12} {'prerank KB':>11} {'baseline (s)':>13} {'prerank (s)':>12}")
+    for size in args.sizes:
+        catalog = [s for s in make_catalog(size) if s["gender"] == PREFERENCES["gender_age_group"]]
+        with contextlib.redirect_stdout(io.StringIO()):  # Agents print the whole prompt
+            base_bytes, base_s = run_once(baseline, catalog, top_k=0)
+            rank_bytes, rank_s = run_once(prerank, catalog, top_k=args.top_k)
+        print(f"{size:>8} {base_bytes / 1024:>12.1f} {rank_bytes / 1024:>11.1f} {base_s:>13.3f} {rank_s:>12.3f}")
+
+if __name__ == "__main__":
+    main()
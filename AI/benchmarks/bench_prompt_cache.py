@@ -0,0 +1,85 @@
+# Bytes sent to Gemini and end-to-end latency per request, by how much of the prompt the client already holds:
+#   inline   - one prompt string per call (system instruction + candidates + preferences), the old behaviour
+#   system   - system instruction bound to the client; calls send candidates + preferences
+#   segment  - system instruction + the segment's catalog in a provider context cache; calls send preferences + shortlist
+# Requests come from a few popular segments (Zipf) with random style/color/use case, against a local fake Gemini
+# REST server whose latency grows per uncached KB. Bytes include cache uploads.
+# Run from the AI/ directory:  python -m benchmarks.bench_prompt_cache --requests 200 --catalog 20000
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SNEAKER_FAST_PATH_ENABLED", "0")
+
+import workflow
+from tools.agent_registry import clear_registry, set_gemini_model
+from tools.catalog_index import CatalogIndex
+from tools.data_source import InMemorySneakerSource, set_sneaker_source
+from benchmarks.fake_gemini_server import FakeGeminiServer, GeminiRestModel, RestContextCache
+from benchmarks.synthetic import COLORS, STYLES, USE_CASES, make_catalog
+
+API_KEY = "fake-key"
+SEGMENTS = [
+    (["Nike"], "male", (50.0, 150.0)),
+    (["Nike", "Adidas"], "male", (100.0, 200.0)),
+    (["Adidas"], "female", (50.0, 150.0)),
+    (["Puma"], "male", (0.0, 100.0)),
+    (["Nike", "Adidas", "Puma"], "female", (100.0, 250.0)),
+    (["Puma", "Adidas"], "kid", (0.0, 100.0)),
+]
+
+def requests_for(count, seed=11):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(SEGMENTS))]
+    for _ in range(count):
+        brands, gender, budget = rng.choices(SEGMENTS, weights)[0]
+        yield {"preferred_brands": brands, "gender_age_group": gender, "budget_range": budget,
+               "style": rng.choice(STYLES), "color": rng.choice(COLORS), "use_case": rng.choice(USE_CASES)}
+
+def run_mode(mode, server, preferences, min_tokens):
+    clear_registry()  # Fresh agents and assembler memo per mode
+    os.environ["SNEAKER_PROMPT_SEGMENT_CACHE"] = "1" if mode == "segment" else "0"
+    rest_model = GeminiRestModel(server.url, "gemini-1.5-flash")
+    context_cache = None if mode == "inline" else (lambda base: RestContextCache(base, rest_model, min_tokens=min_tokens))
+    set_gemini_model(API_KEY, rest_model, context_cache=context_cache)
+    server.reset_stats()
+
+    latencies, picks = [], 0
+    for prefs in preferences:
+        start = time.perf_counter()
+        result = workflow.run_sneaker_workflow(prefs, API_KEY, use_cache=False)
+        latencies.append(time.perf_counter() - start)
+        picks += len(result.get("recommendations", []))
+    latencies.sort()
+    return {
+        "kb_per_request": server.bytes_received / len(preferences) / 1024,
+        "call_kb_per_request": (server.bytes_received - server.upload_bytes) / len(preferences) / 1024,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "picks_per_request": picks / len(preferences),
+        "caches_created": server.caches_created,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt prefix reuse benchmark against a fake Gemini server")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--catalog", type=int, default=20000)
+    parser.add_argument("--min-tokens", type=int, default=4096, help="Provider minimum for a context cache")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-per-kb", type=float, default=0.004)
+    parser.add_argument("--cached-latency-per-kb", type=float, default=0.001)
+    args = parser.parse_args()
+
+    set_sneaker_source(InMemorySneakerSource(CatalogIndex(make_catalog(args.catalog))))
+    preferences = list(requests_for(args.requests))
+    print(f"{'mode':>8} {'KB/request':>11} {'calls only':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} {'picks/req':>10} {'caches':>7}")
+    with FakeGeminiServer(args.latency, args.latency_per_kb, args.cached_latency_per_kb) as server:
+        for mode in ("inline", "system", "segment"):
+            stats = run_mode(mode, server, preferences, args.min_tokens)
+            print(f"{mode:>8} {stats['kb_per_request']:>11.2f} {stats['call_kb_per_request']:>11.2f} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                  f"{stats['picks_per_request']:>10.2f} {stats['caches_created']:>7}")
+
+if __name__ == "__main__":
+    main()
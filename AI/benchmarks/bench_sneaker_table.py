@@ -0,0 +1,93 @@
+# Memory and latency of the candidate set as List[Sneaker] dicts vs a columnar SneakerTable.
+# Rows start as SQL-style tuples (what SQLSneakerSource fetches), then go through collection,
+# the brand_data reducer, the aggregator, the pre-ranker and a pickle round trip (what a checkpointer does).
+# Run from the AI/ directory:  python -m benchmarks.bench_sneaker_table --sizes 10000 100000
+import argparse
+import logging
+import pickle
+import time
+import tracemalloc
+
+from tools.aggregator import AggregatorAgent
+from tools.data_source import SNEAKER_COLUMNS, row_to_sneaker
+from tools.ranker import PreRankerAgent
+from tools.sneaker_table import SneakerTable
+from tools.state_management import merge_brand_data_dicts
+from benchmarks.synthetic import make_catalog
+
+PREFERENCES = {
+    "preferred_brands": ["Nike", "Adidas", "Puma"],
+    "gender_age_group": "male",
+    "budget_range": (20.0, 600.0),
+    "style": "casual",
+    "color": "black",
+    "use_case": "daily wear",
+}
+
+def sql_rows(n_rows):
+    return [tuple(sneaker[column] for column in SNEAKER_COLUMNS) for sneaker in make_catalog(n_rows)]
+
+def measure(fn):
+    # Returns (result, seconds, bytes still allocated by the result)
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def run_pipeline(label, build):
+    rows_by_brand = build()
+    state = {"user_preferences": PREFERENCES, "brand_data": {}}
+    timings = {}
+    brand_data, timings["merge"] = timed(lambda: _merge_all(rows_by_brand))
+    state["brand_data"] = brand_data
+    aggregated, timings["aggregate"] = timed(lambda: AggregatorAgent().aggregate_sneakers(state))
+    state.update(aggregated)
+    payload, timings["pickle"] = timed(lambda: pickle.dumps(state["aggregated_sneakers"], protocol=pickle.HIGHEST_PROTOCOL))
+    _, timings["rank"] = timed(lambda: PreRankerAgent().rank_sneakers(state))
+    return timings, len(payload)
+
+def _merge_all(rows_by_brand):
+    # One reducer call per collector branch, as LangGraph applies them
+    merged = {}
+    for brand, rows in rows_by_brand.items():
+        merged = merge_brand_data_dicts(merged, {brand: rows})
+    return merged
+
+def split_by_brand(rows):
+    by_brand = {}
+    for row in rows:
+        by_brand.setdefault(row[0], []).append(row)
+    return by_brand
+
+def main():
+    parser = argparse.ArgumentParser(description="List[Sneaker] vs SneakerTable memory and latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    logging.disable(logging.INFO)  # Agents log per call
+
+    print(f"{'rows':>8} {'repr':>6} {'build (ms)':>11} {'memory (MB)':>12} {'merge':>8} {'aggregate':>10} "
+          f"{'rank':>8} {'pickle':>8} {'pickled (MB)':>13}")
+    for size in args.sizes:
+        by_brand = split_by_brand(sql_rows(size))
+        representations = (
+            ("dicts", lambda: {brand: [row_to_sneaker(row) for row in rows] for brand, rows in by_brand.items()}),
+            ("table", lambda: {brand: SneakerTable.from_rows(rows) for brand, rows in by_brand.items()}),
+        )
+        for label, build in representations:
+            built, build_time, retained = measure(build)
+            timings, pickled = run_pipeline(label, lambda: built)
+            print(f"{size:>8} {label:>6} {build_time * 1000:>11.1f} {retained / 2**20:>12.1f} "
+                  f"{timings['merge'] * 1000:>8.1f} {timings['aggregate'] * 1000:>10.1f} {timings['rank'] * 1000:>8.1f} "
+                  f"{timings['pickle'] * 1000:>8.1f} {pickled / 2**20:>13.1f}")
+            del built
+
+if __name__ == "__main__":
+    main()
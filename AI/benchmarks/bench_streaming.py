@@ -0,0 +1,52 @@
+# Time to first recommendation: GeneralAgent.get_recommendations vs stream_recommendations.
+# FakeGeminiModel spreads its latency over the streamed chunks, the way tokens arrive from the real model.
+# Run from the AI/ directory:  python -m benchmarks.bench_streaming --latency 2.0 --runs 5
+import argparse
+import statistics
+import time
+
+from tools.general_agent import GeneralAgent
+from benchmarks.fakes import FakeGeminiModel
+from benchmarks.synthetic import make_catalog
+
+PREFERENCES = {
+    "preferred_brands": ["Nike", "Adidas", "Puma"],
+    "gender_age_group": "male",
+    "budget_range": (10.0, 520.0),
+    "style": "casual",
+    "color": "black",
+    "use_case": "daily wear",
+}
+
+def time_blocking(agent, state):
+    start = time.perf_counter()
+    result = agent.get_recommendations(state)
+    elapsed = time.perf_counter() - start
+    assert result.get("final_recommendations"), result
+    return elapsed, elapsed  # Nothing is visible before the whole response has been parsed
+
+def time_streaming(agent, state):
+    start = time.perf_counter()
+    first = []
+    result = agent.stream_recommendations(state, lambda rec: first or first.append(time.perf_counter() - start))
+    total = time.perf_counter() - start
+    assert result.get("final_recommendations"), result
+    return first[0], total
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-recommendation benchmark, blocking vs streaming")
+    parser.add_argument("--latency", type=float, default=2.0, help="Injected LLM latency in seconds")
+    parser.add_argument("--candidates", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    agent = GeneralAgent("fake-key", model=FakeGeminiModel(latency_seconds=args.latency))
+    state = {"user_preferences": PREFERENCES, "aggregated_sneakers": make_catalog(args.candidates)}
+
+    print(f"{'mode':>10} {'first (s)':>10} {'total (s)':>10}")
+    for label, measure in (("blocking", time_blocking), ("streaming", time_streaming)):
+        samples = [measure(agent, state) for _ in range(args.runs)]
+        print(f"{label:>10} {statistics.median(s[0] for s in samples):>10.3f} {statistics.median(s[1] for s in samples):>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# End-to-end check of checkpointed runs (SNEAKER_CHECKPOINTER), for each checkpointer and for the sync and async graphs:
+#   - a run whose LLM call fails keeps its checkpoints, and the retry with the same request id resumes at the LLM node
+#   - the Gemini API key appears in no checkpoint: not in the metadata, not in the channel values, not in the sqlite file
+#   - with --columnar too, the same with SNEAKER_COLUMNAR_STATE=1 (SneakerTable values in the checkpointed state)
+#   - the async graph keeps working when a second event loop runs it (AsyncSqliteSaver is bound to its loop)
+#   - a request id another run holds is refused, and a kept run is deleted once SNEAKER_CHECKPOINT_TTL_SECONDS passes
+#   - a worker forked after the graph was compiled (gunicorn preload) opens its own checkpointer connection
+#   - a script running the async entry points under asyncio.run exits (aiosqlite's connection thread is closed)
+# Exits non-zero on the first failed check.
+# Run from the AI/ directory:  python -m benchmarks.check_checkpointing [--checkpointers memory sqlite] [--columnar]
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+os.environ.setdefault("SNEAKER_FAST_PATH_ENABLED", "0")
+os.environ.setdefault("GEMINI_RATE_PER_SECOND", "1000")
+os.environ["SNEAKER_LLM_MAX_ATTEMPTS"] = "1"  # The first call's failure ends the run, so there is something to resume
+
+import workflow
+from tools.agent_registry import clear_registry, set_gemini_model
+from tools.checkpointing import RunRegistry
+from tools.tracing import WORKFLOW_RESUMES
+from benchmarks.fakes import FakeGeminiModel
+
+API_KEY = "SECRET-KEY-do-not-persist"
+PREFERENCES = {"preferred_brands": ["Nike", "Adidas"], "gender_age_group": "male", "budget_range": (20.0, 600.0),
+               "style": "casual", "color": "black", "use_case": "daily wear"}
+
+class FailFirstModel(FakeGeminiModel):
+    """FakeGeminiModel whose first `failures` calls raise."""
+
+    def __init__(self, failures: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def _respond(self, prompt):
+        with self._lock:
+            self.failures -= 1
+            fail = self.failures >= 0
+        if fail:
+            raise RuntimeError("503 Service Unavailable (injected)")
+        return super()._respond(prompt)
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL: {message}")
+        sys.exit(1)
+
+def check_no_secret(app, label, path=None):
+    checkpoints = list(app.checkpointer.list(None))
+    check(checkpoints, f"{label}: the failed run left no checkpoints")
+    for saved in checkpoints:
+        check(API_KEY not in repr(saved.metadata), f"{label}: API key in checkpoint metadata {saved.metadata}")
+        check(API_KEY not in repr(saved.checkpoint["channel_values"]), f"{label}: API key in checkpointed state")
+    if path is not None:
+        with open(path, "rb") as f:
+            check(API_KEY.encode() not in f.read(), f"{label}: API key in {path}")
+
+async def acheck_no_secret(app, label, path=None):
+    checkpoints = [saved async for saved in app.checkpointer.alist(None)]
+    check(checkpoints, f"{label}: the failed run left no checkpoints")
+    for saved in checkpoints:
+        check(API_KEY not in repr(saved.metadata), f"{label}: API key in checkpoint metadata {saved.metadata}")
+        check(API_KEY not in repr(saved.checkpoint["channel_values"]), f"{label}: API key in checkpointed state")
+    if path is not None:
+        with open(path, "rb") as f:
+            check(API_KEY.encode() not in f.read(), f"{label}: API key in {path}")
+
+def configure(kind, path):
+    os.environ["SNEAKER_CHECKPOINTER"] = kind
+    os.environ["SNEAKER_CHECKPOINT_PATH"] = path
+    workflow.close_checkpointers()
+    clear_registry()
+    set_gemini_model(API_KEY, FailFirstModel(latency_seconds=0.0))
+
+def check_sync(kind, path):
+    label = f"{kind}/sync{'/columnar' if os.environ['SNEAKER_COLUMNAR_STATE'] == '1' else ''}"
+    configure(kind, path)
+    failed = workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="sync-1")
+    check(not failed.get("recommendations"), f"{label}: the injected failure did not fail the run")
+    check_no_secret(workflow.get_app(), label, path if kind == "sqlite" else None)
+    resumes = WORKFLOW_RESUMES.value(node="general_agent_llm")
+    result = workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="sync-1")
+    check(result.get("recommendations"), f"{label}: the retry did not succeed: {result}")
+    check(WORKFLOW_RESUMES.value(node="general_agent_llm") == resumes + 1, f"{label}: the retry did not resume")
+    print(f"ok  {label}")
+
+async def check_async(kind, path):
+    label = f"{kind}/async{'/columnar' if os.environ['SNEAKER_COLUMNAR_STATE'] == '1' else ''}"
+    configure(kind, path)
+    failed = await workflow.arun_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="async-1")
+    check(not failed.get("recommendations"), f"{label}: the injected failure did not fail the run")
+    await acheck_no_secret(workflow.get_async_app(), label, path if kind == "sqlite" else None)
+    resumes = WORKFLOW_RESUMES.value(node="general_agent_llm")
+    result = await workflow.arun_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="async-1")
+    check(result.get("recommendations"), f"{label}: the retry did not succeed: {result}")
+    check(WORKFLOW_RESUMES.value(node="general_agent_llm") == resumes + 1, f"{label}: the retry did not resume")
+    print(f"ok  {label}")
+
+async def check_second_loop(kind, label):
+    # Run after check_async's asyncio.run() has ended: the same graph, called from a new loop
+    result = await workflow.arun_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="async-2")
+    check(result.get("recommendations"), f"{label}: a run on a second event loop failed: {result}")
+    print(f"ok  {label}")
+    await workflow.aclose_checkpointers()  # Before this loop ends, so the aiosqlite close can report back to it
+
+def check_request_ids(kind, path):
+    label = f"{kind}/request-ids"
+    configure(kind, path)
+    # Another worker (sqlite) or another thread (memory) is running request "busy"
+    other = RunRegistry(path) if kind == "sqlite" else workflow._run_registry(False)
+    check(other.claim("busy"), f"{label}: a free request id could not be claimed")
+    result = workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="busy")
+    check("in progress" in (result.get("error") or ""), f"{label}: a request id in use was not refused: {result}")
+    other.release("busy", keep=False)
+    set_gemini_model(API_KEY, FailFirstModel(latency_seconds=0.0))
+    result = workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="busy")
+    check("in progress" not in (result.get("error") or ""), f"{label}: a released request id stayed refused: {result}")
+
+    # A failed run kept past its TTL is deleted by the next run's sweep
+    registry = workflow._run_registry(False)
+    registry.ttl_seconds = 0.0
+    registry.sweep_seconds = 0.0
+    set_gemini_model(API_KEY, FailFirstModel(latency_seconds=0.0))
+    workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="expired-1")
+    workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False)
+    config = {"configurable": {"thread_id": "expired-1"}}
+    check(not workflow.get_app().get_state(config).values, f"{label}: an expired run kept its checkpoints")
+    check(other.claim("expired-1"), f"{label}: an expired run's request id stayed claimed")
+    if kind == "sqlite":
+        other.close()
+    print(f"ok  {label}")
+
+def check_fork(kind, path):
+    label = f"{kind}/fork"
+    configure(kind, path)
+    parent_checkpointer = workflow.get_app().checkpointer  # What app.warm_up does in the gunicorn master
+    pid = os.fork()
+    if pid == 0:
+        set_gemini_model(API_KEY, FailFirstModel(latency_seconds=0.0))
+        failed = workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="fork-1")
+        result = workflow.run_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="fork-1")
+        fresh = workflow.get_app().checkpointer is not parent_checkpointer
+        os._exit(0 if fresh and not failed.get("recommendations") and result.get("recommendations") else 1)
+    _, status = os.waitpid(pid, 0)
+    check(status == 0, f"{label}: the forked worker did not resume on a checkpointer of its own")
+    print(f"ok  {label}")
+
+# Two asyncio.run() calls, each with its own loop and so its own AsyncSqliteSaver connection
+EXIT_SCRIPT = """
+import asyncio, logging
+logging.disable(logging.WARNING)
+import workflow
+from tools.agent_registry import set_gemini_model
+from benchmarks.fakes import FakeGeminiModel
+from benchmarks.check_checkpointing import API_KEY, PREFERENCES
+set_gemini_model(API_KEY, FakeGeminiModel(latency_seconds=0.0))
+
+async def stream():
+    return [event async for event in workflow.astream_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="exit-2")]
+
+assert asyncio.run(workflow.arun_sneaker_workflow(PREFERENCES, API_KEY, use_cache=False, request_id="exit-1"))["recommendations"]
+assert asyncio.run(stream())[-1]["result"]["recommendations"]
+"""
+
+def check_exit(path, timeout=60):
+    label = "sqlite/async/exit"
+    env = {**os.environ, "SNEAKER_CHECKPOINTER": "sqlite", "SNEAKER_CHECKPOINT_PATH": path}
+    try:
+        done = subprocess.run([sys.executable, "-c", EXIT_SCRIPT], env=env, timeout=timeout, capture_output=True, text=True)
+    except subprocess.TimeoutExpired:
+        check(False, f"{label}: the script did not exit within {timeout}s after its runs")
+    check(done.returncode == 0, f"{label}: the script failed: {done.stderr[-2000:]}")
+    print(f"ok  {label}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume and secret-handling checks for the workflow checkpointers")
+    parser.add_argument("--checkpointers", nargs="+", default=["memory", "sqlite"], choices=["memory", "sqlite"])
+    parser.add_argument("--columnar", action="store_true", help="Also check with SNEAKER_COLUMNAR_STATE=1")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # The injected failures log warnings
+    with tempfile.TemporaryDirectory() as tmp:
+        for columnar in ("0", "1") if args.columnar else ("0",):
+            os.environ["SNEAKER_COLUMNAR_STATE"] = columnar
+            for kind in args.checkpointers:
+                check_sync(kind, os.path.join(tmp, f"sync-{columnar}.sqlite"))
+                asyncio.run(check_async(kind, os.path.join(tmp, f"async-{columnar}.sqlite")))
+                asyncio.run(check_second_loop(kind, f"{kind}/async/second-loop"))
+        for kind in args.checkpointers:
+            check_request_ids(kind, os.path.join(tmp, "request-ids.sqlite"))
+            check_fork(kind, os.path.join(tmp, "fork.sqlite"))
+        if "sqlite" in args.checkpointers:
+            check_exit(os.path.join(tmp, "exit.sqlite"))
+        workflow.close_checkpointers()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# A local stand-in for the Gemini REST API (generateContent + cachedContents) and a minimal client for it,
+# so prompt bytes are measured on the wire and context caching behaves like the provider's: a cached prefix
+# is uploaded once and each call only sends what follows it.
+import asyncio
+import itertools
+import json
+import re
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Dict, List, Optional
+
+from tools.context_cache import GeminiContextCache
+from benchmarks.fakes import FakeGeminiModel, FakeResponse, FakeUsage
+
+SHORTLIST = re.compile(r"Shortlist \(segment catalog ids\): ([0-9, ]*)")
+
+def _text(content: Any) -> str:
+    return "".join(part.get("text", "") for part in (content or {}).get("parts", []))
+
+class FakeGeminiServer:
+    """Answers like FakeGeminiModel (first `picks` candidates), after a latency that grows with the prompt.
+
+    Uncached prompt bytes cost `latency_per_kb`; bytes served from a cached content cost `cached_latency_per_kb`.
+    """
+
+    def __init__(self, latency_seconds: float = 0.05, latency_per_kb: float = 0.004, cached_latency_per_kb: float = 0.001,
+                 picks: int = 3):
+        self.latency_seconds = latency_seconds
+        self.latency_per_kb = latency_per_kb
+        self.cached_latency_per_kb = cached_latency_per_kb
+        self.picks = picks
+        self.bytes_received = 0
+        self.upload_bytes = 0  # Of bytes_received, the cachedContents uploads
+        self.generate_calls = 0
+        self.caches_created = 0
+        self._caches: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "FakeGeminiServer":
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.bytes_received = self.upload_bytes = self.generate_calls = self.caches_created = 0
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                upload = self.path.endswith("/cachedContents")
+                with server._lock:
+                    server.bytes_received += len(raw)
+                    server.upload_bytes += len(raw) if upload else 0
+                body = json.loads(raw)
+                if upload:
+                    reply = server._create_cache(body)
+                else:
+                    reply = server._generate(body)
+                payload = json.dumps(reply).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _create_cache(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        text = "\n".join([_text(body.get("systemInstruction")), *(_text(content) for content in body.get("contents", []))])
+        time.sleep(self.latency_seconds + self.latency_per_kb * len(text.encode("utf-8")) / 1024)
+        # The segment catalog's entries, by id, for resolving shortlists later
+        catalog = {entry["id"]: entry for entry in FakeGeminiModel._candidates(text.replace("Segment Catalog", "Available Sneakers"))
+                   if "id" in entry}
+        name = f"cachedContents/{next(self._ids)}"
+        with self._lock:
+            self._caches[name] = {"text": text, "catalog": catalog}
+            self.caches_created += 1
+        return {"name": name, "usageMetadata": {"totalTokenCount": len(text) // 4}}
+
+    def _generate(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        sent = "\n".join([_text(body.get("systemInstruction")), *(_text(content) for content in body.get("contents", []))])
+        cache = self._caches.get(body.get("cachedContent") or "")
+        cached_text = cache["text"] if cache else ""
+        time.sleep(self.latency_seconds + self.latency_per_kb * len(sent.encode("utf-8")) / 1024
+                   + self.cached_latency_per_kb * len(cached_text.encode("utf-8")) / 1024)
+        shortlist = SHORTLIST.search(sent)
+        candidates = []
+        if cache and shortlist:
+            candidates = [cache["catalog"][int(i)] for i in shortlist.group(1).split(",") if i.strip() and int(i) in cache["catalog"]]
+        candidates += FakeGeminiModel._candidates(sent)
+        picks = [{key: s.get(key) for key in ("name", "brand", "price", "url", "image_url")} | {"reason": "Matches the request."}
+                 for s in candidates[: self.picks]]
+        text = "```json\n" + json.dumps(picks) + "\n```"
+        with self._lock:
+            self.generate_calls += 1
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}],
+            "usageMetadata": {"promptTokenCount": (len(sent) + len(cached_text)) // 4, "candidatesTokenCount": len(text) // 4,
+                              "totalTokenCount": (len(sent) + len(cached_text) + len(text)) // 4,
+                              "cachedContentTokenCount": len(cached_text) // 4},
+        }
+
+class GeminiRestModel:
+    """Just enough of GenerativeModel over REST: generate_content(_async) without streaming."""
+
+    def __init__(self, base_url: str, model_name: str, system_instruction: Optional[str] = None,
+                 cached_content: Optional[str] = None):
+        self.base_url = base_url
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+
+    def _post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        request = urllib.request.Request(f"{self.base_url}{path}", data=json.dumps(body).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    def generate_content(self, contents: Any, stream: bool = False) -> FakeResponse:
+        parts = [contents] if isinstance(contents, str) else list(contents)
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": part} for part in parts]}]}
+        if self.system_instruction:
+            body["systemInstruction"] = {"parts": [{"text": self.system_instruction}]}
+        if self.cached_content:
+            body["cachedContent"] = self.cached_content
+        reply = self._post(f"/v1beta/models/{self.model_name}:generateContent", body)
+        response = FakeResponse(_text(reply["candidates"][0]["content"]))
+        usage = reply["usageMetadata"]
+        response.usage_metadata = FakeUsage(usage["promptTokenCount"], usage["candidatesTokenCount"])
+        response.usage_metadata.cached_content_token_count = usage.get("cachedContentTokenCount", 0)
+        return response
+
+    async def generate_content_async(self, contents: Any, stream: bool = False) -> FakeResponse:
+        return await asyncio.to_thread(self.generate_content, contents, stream)
+
+    def create_cached_content(self, system_instruction: str, contents: List[str], ttl_seconds: float) -> str:
+        body = {"model": f"models/{self.model_name}", "systemInstruction": {"parts": [{"text": system_instruction}]},
+                "contents": [{"role": "user", "parts": [{"text": text}]} for text in contents], "ttl": f"{int(ttl_seconds)}s"}
+        return self._post("/v1beta/cachedContents", body)["name"]
+
+class RestContextCache(GeminiContextCache):
+    """GeminiContextCache with its SDK hooks pointed at the REST client above."""
+
+    def __init__(self, base: Any, rest_model: GeminiRestModel, **kwargs):
+        super().__init__(base, rest_model.model_name, **kwargs)
+        self.rest_model = rest_model
+
+    def _create_system_model(self, system_instruction: str) -> GeminiRestModel:
+        return GeminiRestModel(self.rest_model.base_url, self.model_name, system_instruction=system_instruction)
+
+    def _create_cached_model(self, system_instruction: str, contents: str, ttl_seconds: float) -> GeminiRestModel:
+        name = self.rest_model.create_cached_content(system_instruction, [contents], ttl_seconds)
+        return GeminiRestModel(self.rest_model.base_url, self.model_name, cached_content=name)
@@ -0,0 +1,122 @@
+# Stand-ins for the Gemini client so benchmarks run offline and deterministically.
+import asyncio
+import json
+import random
+import time
+from threading import Lock
+from typing import Any, Dict, Iterator, List
+
+class FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+class FakeResponse:
+    def __init__(self, text: str, prompt: str = ""):
+        self.text = text
+        # Roughly 4 bytes per token, enough for the token metrics to move like the real ones
+        self.usage_metadata = FakeUsage(len(prompt.encode("utf-8")) // 4, len(text.encode("utf-8")) // 4)
+
+class FakeStreamResponse:
+    """Streamed response: iterating yields chunks (each with .text), spreading the latency across them."""
+
+    def __init__(self, response: FakeResponse, chunk_delay: float, chunk_chars: int):
+        self._response = response
+        self._chunk_delay = chunk_delay
+        self._chunk_chars = chunk_chars
+        self.usage_metadata = response.usage_metadata
+
+    def _chunks(self) -> List[FakeResponse]:
+        text = self._response.text
+        return [FakeResponse(text[i:i + self._chunk_chars]) for i in range(0, len(text), self._chunk_chars)]
+
+    def __iter__(self) -> Iterator[FakeResponse]:
+        for chunk in self._chunks():
+            time.sleep(self._chunk_delay)
+            yield chunk
+
+    async def __aiter__(self):
+        for chunk in self._chunks():
+            await asyncio.sleep(self._chunk_delay)
+            yield chunk
+
+class FakeGeminiModel:
+    """Mimics GenerativeModel.generate_content(_async) with a fixed latency plus an optional per-KB cost.
+
+    Recommends the first `picks` sneakers listed in the prompt, so the workflow's
+    parsing and catalog join run exactly as they do against the real model.
+    `latency_jitter` adds up to that many seconds per call, drawn from `seed`, so runs stay reproducible;
+    `fenced=False` answers with bare JSON instead of a ```json block.
+    """
+
+    def __init__(self, latency_seconds: float = 0.5, picks: int = 3, latency_per_kb: float = 0.0, stream_chunk_chars: int = 64,
+                 latency_jitter: float = 0.0, seed: int = 0, reason: str = "Matches the requested style and budget.",
+                 fenced: bool = True):
+        self.latency_seconds = latency_seconds
+        self.latency_per_kb = latency_per_kb  # Models prompt-processing time growing with prompt size
+        self.stream_chunk_chars = stream_chunk_chars  # With stream=True the latency is spread over chunks of this size
+        self.latency_jitter = latency_jitter
+        self.reason = reason
+        self.fenced = fenced
+        self.picks = picks
+        self.calls = 0
+        self.prompt_bytes = 0
+        self._rng = random.Random(seed)
+        self._lock = Lock()
+
+    def _respond(self, prompt: str) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+            self.prompt_bytes += len(prompt.encode("utf-8"))
+        recommendations = [
+            {
+                "name": s["name"],
+                "brand": s["brand"],
+                "price": s["price"],
+                "url": s["url"],
+                "image_url": s.get("image_url") or "",
+                "reason": self.reason,
+            }
+            for s in self._candidates(prompt)[: self.picks]
+        ]
+        text = json.dumps(recommendations)
+        return FakeResponse("```json\n" + text + "\n```" if self.fenced else text, prompt)
+
+    @staticmethod
+    def _candidates(prompt: str) -> List[Dict[str, Any]]:
+        # The candidate list is the first line-leading JSON array after the "Available Sneakers" heading
+        marker = prompt.find("Available Sneakers")
+        start = prompt.find("\n[", marker if marker != -1 else 0)
+        if start == -1:
+            return []
+        start += 1
+        try:
+            candidates, _ = json.JSONDecoder().raw_decode(prompt, start)
+        except json.JSONDecodeError:
+            return []
+        return candidates if isinstance(candidates, list) else []
+
+    def _latency(self, prompt: str) -> float:
+        jitter = 0.0
+        if self.latency_jitter:
+            with self._lock:
+                jitter = self._rng.uniform(0, self.latency_jitter)
+        return self.latency_seconds + jitter + self.latency_per_kb * len(prompt.encode("utf-8")) / 1024
+
+    def _stream(self, prompt: str) -> FakeStreamResponse:
+        response = self._respond(prompt)
+        chunks = max(1, -(-len(response.text) // self.stream_chunk_chars))
+        return FakeStreamResponse(response, self._latency(prompt) / chunks, self.stream_chunk_chars)
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self._latency(prompt))
+        return self._respond(prompt)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False) -> Any:
+        if stream:
+            return self._stream(prompt)
+        await asyncio.sleep(self._latency(prompt))
+        return self._respond(prompt)
@@ -0,0 +1,13 @@
+# gunicorn config for benchmarks.load_serving: the production gunicorn.conf.py plus a FakeGeminiModel
+# installed in every worker after fork (FAKE_LLM_LATENCY seconds per call), so the load test runs offline.
+import os
+import runpy
+
+_base = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "gunicorn.conf.py"))
+globals().update({name: value for name, value in _base.items() if not name.startswith("__")})
+
+def post_fork(server, worker):
+    _base["post_fork"](server, worker)
+    from tools.agent_registry import set_gemini_model  # Importable once app has put AI/ on sys.path
+    from benchmarks.fakes import FakeGeminiModel
+    set_gemini_model(os.environ["GEMINI_API_KEY"], FakeGeminiModel(latency_seconds=float(os.getenv("FAKE_LLM_LATENCY", "0.1"))))
@@ -0,0 +1,80 @@
+# Load test: concurrent recommendation requests through arun_sneaker_workflow vs threads on run_sneaker_workflow.
+# Gemini is replaced by FakeGeminiModel with injected latency, so this runs offline.
+# Run from the AI/ directory:  python -m benchmarks.load_async_workflow --concurrency 10 100 500 --latency 1.0
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Every request should reach the (fake) LLM, so the rule-based fast path is switched off
+os.environ.setdefault("SNEAKER_FAST_PATH_ENABLED", "0")
+
+import workflow
+from tools.general_agent import GeneralAgent
+from benchmarks.fakes import FakeGeminiModel
+
+PREFERENCES = {
+    "preferred_brands": ["Nike", "Adidas", "Puma"],
+    "gender_age_group": "male",
+    "budget_range": (10.0, 520.0),
+    "style": "casual",
+    "color": "black",
+    "use_case": "daily wear",
+}
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def report(label, concurrency, wall, latencies):
+    print(f"{label:>7} {concurrency:>6} {wall:>9.2f} {concurrency / wall:>9.1f} "
+          f"{statistics.median(latencies):>9.3f} {percentile(latencies, 99):>9.3f}")
+
+async def run_async(concurrency):
+    async def one():
+        start = time.perf_counter()
+        result = await workflow.arun_sneaker_workflow(PREFERENCES, "fake-key", use_cache=False)
+        assert result.get("recommendations"), result
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+def run_threads(concurrency, workers):
+    def one(_):
+        start = time.perf_counter()
+        result = workflow.run_sneaker_workflow(PREFERENCES, "fake-key", use_cache=False)
+        assert result.get("recommendations"), result
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(one, range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Async workflow load test with a fake LLM")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--latency", type=float, default=1.0, help="Injected LLM latency in seconds")
+    parser.add_argument("--threads", type=int, default=16, help="Worker threads for the sync baseline")
+    args = parser.parse_args()
+
+    model = FakeGeminiModel(latency_seconds=args.latency)
+    # Nodes resolve GeneralAgent at call time, so swapping the module attribute injects the fake
+    workflow.GeneralAgent = lambda api_key: GeneralAgent(api_key, model=model)
+
+    print(f"{'mode':>7} {'reqs':>6} {'wall (s)':>9} {'req/s':>9} {'p50 (s)':>9} {'p99 (s)':>9}")
+    for concurrency in args.concurrency:
+        with contextlib.redirect_stdout(io.StringIO()):  # The workflow prints per node
+            async_wall, async_latencies = asyncio.run(run_async(concurrency))
+            sync_wall, sync_latencies = run_threads(concurrency, args.threads)
+        report("async", concurrency, async_wall, async_latencies)
+        report(f"sync/{args.threads}", concurrency, sync_wall, sync_latencies)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Load test of the production serving mode: req/s and latency of GET /recommendations as gunicorn workers are added.
+# Starts gunicorn with benchmarks/gunicorn_fake_llm.conf.py (the real config plus a fake LLM), so it runs offline;
+# the catalog is the in-memory one unless SHOES_DATA_SOURCE says otherwise.
+# Run from the AI/ directory:  python -m benchmarks.load_serving --workers 1 2 4 --threads 1 --concurrency 16
+import argparse
+import http.client
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CONFIG = os.path.join(ROOT, "AI", "benchmarks", "gunicorn_fake_llm.conf.py")
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def start_server(port, workers, threads, llm_latency):
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "SHOES_WEB_THREADS": str(threads), "SHOES_WEB_BIND": f"127.0.0.1:{port}",
+           "FAKE_LLM_LATENCY": str(llm_latency), "GEMINI_API_KEY": "fake-key", "SHOES_DB_POOL_MIN": "0",
+           "SNEAKER_FAST_PATH_ENABLED": "0", "SNEAKER_LOG_LEVEL": "ERROR",
+           "GEMINI_RATE_PER_SECOND": "0"}  # The provider quota is not what this measures
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", CONFIG, "app:app"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/healthz")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not come up")
+
+def run_load(port, concurrency, duration):
+    deadline = time.monotonic() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        latencies, errors = [], 0
+        while time.monotonic() < deadline:
+            # A different budget per request, so the recommendation cache doesn't answer for the workflow
+            path = f"/recommendations?brands=Nike,Adidas,Puma&gender=male&min_price=0&max_price={rng.uniform(200, 1000):.2f}"
+            start = time.perf_counter()
+            # A connection per request: a kept-alive connection stays pinned to whichever worker accepted it
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            try:
+                conn.request("GET", path, headers={"Connection": "close"})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except OSError:
+                ok = False
+            finally:
+                conn.close()
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(client, range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+    return wall, latencies, sum(errors for _, errors in results)
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn serving load test with a fake LLM")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=1, help="Threads per worker (SHOES_WEB_THREADS)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per worker count")
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.threads} thread(s)/worker, {args.concurrency} clients, LLM latency {args.llm_latency:g}s")
+    print(f"{'workers':>8} {'requests':>9} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+    for workers in args.workers:
+        server = start_server(args.port, workers, args.threads, args.llm_latency)
+        try:
+            wall, latencies, errors = run_load(args.port, args.concurrency, args.duration)
+        finally:
+            server.terminate()  # SIGTERM: the graceful drain path
+            server.wait(timeout=60)
+        print(f"{workers:>8} {len(latencies):>9} {len(latencies) / wall:>8.1f} {statistics.median(latencies) * 1000:>9.1f} "
+              f"{percentile(latencies, 99) * 1000:>9.1f} {errors:>7}")
+
+if __name__ == "__main__":
+    main()
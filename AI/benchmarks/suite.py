@@ -0,0 +1,271 @@
+# End-to-end benchmark suite: one JSON document per run, comparable across commits.
+# Scenarios: the whole workflow, each node alone (through the same tracing wrapper the graph uses),
+# merge_brand_data_dicts, AggregatorAgent.aggregate_sneakers and GET /recommendations through Flask.
+# Every scenario runs in a fresh interpreter, so its peak RSS is its own; the catalog is synthetic
+# (--catalog rows, --brands, --brand-skew, --gender-weights) and the LLM is FakeGeminiModel.
+# Per scenario: p50/p95/p99/mean latency, throughput (operations/s over the timed loop) and peak RSS.
+# Run from the AI/ directory:
+#   python -m benchmarks.suite --catalog 20000 --out results.json
+#   python -m benchmarks.suite --scenarios workflow aggregate_sneakers --compare results.json --threshold 0.15
+# With --compare, a scenario whose p95 grew or whose throughput fell by more than --threshold is
+# reported as a regression and the exit status is 1.
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Tuple
+
+os.environ.setdefault("SNEAKER_FAST_PATH_ENABLED", "0")  # Measure the LLM path unless asked otherwise
+os.environ.setdefault("GEMINI_RATE_PER_SECOND", "1000")  # The fake LLM doesn't need the production rate limit
+
+from benchmarks.load_serving import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+API_KEY = "fake-key"
+STYLES = ["casual", "sporty", "retro"]
+COLORS = ["black", "white", "red"]
+USE_CASES = ["running", "daily wear", "basketball"]
+
+def preference_sets(brands: List[str], count: int = 24) -> List[Dict[str, Any]]:
+    # A fixed rotation of requests: one to three brands, every gender, a few budgets and tastes
+    genders = ["male", "female", "kid"]
+    budgets = [(50.0, 150.0), (100.0, 300.0), (20.0, 600.0)]
+    return [{
+        "preferred_brands": [brands[(i + j) % len(brands)] for j in range(1 + i % 3)],
+        "gender_age_group": genders[i % 3],
+        "budget_range": budgets[(i // 3) % 3],
+        "style": STYLES[i % 3], "color": COLORS[(i // 2) % 3], "use_case": USE_CASES[(i // 4) % 3],
+    } for i in range(count)]
+
+# --- Scenarios: setup(options) returns the operation to time, called with the iteration number ---
+
+def _install(options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Catalog, brand registry and fake LLM for this process; returns the request rotation
+    from tools.agent_registry import set_gemini_model
+    from tools.brand_registry import BrandRegistry, set_brand_registry
+    from tools.catalog_index import CatalogIndex
+    from tools.data_source import InMemorySneakerSource, set_sneaker_source
+    from benchmarks.fakes import FakeGeminiModel
+    from benchmarks.synthetic import brand_names, make_catalog
+
+    brands = brand_names(options["brands"])
+    catalog = make_catalog(options["catalog"], seed=options["seed"], brands=brands, brand_skew=options["brand_skew"],
+                           gender_weights=options["gender_weights"])
+    set_sneaker_source(InMemorySneakerSource(CatalogIndex(catalog)))
+    set_brand_registry(BrandRegistry(brands))
+    set_gemini_model(API_KEY, FakeGeminiModel(latency_seconds=options["llm_latency"], latency_jitter=options["llm_jitter"],
+                                              picks=options["picks"], seed=options["seed"]))
+    return preference_sets(brands)
+
+def _node_states(preferences: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    # The state each node sees in a run of the graph, built by running the nodes in order
+    import workflow
+    from tools.state_management import merge_brand_data_dicts
+
+    states = {"brand_selector": workflow._initial_state(preferences, API_KEY)}
+    selected = {**states["brand_selector"], **workflow.brand_selector_node(states["brand_selector"])}
+    states["brand_collector"] = selected
+    collected = dict(selected)
+    for brand in selected["selected_brands"]:
+        delta = workflow.brand_collector_node({"user_preferences": preferences, "brand": brand})
+        collected["brand_data"] = merge_brand_data_dicts(collected["brand_data"], delta.get("brand_data", {}))
+        collected["incomplete_brands"] = collected["incomplete_brands"] + delta.get("incomplete_brands", [])
+    states["aggregator"] = collected
+    states["pre_ranker"] = {**collected, **workflow.aggregator_node(collected)}
+    ranked = {**states["pre_ranker"], **workflow.pre_ranker_node(states["pre_ranker"])}
+    states["fast_path_recommender"] = states["general_agent_llm"] = ranked
+    return states
+
+def setup_workflow(options: Dict[str, Any]) -> Callable[[int], Any]:
+    import workflow
+    requests = _install(options)
+    workflow.get_app()  # Compile outside the timed loop
+    return lambda i: workflow.run_sneaker_workflow(requests[i % len(requests)], API_KEY, use_cache=False)
+
+def _setup_node(name: str) -> Callable[[Dict[str, Any]], Callable[[int], Any]]:
+    def setup(options: Dict[str, Any]) -> Callable[[int], Any]:
+        import workflow
+        from tools.tracing import traced_node
+        requests = _install(options)
+        states = [_node_states(preferences) for preferences in requests]
+        node = {
+            "brand_selector": workflow.brand_selector_node,
+            "aggregator": workflow.aggregator_node,
+            "pre_ranker": workflow.pre_ranker_node,
+            "fast_path_recommender": workflow.fast_path_node,
+            "general_agent_llm": workflow.general_agent_node,
+        }.get(name)
+        if node is not None:
+            node = traced_node(name, node)
+            return lambda i: node(states[i % len(states)][name])
+        # brand_collector runs once per brand (a Send task each); one operation is one brand's task
+        collect = traced_node(name, workflow.brand_collector_node)
+        tasks = [{"user_preferences": state[name]["user_preferences"], "brand": brand}
+                 for state in states for brand in state[name]["selected_brands"]]
+        return lambda i: collect(tasks[i % len(tasks)])
+    return setup
+
+def setup_merge_brand_data_dicts(options: Dict[str, Any]) -> Callable[[int], Any]:
+    # The brand_data reducer folding every brand's rows of one request into the state, as the fan-in does
+    from tools.state_management import merge_brand_data_dicts
+    requests = _install(options)
+    deltas = [[{brand: rows} for brand, rows in _node_states(preferences)["aggregator"]["brand_data"].items()]
+              for preferences in requests]
+
+    def merge(i: int) -> Dict[str, Any]:
+        merged: Dict[str, Any] = {}
+        for delta in deltas[i % len(deltas)]:
+            merged = merge_brand_data_dicts(merged, delta)
+        return merged
+    return merge
+
+def setup_aggregate_sneakers(options: Dict[str, Any]) -> Callable[[int], Any]:
+    from tools.aggregator import AggregatorAgent
+    requests = _install(options)
+    agent = AggregatorAgent()
+    states = [_node_states(preferences)["aggregator"] for preferences in requests]
+    return lambda i: agent.aggregate_sneakers(states[i % len(states)])
+
+def setup_flask_recommendations(options: Dict[str, Any]) -> Callable[[int], Any]:
+    # The Flask route in-process (test client): argument parsing, the workflow and JSON encoding, no network
+    from urllib.parse import urlencode
+    requests = _install(options)
+    os.environ["GEMINI_API_KEY"] = API_KEY
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from app import app
+    import workflow
+    workflow.get_app()
+    client = app.test_client()
+    paths = [f"/recommendations?" + urlencode({
+        "brands": ",".join(p["preferred_brands"]), "gender": p["gender_age_group"],
+        "min_price": p["budget_range"][0], "max_price": p["budget_range"][1],
+        "style": p["style"], "color": p["color"], "use_case": p["use_case"],
+    }) for p in requests]
+
+    def get(i: int) -> Any:
+        response = client.get(paths[i % len(paths)])
+        assert response.status_code == 200, response.status_code
+        return response.get_json()
+    return get
+
+SCENARIOS: Dict[str, Callable[[Dict[str, Any]], Callable[[int], Any]]] = {
+    "workflow": setup_workflow,
+    **{f"node.{name}": _setup_node(name) for name in ("brand_selector", "brand_collector", "aggregator", "pre_ranker",
+                                                       "fast_path_recommender", "general_agent_llm")},
+    "merge_brand_data_dicts": setup_merge_brand_data_dicts,
+    "aggregate_sneakers": setup_aggregate_sneakers,
+    "flask.recommendations": setup_flask_recommendations,
+}
+
+def run_scenario(name: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs in its own process: setup, warm-up, then `iterations` timed operations (`concurrency` at a time)."""
+    import logging
+    logging.disable(logging.WARNING)
+    operation = SCENARIOS[name](options)
+    for i in range(options["warmup"]):
+        operation(i)
+    setup_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+    def timed(i: int) -> float:
+        start = time.perf_counter()
+        operation(i)
+        return time.perf_counter() - start
+
+    iterations = options["iterations"]
+    started = time.perf_counter()
+    if options["concurrency"] > 1:
+        with ThreadPoolExecutor(options["concurrency"]) as pool:
+            latencies = list(pool.map(timed, range(iterations)))
+    else:
+        latencies = [timed(i) for i in range(iterations)]
+    elapsed = time.perf_counter() - started
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "throughput_per_s": iterations / elapsed,
+        "setup_rss_mb": setup_rss,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Tuple[str, str, float, float]]:
+    """(scenario, metric, baseline, current) for every p95 or throughput more than `threshold` worse than the baseline."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append((name, "p95_ms", before["p95_ms"], current["p95_ms"]))
+        if current["throughput_per_s"] < before["throughput_per_s"] * (1 - threshold):
+            regressions.append((name, "throughput_per_s", before["throughput_per_s"], current["throughput_per_s"]))
+    return regressions
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Workflow benchmark suite with JSON results")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--catalog", type=int, default=20000, help="Synthetic catalog rows")
+    parser.add_argument("--brands", type=int, default=3, help="Brands in the catalog and registry")
+    parser.add_argument("--brand-skew", type=float, default=0.0, help="Zipf exponent of rows per brand (0: uniform)")
+    parser.add_argument("--gender-weights", type=float, nargs=3, metavar=("MALE", "FEMALE", "KID"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Extra seeded LLM latency, uniform in [0, jitter]")
+    parser.add_argument("--picks", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--out", help="Write the results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline results JSON to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    options = {key: getattr(args, key) for key in ("catalog", "brands", "brand_skew", "gender_weights", "seed", "llm_latency",
+                                                   "llm_jitter", "picks", "iterations", "warmup", "concurrency")}
+    results = {"commit": _git_commit(), "python": platform.python_version(), "timestamp": time.time(),
+               "options": options, "scenarios": {}}
+    for name in args.scenarios:
+        # A fresh interpreter per scenario: its imports, catalog and caches don't leak into the next one's RSS
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            stats = pool.submit(run_scenario, name, options).result()
+        results["scenarios"][name] = stats
+        print(f"{name:>32} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  p99 {stats['p99_ms']:>9.3f} ms  "
+              f"{stats['throughput_per_s']:>10.1f}/s  peak RSS {stats['peak_rss_mb']:>7.1f} MB", file=sys.stderr)
+
+    document = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("options") != options:
+            print(f"warning: {args.compare} was run with other options: {baseline.get('options')}", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.3f} -> {after:.3f}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# Synthetic sneaker catalogs shaped like the Sneaker TypedDict / shoes table.
+import random
+from typing import List, Optional, Sequence
+
+from tools.state_management import Sneaker
+
+BRANDS = ["Nike", "Adidas", "Puma"]
+GENDERS = ["male", "female", "kid"]
+COLORS = ["black", "white", "red", "blue", "grey", "green", "pink", "beige"]
+STYLES = ["casual", "sporty", "retro", "minimalist", "chunky", "classic", "street"]
+USE_CASES = ["running", "daily wear", "gym", "basketball", "skateboarding", "walking", "tennis"]
+MATERIALS = ["mesh", "suede", "leather", "knit", "canvas", "synthetic"]
+
+def brand_names(count: int) -> List[str]:
+    """The three real brands first, then Brand03, Brand04, ... up to `count`."""
+    return BRANDS[:count] + [f"Brand{i:02d}" for i in range(len(BRANDS), count)]
+
+def zipf_weights(count: int, skew: float) -> List[float]:
+    # Rank r gets 1 / r**skew: 0 is uniform, 1 gives the first entry about as many rows as the next two together
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+def make_catalog(n_rows: int, seed: int = 42, brands: Sequence[str] = BRANDS, brand_skew: float = 0.0,
+                 gender_weights: Optional[Sequence[float]] = None) -> List[Sneaker]:
+    """`n_rows` sneakers spread over `brands` (Zipf-skewed by `brand_skew`) and GENDERS (by `gender_weights`).
+    The defaults produce the same catalog for a given seed as before the skew options existed."""
+    rng = random.Random(seed)
+    brand_weights = zipf_weights(len(brands), brand_skew) if brand_skew else None
+    catalog = []
+    for i in range(n_rows):
+        brand = rng.choices(brands, brand_weights)[0] if brand_weights else rng.choice(brands)
+        color, style, use_case, material = rng.choice(COLORS), rng.choice(STYLES), rng.choice(USE_CASES), rng.choice(MATERIALS)
+        catalog.append(Sneaker(
+            brand=brand,
+            name=f"{brand} {style.title()} {material.title()} {i}",
+            price=round(rng.uniform(20.0, 600.0), 2),
+            url=f"https://example.com/{brand.lower()}/sneaker-{i}",
+            gender=rng.choices(GENDERS, gender_weights)[0] if gender_weights else rng.choice(GENDERS),
+            description=f"A {color} {style} sneaker with a breathable {material} upper, built for {use_case} with a cushioned midsole.",
+            image_url=f"https://example.com/{brand.lower()}/sneaker-{i}.jpg",
+        ))
+    return catalog
@@ -1,5 +1,6 @@
 import os
-from workflow import run_sneaker_workflow, UserPreferences
+from workflow import stream_sneaker_workflow, UserPreferences
+from tools.tracing import configure_logging
 
 # Example: Get user preferences from a hypothetical frontend or input mechanism
 def get_user_input() -> UserPreferences:
@@ -18,7 +19,19 @@ def get_user_input() -> UserPreferences:
     print(f"User preferences: {preferences}")
     return preferences
 
+def display_recommendation(number: int, rec) -> None:
+    print(f"\nRecommendation #{number}:")
+    print(f"  Name: {rec['name']}")
+    print(f"  Brand: {rec['brand']}")
+    print(f"  Price: ${rec['price']:.2f}")
+    print(f"  URL: {rec['url']}")
+    if rec.get('image_url'):
+        print(f"  Image: {rec['image_url']}")
+    print(f"  Reason: {rec['reason']}")
+
 def main():
+    # Agent/node logs are off (WARNING) unless SNEAKER_LOG_LEVEL=INFO or DEBUG (DEBUG also logs the full prompt)
+    configure_logging()
     print("--- Starting MargoAI Sneaker Advisor --- ")
     
     # --- Configuration ---
@@ -42,25 +55,21 @@ def main():
 
     # --- Run the Sneaker Advisor Workflow ---
     print("\n--- Invoking Sneaker Advisor Workflow ---")
-    results = run_sneaker_workflow(preferences=user_prefs, gemini_api_key=gemini_api_key)
-
-    # --- Display Results ---
     print("\n--- MananaAI Sneaker Advisor Results ---")
-    if results.get("error"):
-        print(f"Sorry, I couldn't find recommendations due to an error: {results['error']}")
-    elif not results.get("recommendations"):
-        print("Sorry, I couldn't find any sneakers that match your exact preferences this time. Try adjusting your criteria!")
-    else:
-        print("Here are your top sneaker recommendations:")
-        for i, rec in enumerate(results["recommendations"]):
-            print(f"\nRecommendation #{i+1}:")
-            print(f"  Name: {rec['name']}")
-            print(f"  Brand: {rec['brand']}")
-            print(f"  Price: ${rec['price']:.2f}")
-            print(f"  URL: {rec['url']}")
-            if rec.get('image_url'):
-                print(f"  Image: {rec['image_url']}")
-            print(f"  Reason: {rec['reason']}")
+    # Each recommendation is displayed as soon as the LLM has written it, not after the whole response
+    shown = 0
+    for event in stream_sneaker_workflow(preferences=user_prefs, gemini_api_key=gemini_api_key):
+        if "recommendation" in event:
+            if shown == 0:
+                print("Here are your top sneaker recommendations:")
+            shown += 1
+            display_recommendation(shown, event["recommendation"])
+            continue
+        results = event["result"]
+        if results.get("error"):
+            print(f"Sorry, I couldn't find recommendations due to an error: {results['error']}")
+        elif not results.get("recommendations"):
+            print("Sorry, I couldn't find any sneakers that match your exact preferences this time. Try adjusting your criteria!")
     
     print("\n--- MargoAI Session Ended ---")
 
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from threading import Event, Lock
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GEMINI_MODEL = "gemini-1.5-flash" # Using a cost-effective and capable model
+
+class TokenBucket:
+    """Token-bucket rate limit shared by threads and asyncio tasks.
+
+    Each caller reserves a token up front (the balance may go negative) and then waits out
+    its own deficit, so queued callers are released in order at `rate` per second.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def _reserve(self) -> float:
+        # Returns how long the caller must wait before its reserved token is available
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class ConcurrencyLimiter:
+    """FIFO semaphore usable from threads (acquire) and from any event loop (aacquire).
+
+    A threading.Semaphore would block the event loop and an asyncio.Semaphore is tied to one
+    loop, so waiters of both kinds share one queue and are woken in arrival order.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._in_use = 0
+        self._waiters: Deque[Callable[[], bool]] = deque()  # wake callbacks; False if the waiter already gave up
+        self._lock = Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._in_use < self.limit and not self._waiters:
+                self._in_use += 1
+                return
+            event = Event()
+
+            def wake() -> bool:
+                event.set()
+                return True
+            self._waiters.append(wake)
+        event.wait()  # The releaser hands its slot over, so _in_use is already counted for us
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_use < self.limit and not self._waiters:
+                self._in_use += 1
+                return
+            future = loop.create_future()
+            granted = [False]
+
+            def wake() -> bool:  # Called by release() with self._lock held
+                if future.done():  # Cancelled while queued
+                    return False
+                granted[0] = True
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+                return True
+            self._waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                handed_over = granted[0]
+            if handed_over:  # Cancelled after a releaser handed us its slot: pass it on instead of leaking it
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                if self._waiters.popleft()():
+                    return  # Slot handed over to the next waiter
+            self._in_use -= 1
+
+class _SlotHoldingStream:
+    """A streamed response that keeps its concurrency slot until the caller has read (or closed) it."""
+
+    def __init__(self, response: Any, release: Callable[[], None]):
+        self._response = response
+        self._release = release
+        self._released = False
+
+    def close(self) -> None:
+        if not self._released:
+            self._released = True
+            self._release()
+
+    def __iter__(self):
+        try:
+            yield from self._response
+        finally:
+            self.close()
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._response:
+                yield chunk
+        finally:
+            self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        # text, usage_metadata, ... come from the underlying response
+        return getattr(self._response, name)
+
+class RateLimitedModel:
+    """Wraps a Gemini GenerativeModel so every call goes through the concurrency limit and rate limit.
+
+    Exposes the same generate_content / generate_content_async methods, so GeneralAgent can't tell
+    it apart from the bare model. Calls over the limits queue here instead of getting provider 429s.
+    With stream=True the slot is held until the stream has been consumed.
+    """
+
+    def __init__(self, model: Any, limiter: ConcurrencyLimiter, bucket: Optional[TokenBucket] = None):
+        self.model = model
+        self.limiter = limiter
+        self.bucket = bucket
+
+    def derive(self, model: Any) -> "RateLimitedModel":
+        # Another client of the same account (e.g. bound to a cached prompt prefix): same limits, same quota
+        return RateLimitedModel(model, self.limiter, self.bucket)
+
+    def _hand_out(self, response: Any, stream: bool) -> Any:
+        if stream:
+            return _SlotHoldingStream(response, self.limiter.release)
+        self.limiter.release()
+        return response
+
+    def generate_content(self, *args, **kwargs) -> Any:
+        self.limiter.acquire()
+        try:
+            if self.bucket is not None:
+                self.bucket.acquire()
+            response = self.model.generate_content(*args, **kwargs)
+        except BaseException:
+            self.limiter.release()
+            raise
+        return self._hand_out(response, kwargs.get("stream", False))
+
+    async def generate_content_async(self, *args, **kwargs) -> Any:
+        await self.limiter.aacquire()
+        try:
+            if self.bucket is not None:
+                await self.bucket.aacquire()
+            response = await self.model.generate_content_async(*args, **kwargs)
+        except BaseException:
+            self.limiter.release()
+            raise
+        return self._hand_out(response, kwargs.get("stream", False))
+
+# --- Process-wide registries ---
+# Limits come from the environment so they can match the provider quota per deployment:
+# GEMINI_MAX_CONCURRENCY (in-flight calls), GEMINI_RATE_PER_SECOND and GEMINI_RATE_BURST (token bucket; rate 0 disables it).
+
+_models: Dict[Tuple[str, str], RateLimitedModel] = {}
+_context_caches: Dict[Tuple[str, str], Any] = {}  # Guarded by _models_lock, like the models they derive from
+_models_lock = Lock()
+_agents: Dict[Tuple[Any, Tuple[Hashable, ...]], Any] = {}
+_agents_lock = Lock()  # Separate from _models_lock: building a GeneralAgent looks up its model
+
+def _limits_from_env() -> Tuple[ConcurrencyLimiter, Optional[TokenBucket]]:
+    limiter = ConcurrencyLimiter(int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")))
+    rate = float(os.getenv("GEMINI_RATE_PER_SECOND", "5"))
+    burst = float(os.getenv("GEMINI_RATE_BURST", "10"))
+    return limiter, TokenBucket(rate, burst) if rate > 0 else None
+
+def get_gemini_model(api_key: str, model_name: str = DEFAULT_GEMINI_MODEL) -> RateLimitedModel:
+    """One rate-limited client per (api_key, model), built on first use and shared by all threads and tasks."""
+    key = (api_key, model_name)
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                # Imported here: the SDK is slow to import and only needed once a node actually calls Gemini
+                import google.generativeai as genai
+                # The SDK keeps the key in global config, so configuring happens once per key under the lock
+                genai.configure(api_key=api_key)
+                model = _models[key] = RateLimitedModel(genai.GenerativeModel(model_name), *_limits_from_env())
+                if os.getenv("GEMINI_CONTEXT_CACHE", "1") == "1":
+                    from .context_cache import GeminiContextCache
+                    _context_caches[key] = GeminiContextCache(model, model_name)
+                logger.info("AgentRegistry: Created Gemini client for model %s.", model_name)
+    return model
+
+def get_context_cache(api_key: str, model_name: str = DEFAULT_GEMINI_MODEL) -> Optional[Any]:
+    """The prompt-prefix cache for (api_key, model), or None when the client has none (fakes, GEMINI_CONTEXT_CACHE=0)."""
+    get_gemini_model(api_key, model_name)
+    return _context_caches.get((api_key, model_name))
+
+def set_gemini_model(api_key: str, model: Optional[Any], model_name: str = DEFAULT_GEMINI_MODEL,
+                     context_cache: Optional[Any] = None) -> None:
+    """Registers a pre-built client (e.g. a fake in benchmarks) for (api_key, model). None drops it.
+
+    `context_cache` is a GeminiContextCache-like object for that client, or None for a client without one.
+    A callable gets the registered RateLimitedModel, for caches that derive clients from it.
+    """
+    key = (api_key, model_name)
+    with _models_lock:
+        _context_caches.pop(key, None)
+        if model is None:
+            _models.pop(key, None)
+            return
+        model = _models[key] = model if isinstance(model, RateLimitedModel) else RateLimitedModel(model, *_limits_from_env())
+        if context_cache is not None:
+            _context_caches[key] = context_cache(model) if callable(context_cache) else context_cache
+
+def get_agent(factory: Callable[..., Any], *args: Hashable) -> Any:
+    """Memoised agent instance per (factory, args), e.g. get_agent(GeneralAgent, api_key).
+
+    Agents hold no per-request state, so one instance serves every node invocation.
+    """
+    key = (factory, args)
+    agent = _agents.get(key)
+    if agent is None:
+        with _agents_lock:
+            agent = _agents.get(key)
+            if agent is None:
+                agent = _agents[key] = factory(*args)
+    return agent
+
+def _reset_after_fork() -> None:
+    # gRPC channels don't survive fork: each worker process builds its own Gemini clients (and the agents holding them)
+    global _models, _context_caches, _models_lock, _agents, _agents_lock
+    _models, _context_caches, _models_lock, _agents, _agents_lock = {}, {}, Lock(), {}, Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def clear_registry() -> None:
+    with _models_lock:
+        _models.clear()
+        _context_caches.clear()
+    with _agents_lock:
+        _agents.clear()
@@ -1,25 +1,84 @@
 
-from typing import Dict, Any, List
-from .state_management import AgentState, Sneaker
+import logging
+from typing import Dict, Any, Iterable, List, Sequence
+from .state_management import AgentState, Sneaker, SneakerIndex
+from .sneaker_table import BRAND_CODES, SneakerTable
+
+logger = logging.getLogger(__name__)
+
+def sneaker_key(brand: str, name: str) -> str:
+    # Case- and whitespace-insensitive, so "Nike Air Max 270" from the LLM still finds "nike  air max 270"
+    return f"{' '.join(brand.casefold().split())}\x1f{' '.join(name.casefold().split())}"
+
+def build_sneaker_index(sneakers: Iterable[Sneaker]) -> SneakerIndex:
+    """(brand, name) and url lookups over sneakers; the first sneaker wins on duplicate keys."""
+    index: SneakerIndex = {"by_name": {}, "by_url": {}}
+    for sneaker in sneakers:
+        index["by_name"].setdefault(sneaker_key(sneaker["brand"], sneaker["name"]), sneaker)
+        if sneaker.get("url"):
+            index["by_url"].setdefault(sneaker["url"], sneaker)
+    return index
 
 class AggregatorAgent:
     def aggregate_sneakers(self, state: AgentState) -> Dict[str, Any]:
-        print("---AGENT: Aggregator---")
+        logger.debug("---AGENT: Aggregator---")
         brand_data: Dict[str, List[Sneaker]] = state.get("brand_data", {})
+        neighbours = self.semantic_neighbours(state)
+        if any(isinstance(rows, SneakerTable) for rows in brand_data.values()):
+            return self.aggregate_table(brand_data, neighbours)
         all_sneakers: List[Sneaker] = []
 
         for brand_name, sneaker_list in brand_data.items():
             if sneaker_list:
                 all_sneakers.extend(sneaker_list)
-            print(f"Aggregator: Received {len(sneaker_list) if sneaker_list else 0} sneakers from {brand_name}")
-
-        # Simple deduplication based on brand and name
-        deduplicated_sneakers_map: Dict[str, Sneaker] = {}
-        for sneaker in all_sneakers:
-            key = f"{sneaker['brand']}_{sneaker['name']}"
-            if key not in deduplicated_sneakers_map:
-                deduplicated_sneakers_map[key] = sneaker
-        
-        final_list = list(deduplicated_sneakers_map.values())
-        print(f"Aggregator: Aggregated and deduplicated to {len(final_list)} sneakers.")
-        return {"aggregated_sneakers": final_list}
+            logger.info("Aggregator: Received %s sneakers from %s", len(sneaker_list) if sneaker_list else 0, brand_name)
+        all_sneakers.extend(neighbours)  # After the collected rows, so a duplicate keeps the source's version
+
+        # Deduplication based on brand and name; the same map is kept as the state's join index
+        sneaker_index = build_sneaker_index(all_sneakers)
+        final_list = list(sneaker_index["by_name"].values())
+        logger.info("Aggregator: Aggregated and deduplicated to %s sneakers.", len(final_list))
+        return {"aggregated_sneakers": final_list, "sneaker_index": sneaker_index}
+
+    def aggregate_table(self, brand_data: Dict[str, Any], neighbours: Sequence[Sneaker] = ()) -> Dict[str, Any]:
+        # Columnar path: dedup on brand code + name only, without turning rows into dicts.
+        # The join index is left to GeneralAgent, which builds it from the (small) pre-ranked list.
+        tables = []
+        for brand_name, rows in brand_data.items():
+            if rows:
+                tables.append(SneakerTable.coerce(rows))
+            logger.info("Aggregator: Received %s sneakers from %s", len(rows) if rows else 0, brand_name)
+        if neighbours:
+            tables.append(SneakerTable.from_sneakers(list(neighbours)))
+        table = SneakerTable.concat(tables)
+
+        # Same key as sneaker_key, with the brand part normalised once per brand code instead of per row
+        brand_keys = {code: sneaker_key(BRAND_CODES.value(code), "") for code in set(table.brand_codes)}
+        seen = set()
+        keep = []
+        for position, (code, name) in enumerate(zip(table.brand_codes, table.column("name"))):
+            key = brand_keys[code] + " ".join(name.casefold().split())
+            if key not in seen:
+                seen.add(key)
+                keep.append(position)
+        aggregated = table if len(keep) == len(table) else table.take(keep)
+        logger.info("Aggregator: Aggregated and deduplicated to %s sneakers.", len(aggregated))
+        return {"aggregated_sneakers": aggregated}
+
+    def semantic_neighbours(self, state: AgentState) -> List[Sneaker]:
+        # With an embedding index loaded (SNEAKER_EMBEDDING_INDEX_DIR), the rows closest to the user's
+        # style/color/use case in their brands, gender and budget join the candidates, including ones
+        # the collectors' facet filter left out. Brands whose source failed stay out.
+        preferences = state.get("user_preferences")
+        incomplete = set(state.get("incomplete_brands") or [])
+        brands = [brand for brand in state.get("brand_data", {}) if brand not in incomplete]
+        if not preferences or not brands:
+            return []
+        try:
+            from .embedding_index import semantic_candidates  # Needs numpy; optional
+        except ImportError:
+            return []
+        neighbours = semantic_candidates(preferences, brands)
+        if neighbours:
+            logger.info("Aggregator: Received %s semantic neighbours", len(neighbours))
+        return neighbours
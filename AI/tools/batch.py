@@ -0,0 +1,146 @@
+import logging
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .state_management import Sneaker, UserPreferences
+from .selector import BrandSelectorAgent
+from .collector import BrandCollectorAgent
+from .aggregator import AggregatorAgent
+from .ranker import PreRankerAgent
+from .enrichment import Facets, matches_facets
+from .sneaker_table import SneakerTable, columnar_state_enabled
+from .general_agent import is_llm_failure
+from .retry import Backoff, NodeRetryError, retry_node
+
+logger = logging.getLogger(__name__)
+
+BatchRequest = Tuple[str, UserPreferences, List[Sneaker]]  # (request_id, preferences, candidates)
+
+DEFAULT_MAX_PROMPT_CHARS = 60_000
+DEFAULT_MAX_REQUESTS_PER_CALL = 8
+DEFAULT_MAX_CONCURRENCY = 4
+BATCH_NODE = "general_agent_batch"  # Node label of the packed LLM calls in the retry metrics
+
+class _SharedPartition:
+    """One source fetch over the union of several users' budgets, price-sorted so each user's budget is two bisects."""
+
+    def __init__(self, sneakers: Sequence[Sneaker]):
+        self.sneakers = sorted(sneakers, key=lambda s: float(s["price"]))
+        self.prices = [float(s["price"]) for s in self.sneakers]
+
+    def query(self, min_price: float, max_price: float, facets: Optional[Facets]) -> List[Sneaker]:
+        sneakers = self.sneakers[bisect_left(self.prices, min_price):bisect_right(self.prices, max_price)]
+        if facets:
+            # Same contract as the sources: no faceted match falls back to the whole budget slice
+            return [sneaker for sneaker in sneakers if matches_facets(sneaker, facets)] or sneakers
+        return sneakers
+
+def collect_candidates_shared(preferences_list: List[UserPreferences]) -> List[Dict[str, Any]]:
+    """Runs brand selection, collection and aggregation for many users with one catalog read per (brand, gender).
+
+    Each (brand, gender) is fetched once over the union of the users' budgets, through the same collector as a
+    single run (gender normalisation, per-source timeout, a failed source skipped). Every user's own budget and
+    facets are then cut out of that partition locally, with the sources' facet fallback, so a user gets the
+    candidates a single run would. Returns one partial AgentState per user.
+    """
+    selector = BrandSelectorAgent()
+    collector = BrandCollectorAgent()
+    aggregator = AggregatorAgent()
+    ranker = PreRankerAgent()
+
+    selections: List[List[str]] = []
+    filters: List[Tuple[str, float, float, Optional[Facets]]] = []
+    budget_windows: Dict[Tuple[str, str], List[float]] = {}
+    for preferences in preferences_list:
+        selected_brands = selector.select_brands({"user_preferences": preferences, "brand_data": {}})["selected_brands"]
+        selections.append(selected_brands)
+        gender, min_price, max_price, facets = collector.request_filters(preferences)
+        filters.append((gender, min_price, max_price, facets))
+        for brand in selected_brands:
+            window = budget_windows.setdefault((brand, gender), [min_price, max_price])
+            window[0] = min(window[0], min_price)
+            window[1] = max(window[1], max_price)
+
+    partitions: Dict[Tuple[str, str], _SharedPartition] = {}
+    incomplete: Set[Tuple[str, str]] = set()
+    for (brand, gender), (min_price, max_price) in budget_windows.items():
+        # No facets here: users sharing the partition want different ones, applied per user below
+        collected = collector.collect(brand, gender, min_price, max_price)
+        partitions[(brand, gender)] = _SharedPartition(collected["brand_data"][brand])
+        if collected.get("incomplete_brands"):
+            incomplete.add((brand, gender))
+    logger.info("BatchCollector: %s catalog reads shared by %s preference sets.", len(partitions), len(preferences_list))
+
+    columnar = columnar_state_enabled()
+    states = []
+    for preferences, selected_brands, (gender, min_price, max_price, facets) in zip(preferences_list, selections, filters):
+        brand_data = {}
+        for brand in selected_brands:
+            sneakers = partitions[(brand, gender)].query(min_price, max_price, facets)
+            brand_data[brand] = SneakerTable.from_sneakers(sneakers) if columnar else sneakers
+        state = {
+            "user_preferences": preferences,
+            "selected_brands": selected_brands,
+            "brand_data": brand_data,
+            "incomplete_brands": [brand for brand in selected_brands if (brand, gender) in incomplete],
+            "aggregated_sneakers": [],
+            "candidate_scores": [],
+            "final_recommendations": [],
+            "error_message": None,
+        }
+        state.update(aggregator.aggregate_sneakers(state))
+        state.update(ranker.rank_sneakers(state))  # Same top-K cut as the graph, keeping packed prompts small
+        states.append(state)
+    return states
+
+def pack_requests(agent: Any, requests: List[BatchRequest], max_prompt_chars: int = DEFAULT_MAX_PROMPT_CHARS,
+                  max_requests_per_call: int = DEFAULT_MAX_REQUESTS_PER_CALL) -> List[List[BatchRequest]]:
+    """Greedily packs requests into batches whose batch prompt stays under max_prompt_chars.
+
+    A request that alone exceeds the limit still gets a batch of its own.
+    """
+    base_size = len(agent.build_batch_prompt([]))
+    batches: List[List[BatchRequest]] = []
+    current: List[BatchRequest] = []
+    current_size = base_size
+    for request in requests:
+        # Each user's section is independent, so prompt size is additive over requests
+        section_size = len(agent.build_batch_prompt([request])) - base_size
+        if current and (current_size + section_size > max_prompt_chars or len(current) >= max_requests_per_call):
+            batches.append(current)
+            current, current_size = [], base_size
+        current.append(request)
+        current_size += section_size
+    if current:
+        batches.append(current)
+    return batches
+
+def run_batches(agent: Any, batches: List[List[BatchRequest]], max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                deadline: Optional[float] = None,
+                on_failure: Optional[Callable[[str, NodeRetryError], Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """Sends each batch as one LLM call, at most max_concurrency in flight. Results keyed by request id.
+
+    Each call is retried with backoff and hedged like the single-run LLM node, and no attempt starts after
+    `deadline`. A batch still failing after that gets on_failure(request_id, error) for each of its users
+    (the workflow's local answer); without on_failure, the batch's error result.
+    """
+    def run(batch: List[BatchRequest]) -> Dict[str, Dict[str, Any]]:
+        try:
+            return retry_node(BATCH_NODE, lambda: _batch_call(agent, batch, deadline), is_llm_failure, Backoff(), deadline)["results"]
+        except NodeRetryError as e:
+            if on_failure is None:
+                return e.result["results"]
+            return {request_id: on_failure(request_id, e) for request_id, _, _ in batch}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        for batch_results in pool.map(run, batches):
+            results.update(batch_results)
+    return results
+
+def _batch_call(agent: Any, batch: List[BatchRequest], deadline: Optional[float]) -> Dict[str, Any]:
+    # A node-style result for retry_node: a failed call fails every request in it, so its error stands for the batch
+    results = agent.get_batch_recommendations(batch, deadline)
+    failure = next((result for result in results.values() if is_llm_failure(result)), None)
+    return {"error_message": failure["error_message"] if failure else None, "results": results}
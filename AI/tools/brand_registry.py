@@ -0,0 +1,99 @@
+import logging
+import os
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from .state_management import Sneaker
+from .enrichment import Facets
+from .data_source import afetch_brand_sneakers, fetch_brand_sneakers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BRANDS = ("Nike", "Adidas", "Puma")
+
+class BrandSource:
+    """One collectable brand. The default reads the brand from the configured sneaker source (shoes table
+    or catalog index); subclass and override fetch/afetch for a brand served by an API or a scraper.
+
+    `timeout` overrides the collector's default per-source timeout (SNEAKER_COLLECT_TIMEOUT_SECONDS).
+    `facets` (color/use-case/style tags from the preferences) is a narrowing hint: a source may ignore it.
+    """
+
+    def __init__(self, name: str, timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+    def fetch(self, gender: str, min_price: float, max_price: float, facets: Optional[Facets] = None) -> Sequence[Sneaker]:
+        return fetch_brand_sneakers(self.name, gender, min_price, max_price, facets)
+
+    async def afetch(self, gender: str, min_price: float, max_price: float, facets: Optional[Facets] = None) -> Sequence[Sneaker]:
+        return await afetch_brand_sneakers(self.name, gender, min_price, max_price, facets)
+
+class BrandRegistry:
+    """Brands the workflow knows, in registration order. The selector picks from it and the
+    collector node is fanned out over whatever it returns, so a new brand is one register() call.
+    """
+
+    def __init__(self, sources: Iterable[Union[str, BrandSource]] = ()):
+        self._sources: Dict[str, BrandSource] = {}
+        self._lock = Lock()
+        for source in sources:
+            self.register(source)
+
+    def register(self, source: Union[str, BrandSource]) -> BrandSource:
+        # A bare name is a brand read from the sneaker source; registering a name again replaces its source
+        if isinstance(source, str):
+            source = BrandSource(source)
+        with self._lock:
+            sources = dict(self._sources)
+            sources[source.name] = source
+            self._sources = sources  # Copy-on-write: readers never take the lock
+        return source
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            sources = dict(self._sources)
+            sources.pop(name, None)
+            self._sources = sources
+
+    def get(self, name: str) -> Optional[BrandSource]:
+        return self._sources.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._sources)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._sources
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+# --- Process-wide registry ---
+
+_brand_registry: Optional[BrandRegistry] = None
+_brand_registry_lock = Lock()
+
+def _registry_from_env() -> BrandRegistry:
+    # SNEAKER_BRANDS: comma-separated brand names served from the sneaker source (default Nike,Adidas,Puma)
+    names = [name.strip() for name in os.getenv("SNEAKER_BRANDS", ",".join(DEFAULT_BRANDS)).split(",") if name.strip()]
+    return BrandRegistry(names)
+
+def get_brand_registry() -> BrandRegistry:
+    global _brand_registry
+    if _brand_registry is None:
+        with _brand_registry_lock:
+            if _brand_registry is None:
+                _brand_registry = _registry_from_env()
+    return _brand_registry
+
+def register_brand(source: Union[str, BrandSource]) -> BrandSource:
+    return get_brand_registry().register(source)
+
+def set_brand_registry(registry: Optional[BrandRegistry]) -> None:
+    """Replaces the process-wide registry. None re-reads SNEAKER_BRANDS on next use."""
+    global _brand_registry
+    with _brand_registry_lock:
+        _brand_registry = registry
@@ -0,0 +1,88 @@
+from bisect import bisect_left, bisect_right
+from itertools import count
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .state_management import Sneaker
+
+PartitionKey = Tuple[str, str]  # (brand, gender)
+
+# Process-wide so a replacement index never reuses a version an older index already handed out
+_version_counter = count(1)
+
+class CatalogIndex:
+    """In-memory sneaker catalog partitioned by (brand, gender) with price-sorted rows.
+
+    A budget filter becomes two bisects on the partition's price array instead of
+    a scan over every sneaker of the brand.
+    """
+
+    def __init__(self, sneakers: Optional[Iterable[Sneaker]] = None):
+        # Each partition keeps two parallel lists: sorted prices and the sneakers in the same order
+        self._prices: Dict[PartitionKey, List[float]] = {}
+        self._sneakers: Dict[PartitionKey, List[Sneaker]] = {}
+        self._size = 0
+        self.version = next(_version_counter)  # Changes on every mutation so caches can key on it
+        if sneakers is not None:
+            self.add_many(sneakers)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add_many(self, sneakers: Iterable[Sneaker]) -> None:
+        # Group first and sort once per partition; cheaper than insort for bulk loads
+        grouped: Dict[PartitionKey, List[Sneaker]] = {}
+        for sneaker in sneakers:
+            grouped.setdefault((sneaker["brand"], sneaker["gender"]), []).append(sneaker)
+
+        for key, new_rows in grouped.items():
+            rows = self._sneakers.get(key, []) + new_rows
+            rows.sort(key=lambda s: s["price"])  # stable, so equal prices keep insertion order
+            self._sneakers[key] = rows
+            self._prices[key] = [float(s["price"]) for s in rows]
+            self._size += len(new_rows)
+        self.version = next(_version_counter)
+
+    def partitions(self) -> List[PartitionKey]:
+        return list(self._sneakers.keys())
+
+    def __iter__(self) -> Iterator[Sneaker]:
+        for rows in self._sneakers.values():
+            yield from rows
+
+    def query(self, brand: str, gender: str, min_price: float, max_price: float) -> List[Sneaker]:
+        """Returns sneakers of `brand`/`gender` with min_price <= price <= max_price, cheapest first."""
+        key = (brand, gender)
+        prices = self._prices.get(key)
+        if not prices or min_price > max_price:
+            return []
+        lo = bisect_left(prices, min_price)
+        hi = bisect_right(prices, max_price)
+        return self._sneakers[key][lo:hi]
+
+# --- Shared index over the brand catalogs ---
+
+_shared_index: Optional[CatalogIndex] = None
+_shared_index_lock = Lock()
+
+def load_mock_catalog() -> List[Sneaker]:
+    # Imported here so the mock catalogs are only loaded when the in-memory source is actually used
+    from .nike import MOCK_NIKE_SNEAKERS
+    from .addidas import MOCK_ADIDAS_SNEAKERS
+    from .puma import MOCK_PUMA_SNEAKERS
+    return [*MOCK_NIKE_SNEAKERS, *MOCK_ADIDAS_SNEAKERS, *MOCK_PUMA_SNEAKERS]
+
+def get_shared_index() -> CatalogIndex:
+    """Returns the process-wide catalog index, building it from the brand catalogs on first use."""
+    global _shared_index
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                _shared_index = CatalogIndex(load_mock_catalog())
+    return _shared_index
+
+def set_shared_index(index: Optional[CatalogIndex]) -> None:
+    """Replaces the shared index (e.g. after loading a larger catalog). None forces a rebuild on next use."""
+    global _shared_index
+    with _shared_index_lock:
+        _shared_index = index
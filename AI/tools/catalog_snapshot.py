@@ -0,0 +1,283 @@
+import logging
+import os
+import select
+import time
+from bisect import bisect_left, bisect_right
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .catalog_index import PartitionKey
+from .data_source import SNEAKER_COLUMNS, InMemorySneakerSource, open_streaming_cursor, row_to_sneaker
+from .ingest import CATALOG_CHANNEL, change_tracking_installed, migrate_catalog
+from .state_management import Sneaker
+from .tracing import CATALOG_ROWS, CATALOG_SWAPS
+
+logger = logging.getLogger(__name__)
+
+# Rows changed and rows deleted after a change_seq, oldest first; one statement, so both come from the same
+# database snapshot. Tombstones have NULL content columns.
+CHANGES_QUERY = (
+    f"SELECT id, change_seq, {', '.join(SNEAKER_COLUMNS)} FROM shoes WHERE change_seq > %s "
+    f"UNION ALL SELECT id, change_seq, {', '.join('NULL' for _ in SNEAKER_COLUMNS)} FROM shoes_tombstones WHERE change_seq > %s "
+    "ORDER BY 2"
+)
+
+Change = Tuple[int, Optional[Sneaker]]  # (shoes.id, row or None for a deletion)
+
+class _Partition(NamedTuple):
+    # Parallel lists in (price, id) order, like CatalogIndex's; never mutated once a snapshot holds them
+    prices: List[float]
+    sneakers: List[Sneaker]
+    ids: List[int]
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[int, Sneaker]]) -> "_Partition":
+        ordered = sorted(rows, key=lambda item: (item[1]["price"], item[0]))
+        return cls([float(s["price"]) for _, s in ordered], [s for _, s in ordered], [i for i, _ in ordered])
+
+    def _position(self, price: float, row_id: int) -> int:
+        lo, hi = bisect_left(self.prices, price), bisect_right(self.prices, price)
+        return lo + bisect_left(self.ids[lo:hi], row_id)  # Rows sharing a price are few
+
+    def edited(self, removed: Dict[int, float], added: Dict[int, Sneaker]) -> "_Partition":
+        # Copies the lists (memcpy) and moves only the changed rows, instead of sorting the partition again
+        partition = _Partition(list(self.prices), list(self.sneakers), list(self.ids))
+        for row_id, price in removed.items():
+            at = partition._position(price, row_id)
+            del partition.prices[at], partition.sneakers[at], partition.ids[at]
+        for row_id, sneaker in added.items():
+            price = float(sneaker["price"])
+            at = partition._position(price, row_id)
+            partition.prices.insert(at, price)
+            partition.sneakers.insert(at, sneaker)
+            partition.ids.insert(at, row_id)
+        return partition
+
+class CatalogSnapshot:
+    """Immutable catalog keyed by shoes.id, partitioned by (brand, gender) with price-sorted rows.
+
+    Answers the same query()/iteration/version calls as CatalogIndex, so InMemorySneakerSource can serve from it.
+    `version` is the change_seq of the newest change it contains. with_changes() returns a new snapshot that
+    shares every partition the changes don't touch.
+    """
+
+    __slots__ = ("version", "_partitions", "_rows")
+
+    def __init__(self, version: int = 0, partitions: Optional[Dict[PartitionKey, _Partition]] = None,
+                 rows: Optional[Dict[int, Sneaker]] = None):
+        self.version = version
+        self._partitions = partitions if partitions is not None else {}
+        self._rows = rows if rows is not None else {}  # shoes.id -> sneaker, to find a changed row's old partition
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[Sneaker]:
+        for partition in self._partitions.values():
+            yield from partition.sneakers
+
+    def partitions(self) -> List[PartitionKey]:
+        return list(self._partitions.keys())
+
+    def query(self, brand: str, gender: str, min_price: float, max_price: float) -> List[Sneaker]:
+        """Returns sneakers of `brand`/`gender` with min_price <= price <= max_price, cheapest first."""
+        partition = self._partitions.get((brand, gender))
+        if partition is None or min_price > max_price:
+            return []
+        lo = bisect_left(partition.prices, min_price)
+        hi = bisect_right(partition.prices, max_price)
+        return partition.sneakers[lo:hi]
+
+    def with_changes(self, changes: Iterable[Change], version: int) -> "CatalogSnapshot":
+        """A new snapshot with `changes` applied in order; only the partitions they touch are copied."""
+        rows = dict(self._rows)
+        # Per partition: rows leaving it (id -> old price) and rows entering it
+        touched: Dict[PartitionKey, Tuple[Dict[int, float], Dict[int, Sneaker]]] = {}
+        for row_id, sneaker in changes:
+            old = rows.pop(row_id, None)
+            if old is not None:
+                removed, added = touched.setdefault((old["brand"], old["gender"]), ({}, {}))
+                if added.pop(row_id, None) is None:  # Otherwise it only entered in this batch
+                    removed[row_id] = float(old["price"])
+            if sneaker is not None:
+                touched.setdefault((sneaker["brand"], sneaker["gender"]), ({}, {}))[1][row_id] = sneaker
+                rows[row_id] = sneaker
+
+        partitions = dict(self._partitions)
+        for key, (removed, added) in touched.items():
+            old_partition = partitions.get(key)
+            if old_partition is None:
+                partition = _Partition.build(added.items())
+            elif len(removed) + len(added) > len(old_partition.ids) // 8:
+                # Bulk change (an ingest, the initial load): one sort beats many list inserts
+                kept = ((i, s) for i, s in zip(old_partition.ids, old_partition.sneakers) if i not in removed)
+                partition = _Partition.build([*kept, *added.items()])
+            else:
+                partition = old_partition.edited(removed, added)
+            if partition.ids:
+                partitions[key] = partition
+            else:
+                partitions.pop(key, None)
+        return CatalogSnapshot(version, partitions, rows)
+
+class SnapshotSneakerSource(InMemorySneakerSource):
+    """Serves collector queries from an in-process CatalogSnapshot of `shoes`, kept current from the database.
+
+    Readers take whatever snapshot `_index` holds when they start: no lock, no query. A refresh reads the rows
+    and tombstones past the snapshot's change_seq, builds the next snapshot beside the current one and swaps
+    the reference, so a swap never blocks or tears a read. The snapshot version is the database's change_seq,
+    the same in every worker, for the version-keyed recommendation and prompt caches.
+
+    start_listener() keeps it current in the background: on Postgres a dedicated connection LISTENs on the
+    catalog channel and each NOTIFY burst becomes one refresh; on SQLite (no NOTIFY) it refreshes every
+    SHOES_CATALOG_POLL_SECONDS. Sequence values are taken before commit, so a slow transaction can commit a
+    change_seq below one already applied; SHOES_CATALOG_RESYNC_SECONDS (Postgres, 0 disables) reloads the
+    whole catalog now and then to pick such rows up.
+    """
+
+    def __init__(self, pool: Any, placeholder: str = "%s", dialect: str = "postgres",
+                 snapshot: Optional[CatalogSnapshot] = None, poll_seconds: Optional[float] = None,
+                 resync_seconds: Optional[float] = None):
+        super().__init__(snapshot if snapshot is not None else CatalogSnapshot())
+        self.pool = pool
+        self.placeholder = placeholder
+        self.dialect = dialect
+        self.poll_seconds = poll_seconds if poll_seconds is not None else float(os.getenv("SHOES_CATALOG_POLL_SECONDS", "1"))
+        self.resync_seconds = resync_seconds if resync_seconds is not None else float(os.getenv("SHOES_CATALOG_RESYNC_SECONDS", "600"))
+        self.changes_query = CHANGES_QUERY.replace("%s", placeholder)
+        self._tracking_checked = False
+        self._refresh_lock = Lock()  # Writers only: keeps an older refresh from swapping over a newer one
+        self._stop = Event()
+        self._listener: Optional[Thread] = None
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._index
+
+    def sync(self) -> int:
+        """Full load for an empty snapshot, deltas for one inherited from the parent process; returns the version."""
+        if len(self.snapshot) == 0 and self.snapshot.version == 0:
+            return self.load()
+        return self.refresh()
+
+    def load(self) -> int:
+        """Reads the whole catalog into a new snapshot and swaps it in."""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            changes, version = self._read_changes(-1)  # change_seq 0: rows from before change tracking
+            self._index = CatalogSnapshot().with_changes(changes, version)
+            CATALOG_SWAPS.inc(kind="full")
+            CATALOG_ROWS.inc(len(changes), kind="full")
+            logger.info("Catalog snapshot: Loaded %s sneakers at version %s in %.0f ms.",
+                        len(self._index), version, (time.perf_counter() - started) * 1000)
+            return version
+
+    def refresh(self) -> int:
+        """Applies the changes since the current snapshot's version; returns the (possibly unchanged) version."""
+        with self._refresh_lock:
+            current = self.snapshot
+            changes, version = self._read_changes(current.version)
+            if changes:
+                self._index = current.with_changes(changes, version)
+                CATALOG_SWAPS.inc(kind="delta")
+                CATALOG_ROWS.inc(len(changes), kind="delta")
+                logger.debug("Catalog snapshot: Applied %s changes, version %s -> %s.", len(changes), current.version, version)
+            return self._index.version
+
+    def bump_catalog_version(self) -> int:
+        # Called by CatalogIngestor after its commit: this process sees its own ingest without waiting for the listener
+        return self.refresh()
+
+    def _read_changes(self, since: int) -> Tuple[List[Change], int]:
+        conn = self.pool.getconn()
+        try:
+            if not self._tracking_checked:
+                self._ensure_change_tracking(conn)
+            cur = open_streaming_cursor(conn, "catalog_snapshot", 2000)
+            try:
+                cur.execute(self.changes_query, (since, since))
+                changes: List[Change] = []
+                version = max(since, 0)
+                for row in cur:
+                    changes.append((row[0], row_to_sneaker(row[2:]) if row[2] is not None else None))
+                    version = max(version, row[1])
+            finally:
+                cur.close()
+                conn.rollback()  # End the read transaction a named cursor opens
+        finally:
+            self.pool.putconn(conn)
+        return changes, version
+
+    def _ensure_change_tracking(self, conn: Any) -> None:
+        # Databases no ingest has migrated yet (e.g. loaded straight from insert_shoes.sql) lack the triggers
+        cur = conn.cursor()
+        try:
+            if not change_tracking_installed(cur, self.dialect):
+                logger.warning("Catalog snapshot: Installing change tracking on shoes.")
+                migrate_catalog(conn, cur, self.dialect)
+            conn.commit()
+        finally:
+            cur.close()
+        self._tracking_checked = True
+
+    # --- Background listener ---
+
+    def start_listener(self) -> None:
+        """Starts the background thread that keeps the snapshot current; a no-op when it is already running."""
+        if self._listener is not None and self._listener.is_alive():
+            return
+        self._stop.clear()
+        target = self._poll if self.dialect == "sqlite" else self._listen
+        self._listener = Thread(target=target, name="catalog-listener", daemon=True)
+        self._listener.start()
+
+    def stop_listener(self) -> None:
+        listener, self._listener = self._listener, None
+        self._stop.set()
+        if listener is not None:
+            listener.join(timeout=self.poll_seconds + 5)
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Catalog snapshot: Refresh failed, keeping version %s: %s", self.snapshot.version, e)
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self.pool.getconn()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CATALOG_CHANNEL}")
+                cur.close()
+                self.refresh()  # Whatever changed while nobody was listening
+                self._wait_for_notifies(conn)
+            except Exception as e:
+                logger.warning("Catalog snapshot: Listener failed, keeping version %s: %s", self.snapshot.version, e)
+                self._stop.wait(self.poll_seconds)
+            finally:
+                if conn is not None:
+                    self.pool.putconn(conn, close=True)  # A LISTENing session is not handed to other users
+
+    def _wait_for_notifies(self, conn: Any) -> None:
+        last_load = time.monotonic()
+        while not self._stop.is_set():
+            # The timeout only bounds how long stop_listener() waits; notifications wake the select at once
+            if select.select([conn], [], [], self.poll_seconds) != ([], [], []):
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()  # A burst (ingest batch, several statements) is one refresh
+                    self.refresh()
+            if self.resync_seconds and time.monotonic() - last_load >= self.resync_seconds:
+                self.load()
+                last_load = time.monotonic()
+
+def create_snapshot_source(pool: Any, placeholder: str = "%s", dialect: str = "postgres",
+                           snapshot: Optional[CatalogSnapshot] = None) -> SnapshotSneakerSource:
+    """A SnapshotSneakerSource already synced from the database (the listener is started separately)."""
+    source = SnapshotSneakerSource(pool, placeholder, dialect, snapshot=snapshot)
+    source.sync()
+    return source
@@ -0,0 +1,148 @@
+import logging
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def get_checkpointer(async_nodes: bool = False) -> Optional[Any]:
+    """The LangGraph checkpointer for a compiled workflow graph, from SNEAKER_CHECKPOINTER:
+
+    - "none" (default): no checkpoints, every run starts from the brand selector;
+    - "memory": in-process InMemorySaver, enough to resume a request retried on the same worker;
+    - "sqlite": SqliteSaver (AsyncSqliteSaver for the async graph) on SNEAKER_CHECKPOINT_PATH, shared by the
+      workers of one host. Needs the langgraph-checkpoint-sqlite package.
+
+    With a checkpointer, state is saved after every superstep under the request's thread id, so a run that
+    fails in the LLM node resumes there instead of fetching and ranking the catalog again.
+    """
+    kind = os.getenv("SNEAKER_CHECKPOINTER", "none").lower()
+    if kind in ("", "none"):
+        return None
+    if kind == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver(serde=_state_serde())
+    if kind == "sqlite":
+        path = os.getenv("SNEAKER_CHECKPOINT_PATH", "sneaker_checkpoints.sqlite")
+        if async_nodes:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+            return AsyncSqliteSaver(aiosqlite.connect(path), serde=_state_serde())
+        from langgraph.checkpoint.sqlite import SqliteSaver
+        # One connection shared by the worker's threads; SqliteSaver serialises access with its own lock
+        return SqliteSaver(sqlite3.connect(path, check_same_thread=False), serde=_state_serde())
+    raise ValueError(f"Unknown SNEAKER_CHECKPOINTER: {kind!r} (expected none, memory or sqlite)")
+
+def _state_serde() -> Any:
+    # LangGraph's serializer writes msgpack, which has no encoding for SneakerTable (SNEAKER_COLUMNAR_STATE=1);
+    # channels holding one fall back to pickle (SneakerTable.__reduce__), everything else stays msgpack.
+    # Checkpoints are only read back by this app, from its own memory or SNEAKER_CHECKPOINT_PATH.
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    return JsonPlusSerializer(pickle_fallback=True)
+
+# --- Request ids of checkpointed runs ---
+
+RUN_REGISTRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sneaker_runs (
+    request_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,  -- running | kept (failed, waiting for the retry) | sweeping
+    expires_at REAL NOT NULL
+)
+"""
+
+class RequestInProgressError(Exception):
+    """Another run is already using this request id (e.g. the client sent X-Request-ID twice at once)."""
+
+    def __init__(self, request_id: str):
+        super().__init__(f"Request {request_id} is already in progress.")
+        self.request_id = request_id
+
+class RunRegistry:
+    """Request ids with a checkpointed thread: running, or kept after a failed LLM node for the client's retry.
+
+    Lives beside the checkpoints (a table in SNEAKER_CHECKPOINT_PATH, so every worker on the host sees the same
+    claims; in-process for the memory checkpointer). claim() refuses a request id another run holds, so two
+    requests with one id never write the same thread. A kept run expires after SNEAKER_CHECKPOINT_TTL_SECONDS
+    (default 3600), a claim left by a worker that died mid-run after SNEAKER_RUN_CLAIM_SECONDS (default 600);
+    take_expired() hands them to the caller, which deletes their threads, at most every `sweep_seconds`.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl_seconds: Optional[float] = None, claim_seconds: Optional[float] = None,
+                 sweep_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("SNEAKER_CHECKPOINT_TTL_SECONDS", "3600"))
+        self.claim_seconds = claim_seconds if claim_seconds is not None else float(os.getenv("SNEAKER_RUN_CLAIM_SECONDS", "600"))
+        self.sweep_seconds = sweep_seconds
+        self._next_sweep = 0.0
+        # Autocommit, with explicit BEGIN IMMEDIATE where a read decides a write
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._lock = Lock()
+        self._conn.execute(RUN_REGISTRY_SCHEMA)
+
+    def claim(self, request_id: str) -> bool:
+        """Marks the request id as running; False if another run holds it."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT state, expires_at FROM sneaker_runs WHERE request_id = ?", (request_id,)).fetchone()
+                if row is not None and row[0] != "kept" and row[1] > now:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.execute(
+                    "INSERT INTO sneaker_runs (request_id, state, expires_at) VALUES (?, 'running', ?) "
+                    "ON CONFLICT (request_id) DO UPDATE SET state = 'running', expires_at = excluded.expires_at",
+                    (request_id, now + self.claim_seconds),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def release(self, request_id: str, keep: bool) -> None:
+        """Ends the request's claim: kept for the TTL when its run can be resumed, otherwise forgotten."""
+        with self._lock:
+            if keep:
+                self._conn.execute("UPDATE sneaker_runs SET state = 'kept', expires_at = ? WHERE request_id = ?",
+                                   (time.time() + self.ttl_seconds, request_id))
+            else:
+                self._conn.execute("DELETE FROM sneaker_runs WHERE request_id = ?", (request_id,))
+
+    def take_expired(self) -> List[str]:
+        """Request ids whose threads should be deleted now; [] until the next sweep is due. Call forget() after."""
+        if time.monotonic() < self._next_sweep:
+            return []
+        self._next_sweep = time.monotonic() + self.sweep_seconds
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [row[0] for row in self._conn.execute("SELECT request_id FROM sneaker_runs WHERE expires_at <= ?", (now,))]
+                # Held while the caller deletes, so a new claim can't start on a thread that is going away
+                self._conn.executemany("UPDATE sneaker_runs SET state = 'sweeping', expires_at = ? WHERE request_id = ?",
+                                       [(now + self.claim_seconds, request_id) for request_id in expired])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return expired
+
+    def forget(self, request_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM sneaker_runs WHERE request_id = ? AND state = 'sweeping'",
+                                   [(request_id,) for request_id in request_ids])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def create_run_registry() -> Optional[RunRegistry]:
+    """The RunRegistry for SNEAKER_CHECKPOINTER: None without a checkpointer."""
+    kind = os.getenv("SNEAKER_CHECKPOINTER", "none").lower()
+    if kind in ("", "none"):
+        return None
+    if kind == "sqlite":
+        return RunRegistry(os.getenv("SNEAKER_CHECKPOINT_PATH", "sneaker_checkpoints.sqlite"))
+    return RunRegistry()
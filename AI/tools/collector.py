@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import Lock
+from typing import Any, Dict, Optional, Sequence
+
+from .state_management import BrandTask, Sneaker, UserPreferences
+from .enrichment import Facets, normalise_gender, preference_facets
+from .brand_registry import BrandSource, get_brand_registry
+from .agent_registry import ConcurrencyLimiter
+from .tracing import BRAND_FETCH_DURATION, BRAND_FETCHES
+from .hedging import time_left
+
+logger = logging.getLogger(__name__)
+
+# SNEAKER_COLLECT_MAX_CONCURRENCY bounds brand fetches in flight across the process (sync and async graphs),
+# so a 30-brand fan-out can't open 30 DB connections per request. SNEAKER_COLLECT_TIMEOUT_SECONDS is the
+# default per-source timeout; it includes time spent queued for a slot. A request with a deadline gives
+# collection at most COLLECT_BUDGET_SHARE of its remaining time, keeping the rest for ranking and the LLM.
+COLLECT_BUDGET_SHARE = 0.5
+
+def _max_concurrency() -> int:
+    return int(os.getenv("SNEAKER_COLLECT_MAX_CONCURRENCY", "8"))
+
+# SNEAKER_FACET_PUSHDOWN=0 sends sources gender + budget only, e.g. for a shoes table that was never enriched
+def facet_pushdown_enabled() -> bool:
+    return os.getenv("SNEAKER_FACET_PUSHDOWN", "1") == "1"
+
+_fetch_pool: Optional[ThreadPoolExecutor] = None
+_fetch_limiter: Optional[ConcurrencyLimiter] = None
+_fetch_lock = Lock()
+
+def _get_fetch_pool() -> ThreadPoolExecutor:
+    global _fetch_pool
+    if _fetch_pool is None:
+        with _fetch_lock:
+            if _fetch_pool is None:
+                _fetch_pool = ThreadPoolExecutor(max_workers=_max_concurrency(), thread_name_prefix="brand-fetch")
+    return _fetch_pool
+
+def _reset_after_fork() -> None:
+    # A forked child has none of the parent's pool threads, and the locks may have been held at fork time
+    global _fetch_pool, _fetch_limiter, _fetch_lock
+    _fetch_pool, _fetch_limiter, _fetch_lock = None, None, Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _get_fetch_limiter() -> ConcurrencyLimiter:
+    global _fetch_limiter
+    if _fetch_limiter is None:
+        with _fetch_lock:
+            if _fetch_limiter is None:
+                _fetch_limiter = ConcurrencyLimiter(_max_concurrency())
+    return _fetch_limiter
+
+class BrandCollectorAgent:
+    """Collects one registered brand. The workflow fans one collector task out per selected brand (LangGraph Send).
+
+    A source that times out or raises contributes no rows and is listed in incomplete_brands,
+    so the aggregator goes ahead with the brands that did answer instead of waiting or failing.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout if timeout is not None else float(os.getenv("SNEAKER_COLLECT_TIMEOUT_SECONDS", "5"))
+
+    def collect_brand(self, task: BrandTask) -> Dict[str, Any]:
+        logger.debug("---AGENT: Brand Collector (%s)---", task["brand"])
+        gender, min_price, max_price, facets = self.request_filters(task["user_preferences"])
+        return self.collect(task["brand"], gender, min_price, max_price, facets, task.get("deadline"))
+
+    def collect(self, brand: str, gender: str, min_price: float, max_price: float,
+                facets: Optional[Facets] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Fetches one brand's rows for already normalised filters (see request_filters), within the source's timeout.
+        Shared by the graph's collector nodes and the batch path (tools.batch)."""
+        source = get_brand_registry().get(brand)
+        if source is None:
+            return self._incomplete(brand, "unknown", "not registered")
+        timeout = self._timeout_for(source, deadline)
+
+        started = time.perf_counter()
+        future = _get_fetch_pool().submit(source.fetch, gender, min_price, max_price, facets)
+        try:
+            collected_sneakers = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Still queued: never runs. Already running: finishes on its pool thread and the rows are dropped
+            future.cancel()
+            return self._incomplete(brand, "timeout", f"timed out after {timeout:g}s")
+        except Exception as e:
+            return self._incomplete(brand, "error", repr(e))
+        return self._collected(brand, collected_sneakers, started)
+
+    async def acollect_brand(self, task: BrandTask) -> Dict[str, Any]:
+        brand = task["brand"]
+        logger.debug("---AGENT: Brand Collector (%s, async)---", brand)
+        source = get_brand_registry().get(brand)
+        if source is None:
+            return self._incomplete(brand, "unknown", "not registered")
+        gender, min_price, max_price, facets = self.request_filters(task["user_preferences"])
+        timeout = self._timeout_for(source, task.get("deadline"))
+
+        started = time.perf_counter()
+        try:
+            collected_sneakers = await asyncio.wait_for(self._limited_afetch(source, gender, min_price, max_price, facets), timeout)
+        except asyncio.TimeoutError:
+            return self._incomplete(brand, "timeout", f"timed out after {timeout:g}s")
+        except Exception as e:
+            return self._incomplete(brand, "error", repr(e))
+        return self._collected(brand, collected_sneakers, started)
+
+    async def _limited_afetch(self, source: BrandSource, gender: str, min_price: float, max_price: float,
+                              facets: Optional[Facets]) -> Sequence[Sneaker]:
+        limiter = _get_fetch_limiter()
+        await limiter.aacquire()
+        try:
+            return await source.afetch(gender, min_price, max_price, facets)
+        finally:
+            limiter.release()
+
+    def request_filters(self, preferences: UserPreferences):
+        """(gender, min_price, max_price, facets) as the sources are queried for this user."""
+        min_price, max_price = preferences["budget_range"]
+        # Facets are pushed down to the source so it returns the relevant rows, not the whole budget slice
+        facets = (preference_facets(preferences) or None) if facet_pushdown_enabled() else None
+        gender = preferences["gender_age_group"]
+        # Stored genders are normalised at ingest ('Male' -> 'male'); match the request the same way
+        return normalise_gender(gender) or gender, min_price, max_price, facets
+
+    def _timeout_for(self, source: BrandSource, deadline: Optional[float]) -> float:
+        timeout = source.timeout if source.timeout is not None else self.timeout
+        remaining = time_left(deadline)
+        return timeout if remaining is None else max(0.0, min(timeout, remaining * COLLECT_BUDGET_SHARE))
+
+    def _collected(self, brand: str, collected_sneakers: Sequence[Sneaker], started: float) -> Dict[str, Any]:
+        BRAND_FETCH_DURATION.observe(time.perf_counter() - started, brand=brand)
+        BRAND_FETCHES.inc(brand=brand, outcome="ok")
+        logger.info("BrandCollector: Found %s %s sneakers matching criteria.", len(collected_sneakers), brand)
+        # The key must match the brand name for the aggregator
+        return {"brand_data": {brand: collected_sneakers}}
+
+    def _incomplete(self, brand: str, outcome: str, detail: str) -> Dict[str, Any]:
+        BRAND_FETCHES.inc(brand=brand, outcome=outcome)
+        logger.warning("BrandCollector: Skipping %s (%s); continuing with the other brands.", brand, detail)
+        return {"brand_data": {brand: []}, "incomplete_brands": [brand]}
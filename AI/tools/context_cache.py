@@ -0,0 +1,114 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+from .tracing import CONTEXT_CACHE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+class GeminiContextCache:
+    """Provider-side handles for the stable prefix of the advisor prompt, behind the base client's limits.
+
+    system_model() binds the static system instruction to a client once, so calls stop resending it.
+    prefix_model() stores system instruction + segment catalog with Gemini context caching (CachedContent)
+    and returns a client on it, so a call only carries the user's part. Prefixes under `min_tokens` (the
+    provider's minimum for a cache) return None and the caller sends the catalog itself.
+
+    The provider deletes a cache after `ttl_seconds`; handles are replaced locally a little earlier.
+    The two _create_* hooks are the only SDK-specific code; override them for another client.
+    """
+
+    def __init__(self, base: Any, model_name: str, ttl_seconds: Optional[float] = None, min_tokens: Optional[int] = None,
+                 max_prefixes: int = 256):
+        self.base = base  # RateLimitedModel: derived clients share its concurrency and rate limits
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+        # 32768 tokens is the gemini-1.5 minimum; newer models accept smaller caches
+        self.min_tokens = min_tokens if min_tokens is not None else int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "32768"))
+        self.max_prefixes = max_prefixes
+        self._system_models: Dict[str, Any] = {}
+        self._prefixes: "OrderedDict[Hashable, Any]" = OrderedDict()  # key -> (expires_at, model or None)
+        self._creating: Dict[Hashable, Lock] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # About 4 bytes per token for this catalog's English + JSON
+        return len(text.encode("utf-8")) // 4
+
+    def system_model(self, system_instruction: str) -> Any:
+        model = self._system_models.get(system_instruction)
+        if model is None:
+            with self._lock:
+                model = self._system_models.get(system_instruction)
+                if model is None:
+                    model = self._system_models[system_instruction] = self.base.derive(self._create_system_model(system_instruction))
+        return model
+
+    def prefix_model(self, key: Hashable, system_instruction: str, contents: str) -> Optional[Any]:
+        if self.estimate_tokens(system_instruction + contents) < self.min_tokens:
+            CONTEXT_CACHE_EVENTS.inc(result="skipped")
+            return None
+        model = self._cached_prefix(key)
+        if model is not False:
+            if model is not None:
+                CONTEXT_CACHE_EVENTS.inc(result="hit")
+            return model
+        with self._lock:
+            creating = self._creating.setdefault(key, Lock())
+        with creating:  # One creation per prefix; concurrent requests for it wait, then reuse it
+            model = self._cached_prefix(key)
+            if model is not False:
+                return model
+            try:
+                model = self.base.derive(self._create_cached_model(system_instruction, contents, self.ttl_seconds))
+                expires_in = self.ttl_seconds * 0.9
+                CONTEXT_CACHE_EVENTS.inc(result="created")
+            except Exception as e:
+                # Don't retry on every request while the provider refuses; send the prefix inline meanwhile
+                logger.warning("ContextCache: Could not cache prompt prefix for %s: %s", key, e)
+                model, expires_in = None, min(60.0, self.ttl_seconds)
+                CONTEXT_CACHE_EVENTS.inc(result="error")
+            with self._lock:
+                self._prefixes[key] = (time.monotonic() + expires_in, model)
+                self._prefixes.move_to_end(key)
+                while len(self._prefixes) > self.max_prefixes:
+                    evicted, _ = self._prefixes.popitem(last=False)
+                    self._creating.pop(evicted, None)
+                self._creating.pop(key, None)
+        return model
+
+    def _cached_prefix(self, key: Hashable) -> Any:
+        # The cached client (None after a failed creation), or False when there is no live entry
+        with self._lock:
+            entry = self._prefixes.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return False
+            self._prefixes.move_to_end(key)
+            return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._system_models.clear()
+            self._prefixes.clear()
+
+    # --- google-generativeai hooks ---
+
+    def _create_system_model(self, system_instruction: str) -> Any:
+        import google.generativeai as genai
+        return genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+
+    def _create_cached_model(self, system_instruction: str, contents: str, ttl_seconds: float) -> Any:
+        import google.generativeai as genai
+        from google.generativeai import caching
+        cached = caching.CachedContent.create(
+            model=f"models/{self.model_name}",
+            system_instruction=system_instruction,
+            contents=[contents],
+            ttl=timedelta(seconds=ttl_seconds),
+        )
+        return genai.GenerativeModel.from_cached_content(cached_content=cached)
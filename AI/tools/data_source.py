@@ -0,0 +1,396 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .state_management import Sneaker
+from .catalog_index import CatalogIndex, get_shared_index
+from .sneaker_table import SneakerTable, columnar_state_enabled
+from .enrichment import TAG_FIELDS, Facets, encode_tags, extract_tags, matches_facets
+
+logger = logging.getLogger(__name__)
+
+# Column order shared by every SQL query that builds Sneaker dicts
+SNEAKER_COLUMNS = ("brand", "name", "price", "url", "gender", "description", "image_url")
+
+# Served by the (brand, gender, price) composite index from shoes_dbb.sql
+BRAND_GENDER_PRICE_FILTER = "brand = %s AND gender = %s AND price BETWEEN %s AND %s"
+BRAND_GENDER_PRICE_QUERY = f"SELECT {', '.join(SNEAKER_COLUMNS)} FROM shoes WHERE {BRAND_GENDER_PRICE_FILTER} ORDER BY price"
+ALL_SNEAKERS_QUERY = f"SELECT {', '.join(SNEAKER_COLUMNS)} FROM shoes ORDER BY id"
+# Bumped by tools.ingest in the same transaction as the rows it changes
+CATALOG_VERSION_QUERY = "SELECT version FROM catalog_meta WHERE id = 1"
+
+# SQLite stand-in for the Postgres schema (SERIAL/CHECK details aside, same columns and index).
+# Tag columns are '|'-delimited text instead of TEXT[] + GIN (see tools.enrichment.encode_tags).
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    brand VARCHAR(50) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    url VARCHAR(255) NOT NULL,
+    gender VARCHAR(20) NOT NULL,
+    description TEXT NOT NULL,
+    image_url VARCHAR(255) NOT NULL,
+    content_hash CHAR(32),
+    currency CHAR(3),
+    list_price DECIMAL(10, 2),
+    colors TEXT NOT NULL DEFAULT '',
+    use_cases TEXT NOT NULL DEFAULT '',
+    styles TEXT NOT NULL DEFAULT '',
+    change_seq BIGINT NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_shoes_brand_gender_price ON shoes (brand, gender, price);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_shoes_brand_url ON shoes (brand, url);
+CREATE TABLE IF NOT EXISTS catalog_meta (id INTEGER PRIMARY KEY CHECK (id = 1), version BIGINT NOT NULL);
+INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0);
+"""
+
+def row_to_sneaker(row: Sequence[Any]) -> Sneaker:
+    brand, name, price, url, gender, description, image_url = row
+    return Sneaker(
+        brand=brand,
+        name=name,
+        price=float(price),  # psycopg2 returns DECIMAL columns as Decimal
+        url=url,
+        gender=gender,
+        description=description,
+        image_url=image_url or None,
+    )
+
+def open_streaming_cursor(conn: Any, name: str, itersize: int) -> Any:
+    # psycopg2 named cursors stay on the server and fetch itersize rows per round trip;
+    # drivers without them (sqlite3) already step through results lazily
+    try:
+        cur = conn.cursor(name=name)
+    except TypeError:
+        return conn.cursor()
+    cur.itersize = itersize
+    return cur
+
+def facet_filter(facets: Facets, dialect: str = "postgres") -> Tuple[str, List[Any]]:
+    """SQL predicate (with %s markers) and params for facet pushdown: a row needs one wanted tag per faceted field."""
+    clauses: List[str] = []
+    params: List[Any] = []
+    for field in TAG_FIELDS:
+        tags = facets.get(field)
+        if not tags:
+            continue
+        if dialect == "sqlite":
+            clauses.append("(" + " OR ".join(f"{field} LIKE %s" for _ in tags) + ")")
+            params.extend(f"%|{tag}|%" for tag in tags)
+        else:
+            # Array overlap, answered from the field's GIN index
+            clauses.append(f"{field} && %s::text[]")
+            params.append(list(tags))
+    return " AND ".join(clauses), params
+
+class InMemorySneakerSource:
+    """Serves collector queries from a CatalogIndex (the mock catalogs by default)."""
+
+    def __init__(self, index: Optional[CatalogIndex] = None):
+        self._index = index
+
+    @property
+    def catalog_version(self) -> int:
+        return (self._index if self._index is not None else get_shared_index()).version
+
+    def fetch_sneakers(self, brand: str, gender: str, min_price: float, max_price: float,
+                       facets: Optional[Facets] = None) -> List[Sneaker]:
+        index = self._index if self._index is not None else get_shared_index()
+        sneakers = index.query(brand, gender, min_price, max_price)
+        if facets:
+            # Same contract as the SQL source: no faceted match falls back to the whole budget slice
+            matched = [sneaker for sneaker in sneakers if matches_facets(sneaker, facets)]
+            return matched or sneakers
+        return sneakers
+
+    async def afetch_sneakers(self, brand: str, gender: str, min_price: float, max_price: float,
+                              facets: Optional[Facets] = None) -> List[Sneaker]:
+        # A bisect lookup never blocks, so there is nothing to offload
+        return self.fetch_sneakers(brand, gender, min_price, max_price, facets)
+
+    def fetch_sneaker_table(self, brand: str, gender: str, min_price: float, max_price: float,
+                            facets: Optional[Facets] = None) -> SneakerTable:
+        # Texts stay in the index's own dicts; the table only adds the numeric columns
+        return SneakerTable.from_sneakers(self.fetch_sneakers(brand, gender, min_price, max_price, facets))
+
+    async def afetch_sneaker_table(self, brand: str, gender: str, min_price: float, max_price: float,
+                                   facets: Optional[Facets] = None) -> SneakerTable:
+        return self.fetch_sneaker_table(brand, gender, min_price, max_price, facets)
+
+    def iter_all_sneakers(self) -> Iterator[Sneaker]:
+        return iter(self._index if self._index is not None else get_shared_index())
+
+class SQLSneakerSource:
+    """Runs the filtered collector query against a DB-API connection pool.
+
+    `pool` only needs getconn()/putconn(), so a psycopg2 pool or SQLiteConnectionPool both work.
+    `placeholder` rewrites the %s markers for drivers with a different paramstyle (SQLite uses '?').
+    `dialect` picks how facets are matched against the tag columns the ingest enrichment fills.
+    `catalog_version` is catalog_meta.version, re-read at most every `version_ttl` seconds
+    (SHOES_CATALOG_VERSION_TTL, default 1), so an ingest from any process reaches this one's caches.
+    """
+
+    def __init__(self, pool: Any, placeholder: str = "%s", dialect: str = "postgres",
+                 version_ttl: Optional[float] = None):
+        self.pool = pool
+        self.placeholder = placeholder
+        self.dialect = dialect
+        self.query = BRAND_GENDER_PRICE_QUERY.replace("%s", placeholder)
+        self.version_ttl = float(os.getenv("SHOES_CATALOG_VERSION_TTL", "1.0")) if version_ttl is None else version_ttl
+        self._version = 0
+        self._version_expires = 0.0
+        self._version_lock = Lock()
+
+    @property
+    def catalog_version(self) -> int:
+        if time.monotonic() >= self._version_expires:
+            return self._read_catalog_version()
+        return self._version
+
+    def bump_catalog_version(self) -> int:
+        # Called by CatalogIngestor after its commit: this process sees the new version now, not at the next re-read
+        return self._read_catalog_version(force=True)
+
+    def _read_catalog_version(self, force: bool = False) -> int:
+        with self._version_lock:
+            if not force and time.monotonic() < self._version_expires:
+                return self._version  # Another thread just re-read it
+            try:
+                self._version = self._query_catalog_version()
+            except Exception as e:
+                # No catalog_meta yet (catalog predates tools.ingest.migrate_catalog) or the database is down:
+                # keep serving the last version and try again after the TTL
+                logger.warning("Catalog version: Could not read catalog_meta, keeping version %s: %s", self._version, e)
+            self._version_expires = time.monotonic() + self.version_ttl
+            return self._version
+
+    def _query_catalog_version(self) -> int:
+        conn = self.pool.getconn()
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute(CATALOG_VERSION_QUERY)
+                row = cur.fetchone()
+            finally:
+                cur.close()
+                conn.rollback()  # Don't leave the connection idle in a transaction (or aborted) between polls
+            return int(row[0]) if row is not None else self._version
+        finally:
+            self.pool.putconn(conn)
+
+    def _execute(self, query: str, params: Sequence[Any]) -> List[Sequence[Any]]:
+        conn = self.pool.getconn()
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute(query, params)
+                return cur.fetchall()
+            finally:
+                cur.close()
+        finally:
+            self.pool.putconn(conn)
+
+    def _fetch_rows(self, brand: str, gender: str, min_price: float, max_price: float,
+                    facets: Optional[Facets] = None) -> List[Sequence[Any]]:
+        params = (brand, gender, min_price, max_price)
+        if facets:
+            predicate, facet_params = facet_filter(facets, self.dialect)
+            query = (f"SELECT {', '.join(SNEAKER_COLUMNS)} FROM shoes WHERE {BRAND_GENDER_PRICE_FILTER} AND {predicate} "
+                     "ORDER BY price").replace("%s", self.placeholder)
+            rows = self._execute(query, params + tuple(facet_params))
+            if rows:
+                return rows
+            # Nothing tagged that way in budget: the ranker still gets the whole slice to choose from
+        return self._execute(self.query, params)
+
+    def fetch_sneakers(self, brand: str, gender: str, min_price: float, max_price: float,
+                       facets: Optional[Facets] = None) -> List[Sneaker]:
+        return [row_to_sneaker(row) for row in self._fetch_rows(brand, gender, min_price, max_price, facets)]
+
+    async def afetch_sneakers(self, brand: str, gender: str, min_price: float, max_price: float,
+                              facets: Optional[Facets] = None) -> List[Sneaker]:
+        # psycopg2/sqlite3 are blocking drivers; run the query on a worker thread to keep the event loop free
+        return await asyncio.to_thread(self.fetch_sneakers, brand, gender, min_price, max_price, facets)
+
+    def fetch_sneaker_table(self, brand: str, gender: str, min_price: float, max_price: float,
+                            facets: Optional[Facets] = None) -> SneakerTable:
+        # Rows go straight into columns, no Sneaker dict per row
+        return SneakerTable.from_rows(self._fetch_rows(brand, gender, min_price, max_price, facets))
+
+    async def afetch_sneaker_table(self, brand: str, gender: str, min_price: float, max_price: float,
+                                   facets: Optional[Facets] = None) -> SneakerTable:
+        return await asyncio.to_thread(self.fetch_sneaker_table, brand, gender, min_price, max_price, facets)
+
+    def iter_all_sneakers(self, batch_size: int = 1000) -> Iterator[Sneaker]:
+        # Whole-catalog scan for offline jobs; memory stays bounded by batch_size
+        conn = self.pool.getconn()
+        try:
+            cur = open_streaming_cursor(conn, "iter_all_sneakers", batch_size)
+            try:
+                cur.execute(ALL_SNEAKERS_QUERY)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row_to_sneaker(row)
+            finally:
+                cur.close()
+                conn.rollback()  # End the read transaction a named cursor opens
+        finally:
+            self.pool.putconn(conn)
+
+class SQLiteConnectionPool:
+    """Minimal getconn/putconn pool over one SQLite file, so SQLSneakerSource can run without Postgres."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = Lock()
+
+    def getconn(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        # Connections move between LangGraph worker threads, hence check_same_thread=False
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def putconn(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._idle.append(conn)
+
+    def closeall(self) -> None:
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+
+def _encoded_tags(sneaker: Sneaker) -> List[str]:
+    tags = extract_tags(f"{sneaker['name']} {sneaker.get('description') or ''}")
+    return [encode_tags(tags[field], "sqlite") for field in TAG_FIELDS]
+
+def create_sqlite_catalog(path: str, sneakers: Iterable[Sneaker]) -> SQLiteConnectionPool:
+    """Creates the shoes table in a SQLite file, loads `sneakers` (tagged like ingest does) and returns a pool for it."""
+    pool = SQLiteConnectionPool(path)
+    conn = pool.getconn()
+    try:
+        conn.executescript(SQLITE_SCHEMA)
+        conn.executemany(
+            f"INSERT INTO shoes ({', '.join(SNEAKER_COLUMNS + TAG_FIELDS)}) VALUES ({', '.join('?' * (len(SNEAKER_COLUMNS) + len(TAG_FIELDS)))})",
+            ((s["brand"], s["name"], s["price"], s["url"], s["gender"], s["description"], s.get("image_url") or "",
+              *_encoded_tags(s)) for s in sneakers),
+        )
+        conn.commit()
+    finally:
+        pool.putconn(conn)
+    return pool
+
+def create_postgres_pool(min_connections: int = 1, max_connections: int = 20) -> Any:
+    # Threaded pool because LangGraph runs the parallel collector branches on worker threads
+    from psycopg2 import pool  # Deferred so the in-memory source works without psycopg2 installed
+    return pool.ThreadedConnectionPool(
+        min_connections, max_connections,
+        user=os.getenv("SHOES_DB_USER", "postgres"),
+        password=os.getenv("SHOES_DB_PASSWORD", ""),
+        host=os.getenv("SHOES_DB_HOST", "127.0.0.1"),
+        port=os.getenv("SHOES_DB_PORT", "5432"),
+        database=os.getenv("SHOES_DB_NAME", "shoes_db"),
+    )
+
+# --- Process-wide source used by the brand collectors ---
+
+_sneaker_source: Optional[Any] = None
+_sneaker_source_lock = Lock()
+
+_inherited_snapshot: Optional[Any] = None  # Catalog snapshot a forked worker starts from instead of a full load
+
+def catalog_snapshot_enabled() -> bool:
+    # SHOES_CATALOG_SNAPSHOT=1: postgres/sqlite sources serve from an in-process snapshot (tools.catalog_snapshot)
+    return os.getenv("SHOES_CATALOG_SNAPSHOT", "0") == "1"
+
+def _source_from_env() -> Any:
+    # SHOES_DATA_SOURCE: "memory" (default, mock catalogs), "postgres" or "sqlite" (SHOES_SQLITE_PATH)
+    kind = os.getenv("SHOES_DATA_SOURCE", "memory").lower()
+    if kind == "postgres":
+        pool, placeholder = create_postgres_pool(), "%s"
+    elif kind == "sqlite":
+        pool, placeholder = SQLiteConnectionPool(os.getenv("SHOES_SQLITE_PATH", "shoes.db")), "?"
+    else:
+        return InMemorySneakerSource()
+    if catalog_snapshot_enabled():
+        from .catalog_snapshot import create_snapshot_source  # Deferred: it imports tools.ingest, which imports this module
+        return create_snapshot_source(pool, placeholder, kind, snapshot=_inherited_snapshot)
+    return SQLSneakerSource(pool, placeholder=placeholder, dialect=kind)
+
+def get_sneaker_source() -> Any:
+    global _sneaker_source
+    if _sneaker_source is None:
+        with _sneaker_source_lock:
+            if _sneaker_source is None:
+                _sneaker_source = _source_from_env()
+    return _sneaker_source
+
+def fetch_brand_sneakers(brand: str, gender: str, min_price: float, max_price: float,
+                         facets: Optional[Facets] = None) -> Sequence[Sneaker]:
+    """What a collector puts into brand_data: a dict list, or a SneakerTable when SNEAKER_COLUMNAR_STATE=1.
+    With `facets`, only the budget rows sharing the user's color/use-case/style tags (or all of them if none do)."""
+    source = get_sneaker_source()
+    if columnar_state_enabled():
+        return source.fetch_sneaker_table(brand, gender, min_price, max_price, facets)
+    return source.fetch_sneakers(brand, gender, min_price, max_price, facets)
+
+async def afetch_brand_sneakers(brand: str, gender: str, min_price: float, max_price: float,
+                                facets: Optional[Facets] = None) -> Sequence[Sneaker]:
+    source = get_sneaker_source()
+    if columnar_state_enabled():
+        return await source.afetch_sneaker_table(brand, gender, min_price, max_price, facets)
+    return await source.afetch_sneakers(brand, gender, min_price, max_price, facets)
+
+def get_catalog_version() -> int:
+    return getattr(get_sneaker_source(), "catalog_version", 0)
+
+def start_catalog_listener() -> None:
+    """Loads the catalog snapshot and starts keeping it current (worker start); a no-op unless SHOES_CATALOG_SNAPSHOT=1."""
+    if not catalog_snapshot_enabled():
+        return
+    start_listener = getattr(get_sneaker_source(), "start_listener", None)
+    if start_listener is not None:
+        start_listener()
+
+def set_sneaker_source(source: Optional[Any]) -> None:
+    """Overrides the collectors' data source. None re-reads SHOES_DATA_SOURCE on next use."""
+    global _sneaker_source
+    with _sneaker_source_lock:
+        _sneaker_source = source
+
+def close_sneaker_source() -> None:
+    """Closes the current source's connections (worker shutdown); the next use builds a new source."""
+    global _sneaker_source
+    with _sneaker_source_lock:
+        source, _sneaker_source = _sneaker_source, None
+    stop_listener = getattr(source, "stop_listener", None)
+    if stop_listener is not None:
+        stop_listener()
+    closeall = getattr(getattr(source, "pool", None), "closeall", None)
+    if closeall is not None:
+        closeall()
+
+# A SQL source opened before fork (e.g. gunicorn --preload) holds the parent's connections:
+# children build their own on first use and keep the inherited one referenced, never closed.
+# A snapshot source's catalog is kept (shared copy-on-write), so the child only catches up on the changes since.
+_inherited_sources: List[Any] = []
+
+def _forget_sql_source_after_fork() -> None:
+    global _sneaker_source, _sneaker_source_lock, _inherited_snapshot
+    if getattr(_sneaker_source, "pool", None) is not None:
+        _inherited_sources.append(_sneaker_source)
+        _inherited_snapshot = getattr(_sneaker_source, "snapshot", _inherited_snapshot)
+        _sneaker_source = None
+    _sneaker_source_lock = Lock()
+
+os.register_at_fork(after_in_child=_forget_sql_source_after_fork)
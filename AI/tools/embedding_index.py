@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from threading import Lock, Thread
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .state_management import Sneaker, UserPreferences
+from .ranker import tokenize
+from .enrichment import normalise_gender
+from .data_source import get_catalog_version, get_sneaker_source
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+ID_MAP_FILE = "ids.json"
+
+def sneaker_text(sneaker: Sneaker) -> str:
+    return f"{sneaker['name']} {sneaker['description']}"
+
+def preferences_text(preferences: UserPreferences) -> str:
+    return " ".join(preferences.get(field) or "" for field in ("style", "color", "use_case")).strip()
+
+def _text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+def _index_row(sneaker: Sneaker) -> Dict[str, Any]:
+    # Filter columns, the text hash that tells sync() whether to re-embed, and what a candidate needs besides
+    return {"id": sneaker["url"], "brand": sneaker["brand"], "gender": sneaker["gender"], "price": float(sneaker["price"]),
+            "hash": _text_hash(sneaker_text(sneaker)), "name": sneaker["name"], "description": sneaker["description"],
+            "image_url": sneaker.get("image_url")}
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of unigrams and bigrams, L2-normalised.
+
+    Any object with embed(texts) -> float32 array of shape (len(texts), dim) can replace it,
+    e.g. a wrapper around a hosted embedding model for the offline build.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = tokenize(text)
+        return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                matrix[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+class EmbeddingIndex:
+    """Unit-norm float32 matrix of sneaker embeddings plus an id map and filter columns.
+
+    Rows are keyed by sneaker url. brand/gender/price columns are kept as NumPy arrays so a
+    brand/gender/budget mask and the cosine top-k are both single vectorised passes.
+    `catalog_version` is the catalog version the rows were synced from (None: not tied to the catalog).
+    """
+
+    def __init__(self, embedder: Any, vectors: Optional[np.ndarray] = None, rows: Optional[List[Dict[str, Any]]] = None,
+                 catalog_version: Optional[int] = None):
+        self.embedder = embedder
+        self.rows: List[Dict[str, Any]] = rows or []  # id map: one _index_row per matrix row
+        self.vectors = vectors if vectors is not None else np.zeros((0, getattr(embedder, "dim", 0)), dtype=np.float32)
+        self.catalog_version = catalog_version
+        self._refresh_columns()
+
+    def _refresh_columns(self) -> None:
+        self.row_by_id = {row["id"]: i for i, row in enumerate(self.rows)}
+        self.brands = np.array([row["brand"] for row in self.rows], dtype=object)
+        self.genders = np.array([row["gender"] for row in self.rows], dtype=object)
+        self.prices = np.array([row["price"] for row in self.rows], dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, sneakers: Iterable[Sneaker]) -> int:
+        """Embeds only sneakers whose id is not indexed yet. Returns how many rows were added."""
+        new_sneakers = []
+        seen = set(self.row_by_id)
+        for sneaker in sneakers:
+            if sneaker["url"] not in seen:
+                seen.add(sneaker["url"])
+                new_sneakers.append(sneaker)
+        if not new_sneakers:
+            return 0
+        new_vectors = self.embedder.embed([sneaker_text(s) for s in new_sneakers]).astype(np.float32, copy=False)
+        self.vectors = np.vstack([np.asarray(self.vectors), new_vectors])
+        self.rows.extend(_index_row(s) for s in new_sneakers)
+        self._refresh_columns()
+        return len(new_sneakers)
+
+    def sync(self, sneakers: Iterable[Sneaker]) -> Dict[str, int]:
+        """Brings the index in line with the whole catalog `sneakers`: rows no longer in it are dropped, rows whose
+        name or description changed are re-embedded, other changes (price, brand, ...) only rewrite their columns,
+        and new rows are embedded. Returns the added/updated/deleted counts."""
+        current: Dict[str, Sneaker] = {}
+        for sneaker in sneakers:
+            current.setdefault(sneaker["url"], sneaker)
+        kept: List[int] = []
+        rows: List[Dict[str, Any]] = []
+        reembed: List[int] = []
+        updated = 0
+        for position, row in enumerate(self.rows):
+            sneaker = current.pop(row["id"], None)
+            if sneaker is None:
+                continue  # Deleted from the catalog
+            new_row = _index_row(sneaker)
+            if new_row != row:
+                updated += 1
+                if new_row["hash"] != row.get("hash"):
+                    reembed.append(len(rows))
+            kept.append(position)
+            rows.append(new_row)
+        deleted = len(self.rows) - len(kept)
+        vectors = np.asarray(self.vectors)[kept]  # A copy, so a memory-mapped matrix is never written to
+        if reembed:
+            vectors[reembed] = self.embedder.embed([sneaker_text(rows[i]) for i in reembed])
+        new_sneakers = list(current.values())
+        if new_sneakers:
+            vectors = np.vstack([vectors, self.embedder.embed([sneaker_text(s) for s in new_sneakers]).astype(np.float32, copy=False)])
+            rows.extend(_index_row(s) for s in new_sneakers)
+        self.vectors, self.rows = vectors, rows
+        self._refresh_columns()
+        return {"added": len(new_sneakers), "updated": updated, "deleted": deleted}
+
+    def sneaker(self, sneaker_id: Any) -> Optional[Sneaker]:
+        """The indexed row as a Sneaker; None if unknown, or if the index was saved without the row texts."""
+        position = self.row_by_id.get(sneaker_id)
+        row = self.rows[position] if position is not None else None
+        if row is None or "name" not in row:
+            return None
+        return Sneaker(brand=row["brand"], name=row["name"], price=row["price"], url=row["id"], gender=row["gender"],
+                       description=row["description"], image_url=row.get("image_url"))
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        # Write to temp files and rename so a concurrent load never sees a half-written index
+        vectors_tmp = os.path.join(directory, VECTORS_FILE + ".tmp")
+        ids_tmp = os.path.join(directory, ID_MAP_FILE + ".tmp")
+        with open(vectors_tmp, "wb") as f:
+            np.save(f, np.asarray(self.vectors, dtype=np.float32))
+        with open(ids_tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": int(self.vectors.shape[1]), "catalog_version": self.catalog_version, "rows": self.rows}, f, ensure_ascii=False)
+        os.replace(vectors_tmp, os.path.join(directory, VECTORS_FILE))
+        os.replace(ids_tmp, os.path.join(directory, ID_MAP_FILE))
+
+    @classmethod
+    def load(cls, directory: str, embedder: Optional[Any] = None) -> "EmbeddingIndex":
+        # mmap_mode="r": workers share the OS page cache instead of each holding a copy of the matrix
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, ID_MAP_FILE), encoding="utf-8") as f:
+            id_map = json.load(f)
+        if embedder is None:
+            embedder = HashingEmbedder(dim=id_map["dim"])
+        # An index saved without a version predates sync(): -1 matches no catalog, so it is synced once in use
+        return cls(embedder, vectors=vectors, rows=id_map["rows"], catalog_version=id_map.get("catalog_version", -1))
+
+    def filter_mask(self, brands: Optional[Sequence[str]] = None, gender: Optional[str] = None,
+                    min_price: Optional[float] = None, max_price: Optional[float] = None) -> np.ndarray:
+        mask = np.ones(len(self.rows), dtype=bool)
+        if brands:
+            mask &= np.isin(self.brands, list(brands))
+        if gender:
+            mask &= self.genders == gender
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        return mask
+
+    def search(self, query_text: str, k: int = 10, mask: Optional[np.ndarray] = None) -> List[Tuple[Any, float]]:
+        """Cosine top-k among rows allowed by `mask`. Returns (id, similarity) pairs, best first."""
+        if not self.rows or k <= 0:
+            return []
+        query = self.embedder.embed([query_text])[0]
+        scores = self.vectors @ query  # Rows and query are unit-norm, so the dot product is the cosine
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.rows[i]["id"], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def similarities(self, query_text: str, ids: Sequence[Any]) -> np.ndarray:
+        """Cosine similarity of the query to each id; 0.0 for ids not in the index."""
+        query = self.embedder.embed([query_text])[0]
+        positions = np.array([self.row_by_id.get(i, -1) for i in ids], dtype=np.int64)
+        result = np.zeros(len(ids), dtype=np.float32)
+        known = positions >= 0
+        if known.any():
+            result[known] = self.vectors[positions[known]] @ query
+        return result
+
+# --- Process-wide index, loaded from SNEAKER_EMBEDDING_INDEX_DIR when set ---
+# The index follows the catalog: once the catalog version differs from the one the index was synced from
+# (an ingest, or an index built before it), a background thread syncs a copy against the whole catalog and
+# swaps it in, while the previous index keeps serving. A failed sync is retried after SYNC_RETRY_SECONDS.
+# An index passed to set_embedding_index without a catalog_version is left as it is.
+
+SYNC_RETRY_SECONDS = 30.0
+
+_embedding_index: Optional[EmbeddingIndex] = None
+_embedding_index_loaded = False
+_embedding_index_lock = Lock()
+_sync_thread: Optional[Thread] = None
+_sync_retry_at = 0.0
+
+def get_embedding_index() -> Optional[EmbeddingIndex]:
+    global _embedding_index, _embedding_index_loaded
+    if not _embedding_index_loaded:
+        with _embedding_index_lock:
+            if not _embedding_index_loaded:
+                directory = os.getenv("SNEAKER_EMBEDDING_INDEX_DIR")
+                if directory and os.path.exists(os.path.join(directory, VECTORS_FILE)):
+                    _embedding_index = EmbeddingIndex.load(directory)
+                _embedding_index_loaded = True
+    index = _embedding_index
+    if index is not None and index.catalog_version is not None:
+        _follow_catalog(index)
+    return index
+
+def _follow_catalog(index: EmbeddingIndex) -> None:
+    global _sync_thread
+    if _sync_thread is not None or time.monotonic() < _sync_retry_at:
+        return
+    version = get_catalog_version()
+    if version == index.catalog_version:
+        return
+    with _embedding_index_lock:
+        if _sync_thread is None:
+            _sync_thread = Thread(target=_sync_index, args=(index, version), name="embedding-index-sync", daemon=True)
+            _sync_thread.start()
+
+def _sync_index(index: EmbeddingIndex, version: int) -> None:
+    global _embedding_index, _sync_thread, _sync_retry_at
+    try:
+        synced = EmbeddingIndex(index.embedder, vectors=index.vectors, rows=index.rows, catalog_version=version)
+        counts = synced.sync(get_sneaker_source().iter_all_sneakers())
+        with _embedding_index_lock:
+            if _embedding_index is index:  # Not replaced by set_embedding_index meanwhile
+                _embedding_index = synced
+        logger.info("EmbeddingIndex: Synced to catalog version %s (%s added, %s updated, %s deleted).",
+                    version, counts["added"], counts["updated"], counts["deleted"])
+    except Exception as e:
+        _sync_retry_at = time.monotonic() + SYNC_RETRY_SECONDS
+        logger.warning("EmbeddingIndex: Sync to catalog version %s failed, keeping version %s: %s", version, index.catalog_version, e)
+    finally:
+        _sync_thread = None
+
+def _reset_sync_after_fork() -> None:
+    # The sync thread is not copied into a child, and the lock may have been held at fork time
+    global _sync_thread, _embedding_index_lock
+    _sync_thread, _embedding_index_lock = None, Lock()
+
+os.register_at_fork(after_in_child=_reset_sync_after_fork)
+
+def set_embedding_index(index: Optional[EmbeddingIndex]) -> None:
+    global _embedding_index, _embedding_index_loaded
+    with _embedding_index_lock:
+        _embedding_index = index
+        _embedding_index_loaded = index is not None
+
+def semantic_neighbours(preferences: UserPreferences, k: int = 10, brands: Optional[Sequence[str]] = None,
+                        index: Optional[EmbeddingIndex] = None) -> List[Tuple[Any, float]]:
+    """Nearest sneakers (by url) to the user's style/color/use_case text within their brand/gender/budget."""
+    index = index if index is not None else get_embedding_index()
+    text = preferences_text(preferences)
+    if index is None or not text:
+        return []
+    min_price, max_price = preferences["budget_range"]
+    gender = preferences["gender_age_group"]
+    # Indexed genders are the catalog's, normalised at ingest; match the request the same way the collectors do
+    mask = index.filter_mask(brands or preferences.get("preferred_brands"), normalise_gender(gender) or gender, min_price, max_price)
+    return index.search(text, k, mask)
+
+def semantic_candidates(preferences: UserPreferences, brands: Sequence[str], k: Optional[int] = None) -> List[Sneaker]:
+    """The semantic neighbours as catalog rows, for the aggregator to add to what the collectors found.
+    k defaults to SNEAKER_SEMANTIC_NEIGHBOURS (10); 0 turns them off."""
+    k = k if k is not None else int(os.getenv("SNEAKER_SEMANTIC_NEIGHBOURS", "10"))
+    index = get_embedding_index()
+    if index is None or k <= 0:
+        return []
+    neighbours = (index.sneaker(sneaker_id) for sneaker_id, _ in semantic_neighbours(preferences, k, brands, index))
+    return [sneaker for sneaker in neighbours if sneaker is not None]
+
+# --- Offline build job ---
+# Run from the AI/ directory:  python -m tools.embedding_index build --out data/embeddings
+# "update" syncs an existing index with the catalog: new rows are embedded, edited rows re-embedded, deleted rows dropped.
+# Serving processes also sync on their own when the catalog version moves on; re-running the job keeps the saved file close.
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or incrementally update the sneaker embedding index")
+    parser.add_argument("command", choices=["build", "update"])
+    parser.add_argument("--out", default=os.getenv("SNEAKER_EMBEDDING_INDEX_DIR", "data/embeddings"))
+    parser.add_argument("--dim", type=int, default=512)
+    args = parser.parse_args()
+
+    if args.command == "update" and os.path.exists(os.path.join(args.out, VECTORS_FILE)):
+        index = EmbeddingIndex.load(args.out)  # Keeps the dimension the index was built with
+    else:
+        index = EmbeddingIndex(HashingEmbedder(dim=args.dim))
+    # Read before the scan: a change committed during it leaves the index behind, so serving processes sync again
+    index.catalog_version = get_catalog_version()
+    counts = index.sync(get_sneaker_source().iter_all_sneakers())  # Source chosen by SHOES_DATA_SOURCE, as for the collectors
+    index.save(args.out)
+    print(f"EmbeddingIndex: Added {counts['added']}, updated {counts['updated']}, deleted {counts['deleted']} rows, "
+          f"{len(index)} total at catalog version {index.catalog_version}, saved to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from .ranker import tokenize
+from .state_management import Sneaker, UserPreferences
+
+# Bump when the vocabularies or rules change: ingest hashes it with each row, so a re-run re-tags everything
+ENRICHMENT_VERSION = 1
+
+TAG_FIELDS = ("colors", "use_cases", "styles")
+Facets = Dict[str, List[str]]  # TAG_FIELDS -> wanted tags; a row matches when it shares a tag in every given field
+
+# Canonical tag -> phrases that imply it, matched as whole token sequences in name + description.
+# Canonical names follow the values the UI and the synthetic catalogs use ("daily wear", "grey", ...).
+COLOR_TERMS: Dict[str, Tuple[str, ...]] = {
+    "black": ("black", "onyx", "anthracite", "triple black"),
+    "white": ("white", "sail", "ivory", "off white", "all white"),
+    "grey": ("grey", "gray", "wolf grey", "cool grey", "smoke"),
+    "red": ("red", "crimson", "burgundy", "maroon"),
+    "blue": ("blue", "navy", "royal", "powder blue", "teal"),
+    "green": ("green", "olive", "khaki", "mint"),
+    "pink": ("pink", "rose", "fuchsia"),
+    "beige": ("beige", "cream", "tan", "sand"),
+    "brown": ("brown", "mocha", "chocolate"),
+    "yellow": ("yellow", "lemon"),
+    "orange": ("orange",),
+    "purple": ("purple", "violet", "lilac"),
+    "gold": ("gold", "metallic gold"),
+    "silver": ("silver", "metallic silver"),
+}
+USE_CASE_TERMS: Dict[str, Tuple[str, ...]] = {
+    "running": ("running", "run", "runner", "runners", "jogging", "marathon", "road racing", "racing"),
+    "trail": ("trail",),
+    "basketball": ("basketball", "hoops"),
+    "football": ("football", "soccer", "cleat", "cleats", "fg"),
+    "tennis": ("tennis",),
+    "golf": ("golf",),
+    "gym": ("gym", "training", "workout", "cross training", "weightlifting", "lifting"),
+    "skateboarding": ("skateboarding", "skate", "skating"),
+    "walking": ("walking", "walk", "hiking"),
+    "daily wear": ("daily wear", "everyday", "every day", "all day", "daily", "lifestyle", "casual wear"),
+    "recovery": ("recovery", "sandal", "sandals", "slide", "slides"),
+}
+STYLE_TERMS: Dict[str, Tuple[str, ...]] = {
+    "casual": ("casual", "easy to style", "laid back", "relaxed"),
+    "sporty": ("sporty", "athletic", "performance", "sport"),
+    "retro": ("retro", "vintage", "80s", "90s", "2000s", "og", "heritage", "nostalgic", "throwback"),
+    "classic": ("classic", "iconic", "timeless", "legend", "original", "icon"),
+    "minimalist": ("minimalist", "minimal", "sleek"),
+    "chunky": ("chunky", "platform", "thick"),
+    "street": ("street", "streetwear", "urban"),
+    "high-top": ("high top", "high tops", "hi top"),
+    "low-top": ("low top", "low tops"),
+    "waterproof": ("waterproof", "gore tex", "water resistant"),
+}
+VOCABULARIES: Dict[str, Dict[str, Tuple[str, ...]]] = {"colors": COLOR_TERMS, "use_cases": USE_CASE_TERMS, "styles": STYLE_TERMS}
+# Which preference fills which tag field
+PREFERENCE_FIELDS = {"color": "colors", "use_case": "use_cases", "style": "styles"}
+
+def _phrase_table(terms: Dict[str, Tuple[str, ...]]) -> Dict[Tuple[str, ...], str]:
+    # Phrases are tokenised like the text they're matched against ("high-top" -> ("high", "top"))
+    return {tuple(tokenize(phrase)): tag for tag, phrases in terms.items() for phrase in (tag, *phrases)}
+
+_PHRASES = {field: _phrase_table(terms) for field, terms in VOCABULARIES.items()}
+_MAX_PHRASE = max(len(phrase) for table in _PHRASES.values() for phrase in table)
+
+def extract_tags(text: Optional[str]) -> Dict[str, List[str]]:
+    """Rule-based tags per TAG_FIELD for free text, in vocabulary order. Deterministic and offline."""
+    tokens = tokenize(text)
+    found: Dict[str, set] = {field: set() for field in TAG_FIELDS}
+    for start in range(len(tokens)):
+        for length in range(1, min(_MAX_PHRASE, len(tokens) - start) + 1):
+            phrase = tuple(tokens[start:start + length])
+            for field, table in _PHRASES.items():
+                tag = table.get(phrase)
+                if tag is not None:
+                    found[field].add(tag)
+    return {field: [tag for tag in VOCABULARIES[field] if tag in found[field]] for field in TAG_FIELDS}
+
+@lru_cache(maxsize=65536)
+def sneaker_tags(name: str, description: str) -> Dict[str, FrozenSet[str]]:
+    # For sources without tag columns (the in-memory catalog): computed once per distinct product text
+    return {field: frozenset(tags) for field, tags in extract_tags(f"{name} {description}").items()}
+
+def preference_facets(preferences: UserPreferences) -> Facets:
+    """Tags the user asked for, per tag field. Free text outside the vocabularies adds nothing (no filter)."""
+    facets: Facets = {}
+    for preference, field in PREFERENCE_FIELDS.items():
+        tags = extract_tags(preferences.get(preference))[field]
+        if tags:
+            facets[field] = tags
+    return facets
+
+def matches_facets(sneaker: Sneaker, facets: Facets) -> bool:
+    tags = sneaker_tags(sneaker["name"], sneaker.get("description") or "")
+    return all(tags[field].intersection(wanted) for field, wanted in facets.items())
+
+# --- Normalisation ---
+
+GENDER_ALIASES = {
+    "male": "male", "men": "male", "mens": "male", "man": "male", "m": "male",
+    "female": "female", "women": "female", "womens": "female", "woman": "female", "f": "female",
+    "kid": "kid", "kids": "kid", "child": "kid", "children": "kid", "youth": "kid", "junior": "kid", "boys": "kid", "girls": "kid",
+}
+
+def normalise_gender(value: str) -> Optional[str]:
+    """'Male' / "Men's" / 'Kids' -> 'male' / 'male' / 'kid'; None when it isn't one of the three groups."""
+    return GENDER_ALIASES.get("".join(tokenize(value)))
+
+# USD per unit of each catalog currency. Prices are stored in USD because budget_range is in dollars.
+# SNEAKER_FX_RATES overrides or extends the table, e.g. "THB=0.0275,EUR=1.08".
+DEFAULT_USD_RATES = {"USD": 1.0, "THB": 0.0275, "EUR": 1.08, "GBP": 1.27, "JPY": 0.0067}
+
+def usd_rates() -> Dict[str, float]:
+    rates = dict(DEFAULT_USD_RATES)
+    for pair in os.getenv("SNEAKER_FX_RATES", "").split(","):
+        if "=" in pair:
+            currency, rate = pair.split("=", 1)
+            rates[currency.strip().upper()] = float(rate)
+    return rates
+
+def to_usd(amount: float, currency: str, rates: Optional[Dict[str, float]] = None) -> float:
+    """Converts a list price to USD; raises KeyError for a currency without a rate."""
+    rate = (rates if rates is not None else usd_rates())[currency.upper()]
+    return round(amount * rate, 2)
+
+# Tag arrays as stored: Postgres TEXT[] literals, or '|'-delimited text in SQLite (no array type there)
+
+def encode_tags(tags: Sequence[str], dialect: str) -> str:
+    if dialect == "sqlite":
+        return f"|{'|'.join(tags)}|" if tags else ""
+    return "{" + ",".join(f'"{tag}"' for tag in tags) + "}"
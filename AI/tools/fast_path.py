@@ -0,0 +1,108 @@
+import logging
+import os
+from collections import Counter
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from .state_management import AgentState, Sneaker, UserPreferences, Recommendation
+from .ranker import tokenize
+from .hedging import time_left
+
+logger = logging.getLogger(__name__)
+
+FAST_PATH = "fast_path"
+LLM_PATH = "llm"
+DEADLINE = "deadline"  # Fast-path reason of a request with too little time left for the LLM
+
+class FastPathPolicy:
+    """Decides when the LLM adds nothing: few candidates, or one candidate clearly ahead on score.
+
+    Thresholds come from the environment so they can be tuned per deployment:
+    SNEAKER_FAST_PATH_ENABLED, SNEAKER_FAST_PATH_MAX_CANDIDATES, SNEAKER_FAST_PATH_MIN_MARGIN.
+    Independently of those, a request with less than SNEAKER_LLM_MIN_SECONDS left before its deadline skips the LLM.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, max_candidates: Optional[int] = None, min_margin: Optional[float] = None,
+                 min_llm_seconds: Optional[float] = None):
+        self.enabled = enabled if enabled is not None else os.getenv("SNEAKER_FAST_PATH_ENABLED", "1") != "0"
+        self.max_candidates = max_candidates if max_candidates is not None else int(os.getenv("SNEAKER_FAST_PATH_MAX_CANDIDATES", "3"))
+        self.min_margin = min_margin if min_margin is not None else float(os.getenv("SNEAKER_FAST_PATH_MIN_MARGIN", "3.0"))
+        self.min_llm_seconds = min_llm_seconds if min_llm_seconds is not None else float(os.getenv("SNEAKER_LLM_MIN_SECONDS", "0.5"))
+
+    def choose(self, state: AgentState) -> Optional[str]:
+        """Returns why the fast path applies ("deadline" / "few_candidates" / "dominant_candidate"), or None for the LLM."""
+        remaining = time_left(state.get("deadline"))
+        if remaining is not None and remaining < self.min_llm_seconds:
+            return DEADLINE
+        if not self.enabled:
+            return None
+        candidates = state.get("aggregated_sneakers", [])
+        if len(candidates) <= self.max_candidates:
+            return "few_candidates"
+        scores = state.get("candidate_scores", [])
+        if len(scores) >= 2 and scores[0] - scores[1] >= self.min_margin:
+            return "dominant_candidate"
+        return None
+
+class RuleBasedRecommenderAgent:
+    """Builds recommendations from the pre-ranked candidates with templated reasons, no LLM call."""
+
+    def __init__(self, max_recommendations: int = 3):
+        self.max_recommendations = max_recommendations
+
+    def recommend(self, state: AgentState, reason: Optional[str] = None) -> Dict[str, Any]:
+        logger.debug("---AGENT: Rule-Based Recommender (fast path)---")
+        candidates: List[Sneaker] = state.get("aggregated_sneakers", [])
+        preferences: UserPreferences = state["user_preferences"]
+        # A dominant candidate is the answer on its own; otherwise keep the (few) ranked candidates
+        picks = candidates[:1] if reason == "dominant_candidate" else candidates[: self.max_recommendations]
+
+        recommendations = [
+            Recommendation(
+                name=sneaker["name"],
+                brand=sneaker["brand"],
+                price=float(sneaker["price"]),
+                url=sneaker["url"],
+                reason=self.reason_for(sneaker, preferences),
+                image_url=sneaker.get("image_url") or None,
+            )
+            for sneaker in picks
+        ]
+        logger.info("RuleBasedRecommender: Generated %s recommendations.", len(recommendations))
+        return {"final_recommendations": recommendations}
+
+    def reason_for(self, sneaker: Sneaker, preferences: UserPreferences) -> str:
+        words = set(tokenize(f"{sneaker['name']} {sneaker['description']}"))
+        matched = [field.replace("_", " ") for field in ("style", "color", "use_case")
+                   if preferences.get(field) and set(tokenize(preferences[field])) <= words]
+        min_price, max_price = preferences["budget_range"]
+        budget = f"fits your ${min_price:.0f}-${max_price:.0f} budget at ${float(sneaker['price']):.2f}"
+        if matched:
+            return f"Matches your {', '.join(matched)} preferences and {budget}."
+        return f"The best available {sneaker['brand']} option for you that {budget}."
+
+class PathMetrics:
+    """Counts which path each request took (fast_path / llm) so the fast-path share can be reported."""
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = Lock()
+
+    def record(self, path: str, reason: Optional[str] = None) -> None:
+        with self._lock:
+            self._counts[path] += 1
+            if reason:
+                self._counts[f"{path}:{reason}"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        total = counts.get(FAST_PATH, 0) + counts.get(LLM_PATH, 0)
+        return {
+            "counts": counts,
+            "fast_path_fraction": counts.get(FAST_PATH, 0) / total if total else 0.0,
+            "llm_fraction": counts.get(LLM_PATH, 0) / total if total else 0.0,
+        }
+
+# Process-wide counters, read by whatever exports metrics
+path_metrics = PathMetrics()
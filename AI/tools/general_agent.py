@@ -1,54 +1,260 @@
-import google.generativeai as genai
-
-from typing import Dict, Any, List
+import logging
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 import json # For parsing LLM response
 
-from langchain_core.prompts.chat import SystemMessage
 import os
-from .state_management import AgentState, Sneaker, UserPreferences, Recommendation
+from .state_management import AgentState, Sneaker, SneakerIndex, UserPreferences, Recommendation
+from .aggregator import build_sneaker_index, sneaker_key
+from .tracing import record_llm_call
+from .agent_registry import DEFAULT_GEMINI_MODEL, get_context_cache, get_gemini_model
+from .hedging import Hedger, time_left
+from .json_stream import JSONArrayStreamParser, salvage_json_array
+from .prompt_assembly import INSTRUCTION_LINES, PromptAssembler, PromptParts, preference_lines
+from .data_source import get_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Sent contents: one prompt string, or the parts after a prefix the client already holds
+Contents = Union[str, List[str]]
+
+# error_message prefixes of failed Gemini calls; transient, so the workflow retries the node on them
+LLM_ERROR = "LLMError"
+LLM_PARSE_ERROR = "LLMResponseParseError"
+REPAIR_PROMPT = ("The text below was meant to be a JSON array of sneaker recommendations (objects with \"name\", \"brand\", "
+                 "\"price\", \"url\", \"image_url\", \"reason\") but is not valid JSON. Return only the corrected JSON array, "
+                 "keeping every recommendation and changing nothing else.\n\n")
+REPAIR_MAX_CHARS = 8000
+
+def is_llm_failure(result: Dict[str, Any]) -> bool:
+    return (result.get("error_message") or "").startswith((LLM_ERROR, LLM_PARSE_ERROR))
 
 class GeneralAgent:
-    def __init__(self, api_key: str):
+    """Asks Gemini to pick the final recommendations from the pre-ranked candidates.
+
+    Prompts are assembled as system instruction + catalog block + user part (tools.prompt_assembly).
+    With a context cache (real Gemini clients) the system instruction is bound to the client, and a segment
+    catalog large enough for provider context caching is sent once per segment instead of once per call.
+    SNEAKER_PROMPT_SEGMENT_CACHE=0 keeps to the candidate list.
+
+    An answer json.loads rejects is salvaged locally first (json_stream.salvage_json_array); if nothing can be
+    salvaged, one small repair call asks the model to fix just its text (SNEAKER_LLM_REPAIR_CALL=0 disables it).
+
+    Calls are bounded by the state's deadline and hedged (tools.hedging); a call past the deadline fails
+    with an LLMError like any other provider error. Streamed calls are neither hedged nor bounded.
+    """
+
+    def __init__(self, api_key: str, model_name: str = DEFAULT_GEMINI_MODEL, model: Optional[Any] = None,
+                 context_cache: Optional[Any] = None, assembler: Optional[PromptAssembler] = None):
         self.api_key = api_key
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash') # Using a cost-effective and capable model
+        self.model_name = model_name
+        self.hedger = Hedger()
+        self.assembler = assembler if assembler is not None else PromptAssembler()
+        self.segment_cache = os.getenv("SNEAKER_PROMPT_SEGMENT_CACHE", "1") == "1"
+        self.repair_call = os.getenv("SNEAKER_LLM_REPAIR_CALL", "1") == "1"
+        if model is not None:
+            # Pre-built client (or a fake in benchmarks); anything with generate_content(_async) works
+            self.model = model
+            self.context_cache = context_cache
+            return
+        # Shared per (api_key, model) across the process, behind the Gemini concurrency and rate limits
+        self.model = get_gemini_model(self.api_key, model_name)
+        self.context_cache = context_cache if context_cache is not None else get_context_cache(self.api_key, model_name)
 
     def get_recommendations(self, state: AgentState) -> Dict[str, Any]:
-        print("---AGENT: General Agent (LLM Decision Maker)---")
-        
+        logger.debug("---AGENT: General Agent (LLM Decision Maker)---")
+        prompt, early_result = self._prepare_prompt(state)
+        if early_result is not None:
+            return early_result
+
+        model, final_prompt = self._bind_prompt(prompt, state)
+        response = None
+        try:
+            response = self.hedger.call(lambda: model.generate_content(final_prompt), time_left(state.get("deadline")))
+        except Exception as e:
+            return self._llm_error(e, response)
+        finally:
+            record_llm_call(final_prompt, response)
+        sneaker_index = self._sneaker_index(state)
+        result = self._parse_response(response, sneaker_index)
+        if self.repair_call and self._unparseable(result):
+            repair_prompt, repaired = self._repair_prompt(response), None
+            try:
+                repaired = self.hedger.call(lambda: self.model.generate_content(repair_prompt), time_left(state.get("deadline")), hedge=False)
+            except Exception as e:
+                logger.warning("GeneralAgent: Repair call failed: %s", e)
+                return result
+            finally:
+                record_llm_call(repair_prompt, repaired)
+            return self._parse_response(repaired, sneaker_index)
+        return result
+
+    async def aget_recommendations(self, state: AgentState) -> Dict[str, Any]:
+        # Same as get_recommendations, but awaits Gemini so the event loop can serve other requests meanwhile
+        logger.debug("---AGENT: General Agent (LLM Decision Maker, async)---")
+        prompt, early_result = self._prepare_prompt(state)
+        if early_result is not None:
+            return early_result
+
+        model, final_prompt = self._bind_prompt(prompt, state)
+        response = None
+        try:
+            response = await self.hedger.acall(lambda: model.generate_content_async(final_prompt), time_left(state.get("deadline")))
+        except Exception as e:
+            return self._llm_error(e, response)
+        finally:
+            record_llm_call(final_prompt, response)
+        sneaker_index = self._sneaker_index(state)
+        result = self._parse_response(response, sneaker_index)
+        if self.repair_call and self._unparseable(result):
+            repair_prompt, repaired = self._repair_prompt(response), None
+            try:
+                repaired = await self.hedger.acall(lambda: self.model.generate_content_async(repair_prompt),
+                                                   time_left(state.get("deadline")), hedge=False)
+            except Exception as e:
+                logger.warning("GeneralAgent: Repair call failed: %s", e)
+                return result
+            finally:
+                record_llm_call(repair_prompt, repaired)
+            return self._parse_response(repaired, sneaker_index)
+        return result
+
+    def stream_recommendations(self, state: AgentState, on_recommendation: Callable[[Recommendation], None]) -> Dict[str, Any]:
+        # Streaming get_recommendations: each validated pick goes to on_recommendation as soon as its JSON object closes
+        logger.debug("---AGENT: General Agent (LLM Decision Maker, streaming)---")
+        prompt, early_result = self._prepare_prompt(state)
+        if early_result is not None:
+            return early_result
+
+        sneaker_index = self._sneaker_index(state)
+        seen_urls: set = set()
+        parser = JSONArrayStreamParser()
+        recommendations: List[Recommendation] = []
+        model, final_prompt = self._bind_prompt(prompt, state)
+        response = None
+        try:
+            response = model.generate_content(final_prompt, stream=True)
+            for chunk in response:
+                for recommendation in self._validate_recommendations(parser.feed(self._chunk_text(chunk)), sneaker_index, seen_urls):
+                    recommendations.append(recommendation)
+                    on_recommendation(recommendation)
+        except Exception as e:
+            return self._stream_error(e, recommendations)
+        finally:
+            self._close_stream(response)
+            record_llm_call(final_prompt, response)
+        return self._stream_result(parser, recommendations)
+
+    async def astream_recommendations(self, state: AgentState, on_recommendation: Callable[[Recommendation], None]) -> Dict[str, Any]:
+        logger.debug("---AGENT: General Agent (LLM Decision Maker, async streaming)---")
+        prompt, early_result = self._prepare_prompt(state)
+        if early_result is not None:
+            return early_result
+
+        sneaker_index = self._sneaker_index(state)
+        seen_urls: set = set()
+        parser = JSONArrayStreamParser()
+        recommendations: List[Recommendation] = []
+        model, final_prompt = self._bind_prompt(prompt, state)
+        response = None
+        try:
+            response = await model.generate_content_async(final_prompt, stream=True)
+            async for chunk in response:
+                for recommendation in self._validate_recommendations(parser.feed(self._chunk_text(chunk)), sneaker_index, seen_urls):
+                    recommendations.append(recommendation)
+                    on_recommendation(recommendation)
+        except Exception as e:
+            return self._stream_error(e, recommendations)
+        finally:
+            self._close_stream(response)
+            record_llm_call(final_prompt, response)
+        return self._stream_result(parser, recommendations)
+
+    def get_batch_recommendations(self, requests: List[Tuple[str, UserPreferences, List[Sneaker]]],
+                                  deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        # One Gemini call for several (request_id, preferences, candidates) triples; results keyed by request id.
+        # Hedged and bounded by `deadline` like get_recommendations.
+        logger.debug("---AGENT: General Agent (LLM Decision Maker, batch of %s)---", len(requests))
+        final_prompt = self.build_batch_prompt(requests)
+        candidates_by_request = {request_id: sneakers for request_id, _, sneakers in requests}
+
+        response = None
+        try:
+            response = self.hedger.call(lambda: self.model.generate_content(final_prompt), time_left(deadline))
+        except Exception as e:
+            error = self._llm_error(e, response)
+            return {request_id: error for request_id in candidates_by_request}
+        finally:
+            record_llm_call(final_prompt, response)
+        return self.parse_batch_response(response, candidates_by_request)
+
+    def _prepare_prompt(self, state: AgentState) -> Tuple[Optional[PromptParts], Optional[Dict[str, Any]]]:
+        # Returns (prompt parts, None), or (None, result) when the node should return early without calling the LLM
         if state.get("error_message"):
-            print(f"GeneralAgent: Skipping due to previous error: {state['error_message']}")
-            return {}
+            logger.warning("GeneralAgent: Skipping due to previous error: %s", state['error_message'])
+            return None, {}
 
         aggregated_sneakers: List[Sneaker] = state.get("aggregated_sneakers", [])
-        user_preferences: UserPreferences = state["user_preferences"]
-
         if not aggregated_sneakers:
-            print("GeneralAgent: No sneakers were aggregated. Cannot make recommendations.")
-            return {"final_recommendations": [], "error_message": "No sneakers found to recommend after filtering by brand agents."}
+            logger.info("GeneralAgent: No sneakers were aggregated. Cannot make recommendations.")
+            return None, {"final_recommendations": [], "error_message": "No sneakers found to recommend after filtering by brand agents."}
+
+        prompt = self.assembler.assemble(state, get_catalog_version(), self._sneakers_json)
+        return prompt, None
 
-        # Construct the prompt for Gemini
+    def _bind_prompt(self, prompt: PromptParts, state: AgentState) -> Tuple[Any, Contents]:
+        # Picks the client and what to send: the fewer prompt parts the client already holds, the more goes over the wire
+        if self.context_cache is None:
+            final_prompt: Contents = prompt.inline()
+            model = self.model
+        else:
+            model, final_prompt = None, [prompt.catalog, prompt.user]
+            if self.segment_cache:
+                segment_prompt = self.assembler.assemble_segment(state, prompt.segment.catalog_version, self._sneakers_json)
+                if segment_prompt is not None:
+                    model = self.context_cache.prefix_model(segment_prompt.segment, segment_prompt.system, segment_prompt.catalog)
+                    if model is not None:
+                        final_prompt = [segment_prompt.user]
+            if model is None:
+                model = self.context_cache.system_model(prompt.system)
+        # Lazy %-formatting: the (large) prompt is only rendered when DEBUG logging is on
+        logger.debug("General Agent prompt to Gemini:\n%s", final_prompt)
+        return model, final_prompt
+
+    def build_prompt(self, aggregated_sneakers: List[Sneaker], user_preferences: UserPreferences) -> str:
+        # The whole prompt as one string, as sent to a client without a context cache
+        state = AgentState(user_preferences=user_preferences, selected_brands=user_preferences["preferred_brands"],
+                           aggregated_sneakers=aggregated_sneakers)
+        return self.assembler.assemble(state, get_catalog_version(), self._sneakers_json).inline()
+
+    def build_batch_prompt(self, requests: List[Tuple[str, UserPreferences, List[Sneaker]]]) -> str:
+        # Several users in one call: each gets its own preferences and candidate list, keyed by request id
         prompt_parts = [
-            "You are an expert AI Sneaker Advisor.",
-            "Your task is to analyze a list of available sneakers and a user\'s preferences to recommend the top 1 to 3 best-fitting sneakers.",
-            "For each recommended sneaker, you MUST provide its exact name, brand, price, URL, image_url (if available), and a concise one-line reason for the recommendation based on the user\'s preferences and the sneaker\'s description.",
-            "The user\'s budget has already been applied to filter the initial list, so focus on matching style, use case, color, and overall suitability based on the descriptions.",
-            "If multiple sneakers are good fits, prioritize those that match more of the user\'s specific preferences (style, color, use case).",
-            "Format your response as a JSON array of objects. Each object should represent a recommended sneaker and include the fields: \"name\", \"brand\", \"price\", \"url\", \"image_url\", \"reason\".",
-            "If no sneakers from the list are a good match for the user\'s specific style, color, or use case preferences, return an empty JSON array [].",
-            "\nUser Preferences:",
-            f"- Gender/Age Group: {user_preferences['gender_age_group']}",
-            f"- Budget Range: ${user_preferences['budget_range'][0]:.2f} - ${user_preferences['budget_range'][1]:.2f}",
-            f"- Preferred Brands: {', '.join(user_preferences['preferred_brands']) if user_preferences['preferred_brands'] else 'Any'}",
-            f"- Desired Style: {user_preferences.get('style', 'Not specified')}",
-            f"- Desired Color: {user_preferences.get('color', 'Not specified')}",
-            f"- Intended Use Case: {user_preferences.get('use_case', 'Not specified')}",
-            "\nAvailable Sneakers (ensure your recommendations come ONLY from this list):"
+            *self._instruction_lines(),
+            "You will receive several independent users, each identified by a request id, with their own preferences and their own list of available sneakers.",
+            "Format your response as one JSON object that maps every request id to a JSON array of recommended sneakers for that user. Each sneaker object must include the fields: \"name\", \"brand\", \"price\", \"url\", \"image_url\", \"reason\".",
+            "Only recommend sneakers from that user\'s own list. If none of a user\'s sneakers are a good match, map their request id to an empty JSON array [].",
         ]
+        for request_id, user_preferences, sneakers in requests:
+            prompt_parts.extend([
+                f"\n=== Request id: {request_id} ===",
+                "User Preferences:",
+                *self._preference_lines(user_preferences),
+                "Available Sneakers:",
+                self._sneakers_json(sneakers),
+            ])
+        prompt_parts.append("\nBased on each user\'s preferences and their available sneakers, provide the top 1 to 3 recommendations per request id in the specified JSON format.")
+        return "\n".join(prompt_parts)
+
+    def _instruction_lines(self) -> List[str]:
+        return list(INSTRUCTION_LINES)
 
+    def _preference_lines(self, user_preferences: UserPreferences) -> List[str]:
+        return preference_lines(user_preferences)
+
+    def _sneakers_json(self, sneakers: List[Sneaker]) -> str:
         # Create a list of dictionaries, suitable for json.dumps
         sneaker_list_for_json = []
-        for s_obj in aggregated_sneakers: # s_obj is a Sneaker TypedDict
+        for s_obj in sneakers: # s_obj is a Sneaker TypedDict
             sneaker_dict = {
                 "brand": s_obj['brand'],
                 "name": s_obj['name'],
@@ -58,76 +264,162 @@ class GeneralAgent:
                 "image_url": s_obj.get('image_url', '') # Provide empty string if None, or adjust if null is preferred
             }
             sneaker_list_for_json.append(sneaker_dict)
-        
-        # Convert the list of dictionaries to a JSON string
-        # indent=2 makes it more readable in the debug output of the prompt
-        available_sneakers_json_str = json.dumps(sneaker_list_for_json, indent=2) 
-        
-        prompt_parts.append(available_sneakers_json_str)
-        
-        prompt_parts.append("\nBased on the user preferences and the available sneakers listed above, provide your top 1 to 3 recommendations in the specified JSON format.")
-        
-        final_prompt = "\n".join(prompt_parts)
-        print("\n--- General Agent Prompt to Gemini ---")
-        print(final_prompt)
-        print("---------------------------------------\n")
 
+        # Compact separators: indentation and spaces were a sizeable share of prompt tokens
+        return json.dumps(sneaker_list_for_json, separators=(",", ":"), ensure_ascii=False)
+
+    @staticmethod
+    def _sneaker_index(state: AgentState) -> SneakerIndex:
+        # The aggregator's index covers every candidate; states built elsewhere get one on the fly
+        sneaker_index = state.get("sneaker_index")
+        if sneaker_index and sneaker_index.get("by_name"):
+            return sneaker_index
+        return build_sneaker_index(state.get("aggregated_sneakers", []))
+
+    def _parse_response(self, response: Any, sneaker_index: SneakerIndex) -> Dict[str, Any]:
         try:
-            response = self.model.generate_content(final_prompt)
-            
-            print("--- Gemini Response Text ---")
+            logger.debug("--- Gemini Response Text ---")
             # print(response.text) # Full text for debugging
-            # Clean the response text to extract valid JSON part
-            # Gemini might add backticks or "json" prefix
-            cleaned_response_text = response.text.strip()
-            if cleaned_response_text.startswith("```json"):
-                cleaned_response_text = cleaned_response_text[7:]
-            if cleaned_response_text.endswith("```"):
-                cleaned_response_text = cleaned_response_text[:-3]
-            cleaned_response_text = cleaned_response_text.strip()
-            
-            print(f"Cleaned Response for JSON parsing: {cleaned_response_text}")
-
-            llm_recommendations = json.loads(cleaned_response_text)
-            
-            # Validate and structure the recommendations
-            final_recommendations: List[Recommendation] = []
-            if isinstance(llm_recommendations, list):
-                for rec_data in llm_recommendations:
-                    if all(key in rec_data for key in ["name", "brand", "price", "url", "reason"]):
-                        # Find the original image_url from aggregated_sneakers if not directly in LLM response, or use what LLM provided
-                        original_sneaker = next((s for s in aggregated_sneakers if s['name'] == rec_data['name'] and s['brand'] == rec_data['brand']), None)
-                        image_url = rec_data.get("image_url")
-                        if not image_url and original_sneaker: # If LLM didn't provide image_url, try to get it from original data
-                            image_url = original_sneaker.get("image_url")
-                        
-                        final_recommendations.append(Recommendation(
-                            name=str(rec_data["name"]),
-                            brand=str(rec_data["brand"]),
-                            price=float(rec_data["price"]),
-                            url=str(rec_data["url"]),
-                            reason=str(rec_data["reason"]),
-                            image_url=str(image_url) if image_url else None
-                        ))
-                    else:
-                        print(f"GeneralAgent: LLM recommendation missing required keys: {rec_data}")
-            
-            if not final_recommendations and aggregated_sneakers:
-                 print("GeneralAgent: LLM returned no valid recommendations, or no sneakers matched detailed criteria.")
+            cleaned_response_text = self._clean_response_text(response.text)
+            logger.debug("Cleaned Response for JSON parsing: %s", cleaned_response_text)
+
+            try:
+                llm_recommendations = json.loads(cleaned_response_text)
+            except json.JSONDecodeError:
+                # Cheap local repair before anything costs another call
+                llm_recommendations = salvage_json_array(cleaned_response_text)
+                if not llm_recommendations:
+                    raise
+                logger.info("GeneralAgent: Salvaged %s recommendations from malformed JSON.", len(llm_recommendations))
+            final_recommendations = self._validate_recommendations(llm_recommendations, sneaker_index)
+
+            if not final_recommendations and sneaker_index["by_name"]:
+                 logger.info("GeneralAgent: LLM returned no valid recommendations, or no sneakers matched detailed criteria.")
                  # error_message = "The LLM advisor couldn\'t find a specific match based on your detailed preferences from the available options."
                  # return {"final_recommendations": [], "error_message": error_message} # Let workflow handle empty list
 
-            print(f"GeneralAgent: Generated {len(final_recommendations)} recommendations.")
+            logger.info("GeneralAgent: Generated %s recommendations.", len(final_recommendations))
             return {"final_recommendations": final_recommendations}
 
         except json.JSONDecodeError as e:
-            print(f"GeneralAgent: Error decoding JSON from LLM response: {e}")
-            print(f"LLM Raw Response was: {response.text if 'response' in locals() else 'Response object not created'}")
-            return {"error_message": f"LLMResponseParseError: Could not parse recommendations. Raw: {response.text if 'response' in locals() else 'N/A'}"}
+            logger.warning("GeneralAgent: Error decoding JSON from LLM response: %s", e)
+            logger.warning("LLM Raw Response was: %s", response.text)
+            return {"error_message": f"{LLM_PARSE_ERROR}: Could not parse recommendations. Raw: {response.text}"}
         except Exception as e:
-            print(f"GeneralAgent: An unexpected error occurred during LLM call: {e}")
-            # Check if response object exists before trying to access its text attribute
-            error_details = str(e)
-            if 'response' in locals() and hasattr(response, 'text'):
-                error_details += f" LLM Raw Response: {response.text}"
-            return {"error_message": f"LLMError: {error_details}"}
+            return self._llm_error(e, response)
+
+    def parse_batch_response(self, response: Any, candidates_by_request: Dict[str, List[Sneaker]]) -> Dict[str, Dict[str, Any]]:
+        # Returns one node-style result per request id; a request the LLM left out gets an empty list
+        try:
+            llm_results = json.loads(self._clean_response_text(response.text))
+            if not isinstance(llm_results, dict):
+                raise ValueError(f"expected a JSON object keyed by request id, got {type(llm_results).__name__}")
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.warning("GeneralAgent: Error decoding batch JSON from LLM response: %s", e)
+            error = {"error_message": f"{LLM_PARSE_ERROR}: Could not parse batch recommendations. Raw: {response.text}"}
+            return {request_id: error for request_id in candidates_by_request}
+        except Exception as e:
+            error = self._llm_error(e, response)
+            return {request_id: error for request_id in candidates_by_request}
+
+        results = {}
+        for request_id, candidates in candidates_by_request.items():
+            final_recommendations = self._validate_recommendations(llm_results.get(request_id, []), build_sneaker_index(candidates))
+            results[request_id] = {"final_recommendations": final_recommendations}
+        logger.info("GeneralAgent: Parsed batch recommendations for %s requests.", len(results))
+        return results
+
+    @staticmethod
+    def _unparseable(result: Dict[str, Any]) -> bool:
+        return (result.get("error_message") or "").startswith(LLM_PARSE_ERROR)
+
+    @staticmethod
+    def _repair_prompt(response: Any) -> str:
+        # Only the broken answer goes back, not the catalog: a few hundred tokens instead of the full prompt
+        return REPAIR_PROMPT + response.text[:REPAIR_MAX_CHARS]
+
+    def _clean_response_text(self, text: str) -> str:
+        # Clean the response text to extract valid JSON part
+        # Gemini might add backticks or "json" prefix
+        cleaned_response_text = text.strip()
+        if cleaned_response_text.startswith("```json"):
+            cleaned_response_text = cleaned_response_text[7:]
+        if cleaned_response_text.endswith("```"):
+            cleaned_response_text = cleaned_response_text[:-3]
+        return cleaned_response_text.strip()
+
+    def _validate_recommendations(self, llm_recommendations: Any, sneaker_index: SneakerIndex, seen_urls: Optional[set] = None) -> List[Recommendation]:
+        # Joins each LLM pick back to the catalog in O(1): by url, else by (brand, name).
+        # Picks that match nothing are hallucinated and dropped; catalog fields (price included) override the LLM's copy.
+        final_recommendations: List[Recommendation] = []
+        if not isinstance(llm_recommendations, list):
+            return final_recommendations
+        seen_urls = set() if seen_urls is None else seen_urls  # Shared across calls when a stream is validated piecewise
+        for rec_data in llm_recommendations:
+            if not (isinstance(rec_data, dict) and rec_data.get("reason") and (rec_data.get("url") or (rec_data.get("brand") and rec_data.get("name")))):
+                logger.warning("GeneralAgent: LLM recommendation missing required keys: %s", rec_data)
+                continue
+            sneaker = sneaker_index["by_url"].get(str(rec_data.get("url") or ""))
+            if sneaker is None and rec_data.get("brand") and rec_data.get("name"):
+                sneaker = sneaker_index["by_name"].get(sneaker_key(str(rec_data["brand"]), str(rec_data["name"])))
+            if sneaker is None:
+                logger.warning("GeneralAgent: Dropping recommendation not in the candidate list: %s %s", rec_data.get("brand"), rec_data.get("name"))
+                continue
+            if sneaker["url"] in seen_urls:
+                continue
+            seen_urls.add(sneaker["url"])
+
+            price = float(sneaker["price"])
+            try:
+                if abs(float(rec_data.get("price")) - price) > 0.005:
+                    logger.info("GeneralAgent: Corrected LLM price %s to catalog price %s for %s.", rec_data.get("price"), price, sneaker["name"])
+            except (TypeError, ValueError):
+                pass  # Missing or malformed price, the catalog's is used either way
+            image_url = sneaker.get("image_url") or rec_data.get("image_url")
+            final_recommendations.append(Recommendation(
+                name=sneaker["name"],
+                brand=sneaker["brand"],
+                price=price,
+                url=sneaker["url"],
+                reason=str(rec_data["reason"]),
+                image_url=str(image_url) if image_url else None
+            ))
+        return final_recommendations
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> str:
+        try:
+            return chunk.text
+        except ValueError:  # The SDK raises for chunks without text parts (e.g. the final finish-reason chunk)
+            return ""
+
+    @staticmethod
+    def _close_stream(response: Any) -> None:
+        # Releases the client's concurrency slot even if the stream was abandoned half-way
+        close = getattr(response, "close", None)
+        if callable(close):
+            close()
+
+    def _stream_result(self, parser: JSONArrayStreamParser, recommendations: List[Recommendation]) -> Dict[str, Any]:
+        if not parser.started:
+            logger.warning("GeneralAgent: Streamed LLM response contained no JSON array.")
+            return {"error_message": f"{LLM_PARSE_ERROR}: Could not parse recommendations from the streamed response."}
+        if parser.pending:
+            logger.warning("GeneralAgent: Streamed LLM response ended inside a recommendation; keeping the %s complete ones.", len(recommendations))
+        logger.info("GeneralAgent: Streamed %s recommendations.", len(recommendations))
+        return {"final_recommendations": recommendations}
+
+    def _stream_error(self, e: Exception, recommendations: List[Recommendation]) -> Dict[str, Any]:
+        if recommendations:
+            # Picks already sent to the user stay valid; the stream just ended early
+            logger.warning("GeneralAgent: LLM stream failed after %s recommendations: %s", len(recommendations), e)
+            return {"final_recommendations": recommendations}
+        return self._llm_error(e, None)  # A partial stream has no usable .text to attach
+
+    def _llm_error(self, e: Exception, response: Any) -> Dict[str, Any]:
+        logger.warning("GeneralAgent: An unexpected error occurred during LLM call: %s", e)
+        # Check if response object exists before trying to access its text attribute
+        error_details = str(e)
+        if response is not None and hasattr(response, 'text'):
+            error_details += f" LLM Raw Response: {response.text}"
+        return {"error_message": f"{LLM_ERROR}: {error_details}"}
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Any, Awaitable, Callable, Deque, Optional, Set
+
+from .tracing import LLM_HEDGES
+
+logger = logging.getLogger(__name__)
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before the LLM answered."""
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    # Seconds until a time.time() deadline (negative once past), or None for a request without one
+    return None if deadline is None else deadline - time.time()
+
+class LatencyWindow:
+    """The last `size` call latencies, for quantiles of recent provider behaviour."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+_call_pool: Optional[ThreadPoolExecutor] = None
+_call_pool_lock = Lock()
+
+def _get_call_pool() -> ThreadPoolExecutor:
+    # Sync calls run here so the caller can stop waiting; sized for primaries plus hedges (SNEAKER_LLM_CALL_THREADS)
+    global _call_pool
+    if _call_pool is None:
+        with _call_pool_lock:
+            if _call_pool is None:
+                _call_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SNEAKER_LLM_CALL_THREADS", "32")), thread_name_prefix="llm-call")
+    return _call_pool
+
+def _reset_after_fork() -> None:
+    global _call_pool, _call_pool_lock
+    _call_pool, _call_pool_lock = None, Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+class Hedger:
+    """Runs an LLM call under a timeout, sending a second identical call if the first is slow; the first answer wins.
+
+    The hedge goes out after the recent p95 latency (SNEAKER_LLM_HEDGE_QUANTILE), so about one call in twenty
+    is duplicated and a slow provider response no longer sets the request's latency. Until `min_samples` calls
+    have been seen the delay is SNEAKER_LLM_HEDGE_INITIAL_DELAY. SNEAKER_LLM_HEDGE=0 disables hedging; the timeout
+    still applies. A losing sync call finishes on its pool thread and is discarded; a losing async call is cancelled.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, quantile: Optional[float] = None, initial_delay: Optional[float] = None,
+                 min_delay: float = 0.05, min_samples: int = 20, window: int = 200):
+        self.enabled = enabled if enabled is not None else os.getenv("SNEAKER_LLM_HEDGE", "1") == "1"
+        self.quantile = quantile if quantile is not None else float(os.getenv("SNEAKER_LLM_HEDGE_QUANTILE", "0.95"))
+        self.initial_delay = initial_delay if initial_delay is not None else float(os.getenv("SNEAKER_LLM_HEDGE_INITIAL_DELAY", "3"))
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latencies = LatencyWindow(window)
+
+    def delay(self) -> Optional[float]:
+        """Seconds before the hedge goes out, or None when hedging is off."""
+        if not self.enabled:
+            return None
+        if len(self.latencies) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.latencies.quantile(self.quantile))
+
+    def _timed(self, send: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        response = send()
+        self.latencies.record(time.perf_counter() - started)
+        return response
+
+    async def _atimed(self, send: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        response = await send()
+        self.latencies.record(time.perf_counter() - started)
+        return response
+
+    def call(self, send: Callable[[], Any], timeout: Optional[float] = None, hedge: bool = True) -> Any:
+        delay = self.delay() if hedge else None
+        if delay is None and timeout is None:
+            return send()
+        if timeout is not None and timeout <= 0:
+            raise DeadlineExceeded("no time left for the LLM call")
+        started = time.monotonic()
+        pool = _get_call_pool()
+        pending: Set[Future] = {pool.submit(self._timed, send)}
+        second: Optional[Future] = None
+        while True:
+            done, pending = wait(pending, timeout=self._wait_time(started, timeout, delay, second is None), return_when=FIRST_COMPLETED)
+            error = None
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        LLM_HEDGES.inc(outcome="won")
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                raise error
+            second = self._maybe_hedge(started, timeout, delay, second, lambda: pool.submit(self._timed, send))
+            if second is not None and second not in pending and not second.done():
+                pending.add(second)
+
+    async def acall(self, send: Callable[[], Awaitable[Any]], timeout: Optional[float] = None, hedge: bool = True) -> Any:
+        delay = self.delay() if hedge else None
+        if delay is None and timeout is None:
+            return await send()
+        if timeout is not None and timeout <= 0:
+            raise DeadlineExceeded("no time left for the LLM call")
+        started = time.monotonic()
+        pending: Set[asyncio.Future] = {asyncio.ensure_future(self._atimed(send))}
+        second: Optional[asyncio.Future] = None
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, timeout=self._wait_time(started, timeout, delay, second is None),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                error = None
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            LLM_HEDGES.inc(outcome="won")
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                second = self._maybe_hedge(started, timeout, delay, second, lambda: asyncio.ensure_future(self._atimed(send)))
+                if second is not None and second not in pending and not second.done():
+                    pending.add(second)
+        finally:
+            for task in pending:
+                task.cancel()  # Releases the loser's rate-limiter slot
+
+    @staticmethod
+    def _wait_time(started: float, timeout: Optional[float], delay: Optional[float], can_hedge: bool) -> Optional[float]:
+        # Until the deadline, or until the hedge is due if one can still go out
+        elapsed = time.monotonic() - started
+        waits = [timeout - elapsed] if timeout is not None else []
+        if can_hedge and delay is not None:
+            waits.append(delay - elapsed)
+        return max(0.0, min(waits)) if waits else None
+
+    @staticmethod
+    def _maybe_hedge(started: float, timeout: Optional[float], delay: Optional[float], second: Any, submit: Callable[[], Any]) -> Any:
+        elapsed = time.monotonic() - started
+        if timeout is not None and elapsed >= timeout:
+            raise DeadlineExceeded(f"no LLM answer within {timeout:.2f}s")
+        if second is None and delay is not None and elapsed >= delay:
+            LLM_HEDGES.inc(outcome="sent")
+            logger.info("Hedger: No answer after %.2fs, sending a hedged request.", elapsed)
+            return submit()
+        return second
@@ -0,0 +1,453 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from .data_source import SNEAKER_COLUMNS, SQLITE_SCHEMA, SQLiteConnectionPool, create_postgres_pool
+from .enrichment import ENRICHMENT_VERSION, TAG_FIELDS, encode_tags, extract_tags, normalise_gender, to_usd, usd_rates
+
+logger = logging.getLogger(__name__)
+
+# Fields that make up a row's content; brand + url is the key and not part of the hash.
+# Tags and ENRICHMENT_VERSION are hashed too, so new tagging rules rewrite rows on the next ingest.
+CONTENT_FIELDS = ("name", "price", "gender", "description", "image_url", "currency", "list_price")
+ENRICHED_COLUMNS = ("currency", "list_price") + TAG_FIELDS
+INCOMING_COLUMNS = SNEAKER_COLUMNS + ENRICHED_COLUMNS + ("content_hash",)
+STAGING_COLUMNS = INCOMING_COLUMNS + ("line_no",)
+REQUIRED_FIELDS = ("name", "price", "url", "gender")
+
+# Channel the serving processes can LISTEN on to pick up new catalog versions
+CATALOG_CHANNEL = "shoes_catalog"
+
+# Change tracking for in-process catalog snapshots (tools.catalog_snapshot): every insert/update takes the next
+# shoes_change_seq value, deletes leave a tombstone, and each statement that touched shoes NOTIFYs the channel
+# (delivered at commit; identical payloads within a transaction are folded into one)
+POSTGRES_CHANGE_TRACKING = f"""
+CREATE OR REPLACE FUNCTION shoes_track_change() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO shoes_tombstones (id, change_seq) VALUES (OLD.id, nextval('shoes_change_seq'))
+        ON CONFLICT (id) DO UPDATE SET change_seq = excluded.change_seq;
+        RETURN OLD;
+    END IF;
+    NEW.change_seq := nextval('shoes_change_seq');
+    RETURN NEW;
+END $$;
+CREATE OR REPLACE FUNCTION shoes_notify_change() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('{CATALOG_CHANNEL}', 'rows');
+    RETURN NULL;
+END $$;
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'shoes_track_change') THEN
+        CREATE TRIGGER shoes_track_change BEFORE INSERT OR UPDATE OR DELETE ON shoes
+        FOR EACH ROW EXECUTE FUNCTION shoes_track_change();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'shoes_notify_change') THEN
+        CREATE TRIGGER shoes_notify_change AFTER INSERT OR UPDATE OR DELETE ON shoes
+        FOR EACH STATEMENT EXECUTE FUNCTION shoes_notify_change();
+    END IF;
+END $$;
+"""
+
+# Idempotent, so older databases created from the original shoes_dbb.sql are upgraded on first run
+POSTGRES_MIGRATION = """
+ALTER TABLE shoes ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+ALTER TABLE shoes ADD COLUMN IF NOT EXISTS currency CHAR(3);
+ALTER TABLE shoes ADD COLUMN IF NOT EXISTS list_price DECIMAL(10, 2);
+ALTER TABLE shoes ADD COLUMN IF NOT EXISTS colors TEXT[] NOT NULL DEFAULT '{}';
+ALTER TABLE shoes ADD COLUMN IF NOT EXISTS use_cases TEXT[] NOT NULL DEFAULT '{}';
+ALTER TABLE shoes ADD COLUMN IF NOT EXISTS styles TEXT[] NOT NULL DEFAULT '{}';
+CREATE INDEX IF NOT EXISTS idx_shoes_colors ON shoes USING GIN (colors);
+CREATE INDEX IF NOT EXISTS idx_shoes_use_cases ON shoes USING GIN (use_cases);
+CREATE INDEX IF NOT EXISTS idx_shoes_styles ON shoes USING GIN (styles);
+ALTER TABLE shoes DROP CONSTRAINT IF EXISTS shoes_brand_check;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_shoes_brand_url ON shoes (brand, url);
+CREATE TABLE IF NOT EXISTS catalog_meta (id INT PRIMARY KEY CHECK (id = 1), version BIGINT NOT NULL);
+INSERT INTO catalog_meta (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+CREATE SEQUENCE IF NOT EXISTS shoes_change_seq;
+ALTER TABLE shoes ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('shoes_change_seq');
+CREATE INDEX IF NOT EXISTS idx_shoes_change_seq ON shoes (change_seq);
+CREATE TABLE IF NOT EXISTS shoes_tombstones (id INT PRIMARY KEY, change_seq BIGINT NOT NULL);
+""" + POSTGRES_CHANGE_TRACKING
+SQLITE_MIGRATION = """
+CREATE UNIQUE INDEX IF NOT EXISTS uq_shoes_brand_url ON shoes (brand, url);
+CREATE TABLE IF NOT EXISTS catalog_meta (id INTEGER PRIMARY KEY CHECK (id = 1), version BIGINT NOT NULL);
+INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0);
+CREATE INDEX IF NOT EXISTS idx_shoes_change_seq ON shoes (change_seq);
+CREATE TABLE IF NOT EXISTS shoes_tombstones (id INTEGER PRIMARY KEY, change_seq BIGINT NOT NULL);
+CREATE TABLE IF NOT EXISTS shoes_change_seq (id INTEGER PRIMARY KEY CHECK (id = 1), value BIGINT NOT NULL);
+INSERT OR IGNORE INTO shoes_change_seq (id, value) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS shoes_track_insert AFTER INSERT ON shoes BEGIN
+    UPDATE shoes_change_seq SET value = value + 1 WHERE id = 1;
+    UPDATE shoes SET change_seq = (SELECT value FROM shoes_change_seq WHERE id = 1) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS shoes_track_update AFTER UPDATE ON shoes WHEN NEW.change_seq IS OLD.change_seq BEGIN
+    UPDATE shoes_change_seq SET value = value + 1 WHERE id = 1;
+    UPDATE shoes SET change_seq = (SELECT value FROM shoes_change_seq WHERE id = 1) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS shoes_track_delete AFTER DELETE ON shoes BEGIN
+    UPDATE shoes_change_seq SET value = value + 1 WHERE id = 1;
+    INSERT OR REPLACE INTO shoes_tombstones (id, change_seq) VALUES (OLD.id, (SELECT value FROM shoes_change_seq WHERE id = 1));
+END;
+"""
+# Columns added to SQLite files created before them (no ADD COLUMN IF NOT EXISTS there)
+SQLITE_ADDED_COLUMNS = {
+    "content_hash": "CHAR(32)",
+    "currency": "CHAR(3)",
+    "list_price": "DECIMAL(10, 2)",
+    "colors": "TEXT NOT NULL DEFAULT ''",
+    "use_cases": "TEXT NOT NULL DEFAULT ''",
+    "styles": "TEXT NOT NULL DEFAULT ''",
+    "change_seq": "BIGINT NOT NULL DEFAULT 0",  # Rows from before change tracking stay 0 and load with the first snapshot
+}
+
+def content_hash(row: Dict[str, Any]) -> str:
+    # Unit separator between fields, so ("ab", "c") and ("a", "bc") hash differently
+    fields = [f"{row[field]:.2f}" if field in ("price", "list_price") else row[field] for field in CONTENT_FIELDS]
+    fields.extend(",".join(row[field]) for field in TAG_FIELDS)
+    fields.append(str(ENRICHMENT_VERSION))
+    return hashlib.md5("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+def enrich_row(row: Dict[str, Any], currency: str, rates: Dict[str, float]) -> Optional[str]:
+    """Normalises `row` in place (gender, USD price, tags); returns a rejection reason instead when it can't.
+
+    `row["price"]` is the list price in `currency` on the way in and USD on the way out.
+    """
+    gender = normalise_gender(row["gender"])
+    if gender is None:
+        return "bad_gender"
+    try:
+        price = to_usd(row["price"], currency, rates)
+    except KeyError:
+        return "unknown_currency"
+    row.update(gender=gender, currency=currency.upper(), list_price=row["price"], price=price)
+    row.update(extract_tags(f"{row['name']} {row['description']}"))
+    return None
+
+def row_values(row: Dict[str, Any], columns: Sequence[str], dialect: str) -> Tuple[Any, ...]:
+    return tuple(encode_tags(row[column], dialect) if column in TAG_FIELDS else row[column] for column in columns)
+
+def read_feed(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Streams records from a CSV (header row) or JSONL feed, one at a time."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def normalise_records(records: Iterable[Dict[str, Any]], brand: str, rejected: Counter, dialect: str = "postgres",
+                      currency: str = "USD", rates: Optional[Dict[str, float]] = None) -> Iterator[Tuple[Any, ...]]:
+    """Feed records -> enriched staging tuples (STAGING_COLUMNS order). Bad records are counted in `rejected`, not raised.
+
+    A record's own `currency` field wins over the feed-wide `currency`; prices are stored in USD.
+    """
+    rates = rates if rates is not None else usd_rates()
+    for line_no, record in enumerate(records, start=1):
+        if record.get("brand") and record["brand"] != brand:
+            rejected["wrong_brand"] += 1
+            continue
+        if any(not record.get(field) for field in REQUIRED_FIELDS):
+            rejected["missing_field"] += 1
+            continue
+        try:
+            price = round(float(record["price"]), 2)
+        except (TypeError, ValueError):
+            rejected["bad_price"] += 1
+            continue
+        row = {
+            "brand": brand,
+            "name": str(record["name"]).strip(),
+            "price": price,
+            "url": str(record["url"]).strip(),
+            "gender": str(record["gender"]).strip(),
+            "description": str(record.get("description") or "").strip(),
+            "image_url": str(record.get("image_url") or "").strip(),
+        }
+        reason = enrich_row(row, str(record.get("currency") or currency).strip(), rates)
+        if reason is not None:
+            rejected[reason] += 1
+            continue
+        row["content_hash"] = content_hash(row)
+        yield row_values(row, INCOMING_COLUMNS, dialect) + (line_no,)
+
+def migrate_catalog(conn: Any, cur: Any, dialect: str = "postgres") -> None:
+    """Brings `shoes` up to the current schema (enrichment columns, catalog_meta, change tracking); the caller commits."""
+    if dialect == "sqlite":
+        columns = {row[1] for row in cur.execute("PRAGMA table_info(shoes)").fetchall()}
+        for column, definition in SQLITE_ADDED_COLUMNS.items():
+            if column not in columns:
+                cur.execute(f"ALTER TABLE shoes ADD COLUMN {column} {definition}")
+        conn.executescript(SQLITE_MIGRATION)
+    else:
+        cur.execute(POSTGRES_MIGRATION)
+
+def change_tracking_installed(cur: Any, dialect: str = "postgres") -> bool:
+    # Checked before migrating from a serving process: the Postgres migration takes table locks even when it has nothing to do
+    if dialect == "sqlite":
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = 'shoes_track_delete'")
+    else:
+        cur.execute("SELECT COUNT(*) FROM pg_trigger WHERE tgname = 'shoes_notify_change'")
+    return cur.fetchone()[0] > 0
+
+class _CSVStream:
+    """File-like view of a row iterator as CSV text, read in chunks by COPY ... FROM STDIN."""
+
+    def __init__(self, rows: Iterator[Tuple[Any, ...]]):
+        self._rows = rows
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+    readline = read  # copy_expert only needs read(); some driver versions probe readline
+
+class CatalogIngestor:
+    """Loads one brand's feed into `shoes`: staging table -> dedup -> upsert on (brand, url) -> optional delete.
+
+    Everything after the staging load runs server-side in one transaction, so memory stays bounded
+    by the driver's COPY/batch buffer whatever the feed size, and readers never see a half-applied feed.
+    Rows whose content hash is unchanged are not rewritten.
+    `source`, if given, is the in-process SQLSneakerSource / SnapshotSneakerSource to bump when the catalog changed.
+    """
+
+    def __init__(self, pool: Any, dialect: str = "postgres", batch_size: int = 10_000, source: Optional[Any] = None):
+        self.pool = pool
+        self.source = source
+        self.dialect = dialect
+        self.batch_size = batch_size
+        self.placeholder = "?" if dialect == "sqlite" else "%s"
+
+    def ingest(self, brand: str, records: Iterable[Dict[str, Any]], delete_missing: bool = False,
+               currency: str = "USD") -> Dict[str, Any]:
+        """`currency` is the feed's price currency for records without their own `currency` field."""
+        rejected: Counter = Counter()
+        rows = normalise_records(records, brand, rejected, self.dialect, currency)
+        conn = self.pool.getconn()
+        try:
+            cur = conn.cursor()
+            try:
+                self._migrate(conn, cur)
+                self._load_staging(cur, rows)
+                report = self._apply(cur, brand, delete_missing)
+                report["rejected"] = sum(rejected.values())
+                changed = report["inserted"] or report["updated"] or report["deleted"]
+                report["catalog_version"] = self._bump_version(cur) if changed else self._current_version(cur)
+                conn.commit()
+            finally:
+                cur.close()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+        if rejected:
+            logger.warning("Ingest: Rejected %s %s records: %s", sum(rejected.values()), brand, dict(rejected))
+        if changed and self.source is not None:
+            # Drops this process's version-keyed caches right away; other processes follow catalog_meta / NOTIFY
+            self.source.bump_catalog_version()
+        report["brand"] = brand
+        return report
+
+    def enrich_existing(self, currency: str = "USD") -> Dict[str, Any]:
+        """Backfills enrichment into rows already in `shoes` (e.g. loaded by insert_shoes.sql), in id order.
+
+        Rows that were never enriched (currency IS NULL) have their price in `currency` and are converted once;
+        enriched rows are only re-tagged. Rows whose recomputed hash matches are left alone, and each batch
+        commits on its own, so an interrupted run can simply be started again.
+        """
+        p = self.placeholder
+        rates = usd_rates()
+        columns = ("id",) + SNEAKER_COLUMNS + ("currency", "list_price", "content_hash")
+        update_columns = ("gender", "price") + ENRICHED_COLUMNS + ("content_hash",)
+        update = f"UPDATE shoes SET {', '.join(f'{column} = {p}' for column in update_columns)} WHERE id = {p}"
+        report = {"scanned": 0, "updated": 0, "rejected": Counter()}
+        last_id = 0
+        conn = self.pool.getconn()
+        try:
+            cur = conn.cursor()
+            try:
+                self._migrate(conn, cur)
+                conn.commit()
+                while True:
+                    cur.execute(f"SELECT {', '.join(columns)} FROM shoes WHERE id > {p} ORDER BY id LIMIT {p}", (last_id, self.batch_size))
+                    batch = cur.fetchall()
+                    if not batch:
+                        break
+                    updates = []
+                    for values in batch:
+                        row = dict(zip(columns, values))
+                        row["price"] = float(row["list_price"] if row["currency"] else row["price"])
+                        reason = enrich_row(row, row["currency"] or currency, rates)
+                        if reason is not None:
+                            report["rejected"][reason] += 1
+                            continue
+                        stored_hash, row["content_hash"] = row["content_hash"], content_hash(row)
+                        if row["content_hash"] != stored_hash:
+                            updates.append(row_values(row, update_columns, self.dialect) + (row["id"],))
+                    if updates:
+                        cur.executemany(update, updates)
+                    conn.commit()
+                    report["scanned"] += len(batch)
+                    report["updated"] += len(updates)
+                    last_id = batch[-1][0]
+                report["catalog_version"] = self._bump_version(cur) if report["updated"] else self._current_version(cur)
+                conn.commit()
+            finally:
+                cur.close()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+        if report["rejected"]:
+            logger.warning("Enrich: Left %s rows unenriched: %s", sum(report["rejected"].values()), dict(report["rejected"]))
+        if report["updated"] and self.source is not None:
+            self.source.bump_catalog_version()
+        report["rejected"] = sum(report["rejected"].values())
+        return report
+
+    def _migrate(self, conn: Any, cur: Any) -> None:
+        migrate_catalog(conn, cur, self.dialect)
+
+    def _load_staging(self, cur: Any, rows: Iterator[Tuple[Any, ...]]) -> None:
+        tag_type = "TEXT" if self.dialect == "sqlite" else "TEXT[]"
+        column_defs = ("brand VARCHAR(50), name VARCHAR(100), price DECIMAL(10, 2), url VARCHAR(255), gender VARCHAR(20), "
+                       "description TEXT, image_url VARCHAR(255), currency CHAR(3), list_price DECIMAL(10, 2), "
+                       f"colors {tag_type}, use_cases {tag_type}, styles {tag_type}, content_hash CHAR(32)")
+        if self.dialect == "sqlite":
+            # No COPY: batched executemany into a keyed staging table, where a later duplicate replaces an earlier one
+            cur.execute("DROP TABLE IF EXISTS temp.shoes_incoming")
+            cur.execute(f"CREATE TEMP TABLE shoes_incoming ({column_defs}, line_no INTEGER, PRIMARY KEY (brand, url))")
+            insert = f"INSERT OR REPLACE INTO shoes_incoming ({', '.join(STAGING_COLUMNS)}) VALUES ({', '.join('?' * len(STAGING_COLUMNS))})"
+            while True:
+                batch = [row for _, row in zip(range(self.batch_size), rows)]
+                if not batch:
+                    break
+                cur.executemany(insert, batch)
+            return
+
+        cur.execute(f"CREATE TEMP TABLE shoes_staging ({column_defs}, line_no BIGINT) ON COMMIT DROP")
+        cur.copy_expert(f"COPY shoes_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", _CSVStream(rows))
+        # Last occurrence wins when a feed lists the same product twice (ON CONFLICT can't touch a row twice)
+        cur.execute(
+            f"CREATE TEMP TABLE shoes_incoming ON COMMIT DROP AS "
+            f"SELECT DISTINCT ON (brand, url) {', '.join(INCOMING_COLUMNS)} FROM shoes_staging ORDER BY brand, url, line_no DESC"
+        )
+        cur.execute("CREATE INDEX ON shoes_incoming (brand, url)")
+        cur.execute("ANALYZE shoes_incoming")
+
+    def _apply(self, cur: Any, brand: str, delete_missing: bool) -> Dict[str, Any]:
+        p = self.placeholder
+        # Counted before the upsert: new keys are inserts, known keys with another hash are updates, the rest is skipped
+        cur.execute(
+            "SELECT COUNT(*), "
+            "COALESCE(SUM(CASE WHEN s.url IS NULL THEN 1 ELSE 0 END), 0), "
+            "COALESCE(SUM(CASE WHEN s.url IS NOT NULL AND (s.content_hash IS NULL OR s.content_hash <> t.content_hash) THEN 1 ELSE 0 END), 0) "
+            "FROM shoes_incoming t LEFT JOIN shoes s ON s.brand = t.brand AND s.url = t.url"
+        )
+        staged, inserted, updated = (int(value) for value in cur.fetchone())
+
+        content_columns = [column for column in INCOMING_COLUMNS if column not in ("brand", "url")]
+        cur.execute(
+            f"INSERT INTO shoes ({', '.join(INCOMING_COLUMNS)}) "
+            f"SELECT {', '.join(INCOMING_COLUMNS)} FROM shoes_incoming WHERE true "  # WHERE true: SQLite's INSERT ... SELECT ... ON CONFLICT parse rule
+            f"ON CONFLICT (brand, url) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in content_columns)} "
+            f"WHERE shoes.content_hash IS NULL OR shoes.content_hash <> excluded.content_hash"
+        )
+
+        deleted = 0
+        if delete_missing:
+            # The feed is the brand's whole catalog: products it no longer lists are gone
+            cur.execute(
+                f"DELETE FROM shoes WHERE brand = {p} AND NOT EXISTS "
+                f"(SELECT 1 FROM shoes_incoming t WHERE t.brand = shoes.brand AND t.url = shoes.url)",
+                (brand,),
+            )
+            deleted = max(cur.rowcount, 0)
+        return {"staged": staged, "inserted": inserted, "updated": updated, "unchanged": staged - inserted - updated, "deleted": deleted}
+
+    def _current_version(self, cur: Any) -> int:
+        cur.execute("SELECT version FROM catalog_meta WHERE id = 1")
+        return int(cur.fetchone()[0])
+
+    def _bump_version(self, cur: Any) -> int:
+        cur.execute("UPDATE catalog_meta SET version = version + 1 WHERE id = 1")
+        version = self._current_version(cur)
+        if self.dialect != "sqlite":
+            # Delivered at commit, only if the transaction commits
+            cur.execute("SELECT pg_notify(%s, %s)", (CATALOG_CHANNEL, str(version)))
+        return version
+
+# --- Ingestion CLI ---
+# Run from the AI/ directory:  python -m tools.ingest --brand Nike feeds/nike.csv [--delete-missing] [--currency THB]
+# Existing rows:                python -m tools.ingest --enrich-existing --currency THB
+# Targets Postgres (SHOES_DB_* env) by default, or SQLite with SHOES_DATA_SOURCE=sqlite / --dialect sqlite.
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Load a brand's CSV/JSONL catalog feed into the shoes table")
+    parser.add_argument("feeds", nargs="*", help="Feed files, read in order as one feed")
+    parser.add_argument("--brand")
+    parser.add_argument("--currency", default="USD", help="Currency of prices in the feed (or of not yet enriched rows)")
+    parser.add_argument("--enrich-existing", action="store_true",
+                        help="Normalise and tag the rows already in the table instead of loading a feed")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension")
+    parser.add_argument("--delete-missing", action="store_true", help="Delete the brand's rows that the feed no longer lists")
+    parser.add_argument("--dialect", choices=["postgres", "sqlite"],
+                        default="sqlite" if os.getenv("SHOES_DATA_SOURCE", "").lower() == "sqlite" else "postgres")
+    parser.add_argument("--sqlite-path", default=os.getenv("SHOES_SQLITE_PATH", "shoes.db"))
+    args = parser.parse_args(argv)
+    if not args.enrich_existing and not (args.brand and args.feeds):
+        parser.error("--brand and at least one feed are required unless --enrich-existing is given")
+
+    if args.dialect == "sqlite":
+        pool = SQLiteConnectionPool(args.sqlite_path)
+        conn = pool.getconn()
+        try:
+            conn.executescript(SQLITE_SCHEMA)  # Creates a fresh file's tables; existing ones are migrated by the ingestor
+        finally:
+            pool.putconn(conn)
+    else:
+        pool = create_postgres_pool(1, 1)
+
+    def records() -> Iterator[Dict[str, Any]]:
+        for path in args.feeds:
+            yield from read_feed(path, args.format)
+
+    ingestor = CatalogIngestor(pool, dialect=args.dialect)
+    if args.enrich_existing:
+        report = ingestor.enrich_existing(args.currency)
+        print(f"Enrich: scanned {report['scanned']}, updated {report['updated']}, rejected {report['rejected']}; "
+              f"catalog version {report['catalog_version']}")
+        return
+
+    report = ingestor.ingest(args.brand, records(), delete_missing=args.delete_missing, currency=args.currency)
+    print(f"Ingest {report['brand']}: staged {report['staged']}, inserted {report['inserted']}, updated {report['updated']}, "
+          f"unchanged {report['unchanged']}, deleted {report['deleted']}, rejected {report['rejected']}; "
+          f"catalog version {report['catalog_version']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import json
+import re
+from typing import Any, List, Optional
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+class JSONArrayStreamParser:
+    """Incremental parser for a JSON array of objects arriving in arbitrary text chunks.
+
+    feed() returns every top-level element whose closing brace has arrived, so callers can act
+    on the first object long before the array (or the LLM response) is complete. Text before
+    the opening '[' (e.g. a ```json fence) is skipped.
+    """
+
+    def __init__(self, lenient: bool = False):
+        self.lenient = lenient  # Skip elements that aren't valid JSON (after dropping trailing commas) instead of raising
+        self.skipped = 0
+        self.started = False  # Saw the opening '['
+        self.finished = False  # Saw the matching ']'
+        self._buffer: List[str] = []  # Characters of the element being read
+        self._depth = 0  # Nesting depth inside the top-level array
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        elements = []
+        for char in chunk:
+            if self.finished:
+                break
+            if not self.started:
+                if char == "[":
+                    self.started = True
+                continue
+            if self._depth == 0:
+                # Between elements: only whitespace, commas, the closing ']' or the start of the next object
+                if char == "]":
+                    self.finished = True
+                elif char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    element = self._decode("".join(self._buffer))
+                    if element is not None:
+                        elements.append(element)
+                    self._buffer = []
+        return elements
+
+    def _decode(self, text: str) -> Optional[Any]:
+        if not self.lenient:
+            return json.loads(text)
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        try:
+            return json.loads(_TRAILING_COMMA.sub(r"\1", text))
+        except json.JSONDecodeError:
+            self.skipped += 1
+            return None
+
+    @property
+    def pending(self) -> bool:
+        # An element was opened but never closed (truncated response)
+        return self._depth > 0
+
+def salvage_json_array(text: str) -> Optional[List[Any]]:
+    """The well-formed objects of the first JSON array in `text`, for LLM output json.loads rejects:
+    prose around the array, trailing commas, a broken element, or a response cut off before ']'.
+    None when there is no array at all."""
+    parser = JSONArrayStreamParser(lenient=True)
+    elements = parser.feed(text)
+    return elements if parser.started else None
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import math
+import os
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .state_management import AgentState, Sneaker, UserPreferences
+from .recommendation_cache import InMemoryCacheBackend
+from .tracing import PROMPT_BLOCKS
+
+logger = logging.getLogger(__name__)
+
+INSTRUCTION_LINES = (
+    "You are an expert AI Sneaker Advisor.",
+    "Your task is to analyze a list of available sneakers and a user\'s preferences to recommend the top 1 to 3 best-fitting sneakers.",
+    "For each recommended sneaker, you MUST provide its exact name, brand, price, URL, image_url (if available), and a concise one-line reason for the recommendation based on the user\'s preferences and the sneaker\'s description.",
+    "The user\'s budget has already been applied to filter the initial list, so focus on matching style, use case, color, and overall suitability based on the descriptions.",
+    "If multiple sneakers are good fits, prioritize those that match more of the user\'s specific preferences (style, color, use case).",
+)
+
+# Identical for every request, so it can be bound to the model once (and cached by the provider with a segment)
+SYSTEM_INSTRUCTION = "\n".join([
+    *INSTRUCTION_LINES,
+    "The sneakers you may recommend are either listed under \"Available Sneakers\", or given as a shortlist of ids from a segment catalog; never recommend anything else.",
+    "Format your response as a JSON array of objects. Each object should represent a recommended sneaker and include the fields: \"name\", \"brand\", \"price\", \"url\", \"image_url\", \"reason\".",
+    "If no sneakers from the list are a good match for the user\'s specific style, color, or use case preferences, return an empty JSON array [].",
+])
+CANDIDATES_HEADING = "\nAvailable Sneakers (ensure your recommendations come ONLY from this list):"
+SEGMENT_HEADING = "\nSegment Catalog (every sneaker has an \"id\"; recommend only the ids shortlisted for the user):"
+CLOSING_LINE = "\nBased on the user preferences and the available sneakers listed above, provide your top 1 to 3 recommendations in the specified JSON format."
+
+class SegmentKey(NamedTuple):
+    # Requests sharing a key see the same catalog block
+    brands: Tuple[str, ...]
+    gender: str
+    price_bucket: Tuple[float, float]
+    catalog_version: int
+
+class PromptParts(NamedTuple):
+    system: str  # SYSTEM_INSTRUCTION
+    catalog: str  # Candidate list or segment catalog, with its heading
+    user: str  # Preferences (and the shortlist in segment mode)
+    segment: SegmentKey
+
+    def inline(self) -> str:
+        # For clients that take one prompt string
+        return "\n".join((self.system, self.catalog, self.user))
+
+class SegmentBlock(NamedTuple):
+    text: str
+    ids: Dict[str, int]  # url -> id in the block
+
+def price_bucket(budget_range: Tuple[float, float], width: float) -> Tuple[float, float]:
+    """The budget widened to `width`-dollar boundaries: (35, 180) -> (0, 200) with width 50."""
+    low = math.floor(budget_range[0] / width) * width
+    high = math.ceil(budget_range[1] / width) * width
+    return low, high if high > low else low + width
+
+def preference_lines(user_preferences: UserPreferences) -> List[str]:
+    return [
+        f"- Gender/Age Group: {user_preferences['gender_age_group']}",
+        f"- Budget Range: ${user_preferences['budget_range'][0]:.2f} - ${user_preferences['budget_range'][1]:.2f}",
+        f"- Preferred Brands: {', '.join(user_preferences['preferred_brands']) if user_preferences['preferred_brands'] else 'Any'}",
+        f"- Desired Style: {user_preferences.get('style', 'Not specified')}",
+        f"- Desired Color: {user_preferences.get('color', 'Not specified')}",
+        f"- Intended Use Case: {user_preferences.get('use_case', 'Not specified')}",
+    ]
+
+def user_block(user_preferences: UserPreferences, extra_lines: Sequence[str] = ()) -> str:
+    return "\n".join(["\nUser Preferences:", *preference_lines(user_preferences), *extra_lines, CLOSING_LINE])
+
+def _urls_digest(sneakers: Sequence[Sneaker]) -> str:
+    return hashlib.md5("\x1f".join(s["url"] for s in sneakers).encode("utf-8")).hexdigest()
+
+def fetch_segment(key: SegmentKey) -> List[Sneaker]:
+    """Every sneaker of the segment's brands, gender and price bucket, read through the brand registry."""
+    from .brand_registry import get_brand_registry  # The registry imports the data sources; only needed on a miss
+    registry = get_brand_registry()
+    low, high = key.price_bucket
+    sneakers: List[Sneaker] = []
+    for brand in key.brands:
+        source = registry.get(brand)
+        if source is not None:
+            sneakers.extend(source.fetch(key.gender, low, high))
+    return sneakers
+
+class PromptAssembler:
+    """Builds the advisor prompt as PromptParts: static system instruction, catalog block, user part.
+
+    Catalog blocks are memoised per SegmentKey (brand set, gender, price bucket, catalog version), so popular
+    segments reuse one serialised string instead of re-encoding the same sneakers for every request:
+    - candidate blocks list the pre-ranked candidates and are keyed by the segment plus their urls;
+    - segment blocks hold the whole segment (up to `segment_limit` sneakers, cheapest first) with ids, so one
+      provider-cached prefix serves every user of the segment and each request only sends its shortlist.
+    """
+
+    def __init__(self, bucket_width: Optional[float] = None, segment_limit: Optional[int] = None, max_blocks: int = 1024,
+                 fetch: Callable[[SegmentKey], Sequence[Sneaker]] = fetch_segment):
+        self.bucket_width = bucket_width if bucket_width is not None else float(os.getenv("SNEAKER_PROMPT_PRICE_BUCKET", "50"))
+        self.segment_limit = segment_limit if segment_limit is not None else int(os.getenv("SNEAKER_PROMPT_SEGMENT_LIMIT", "500"))
+        self.fetch = fetch
+        # The catalog version is part of every key, so the TTL only bounds memory held by cold segments
+        self._blocks = InMemoryCacheBackend(max_entries=max_blocks, ttl_seconds=3600.0)
+
+    def segment_key(self, state: AgentState, catalog_version: int) -> SegmentKey:
+        preferences = state["user_preferences"]
+        brands = state.get("selected_brands") or preferences.get("preferred_brands") or []
+        return SegmentKey(tuple(sorted(set(brands))), preferences["gender_age_group"],
+                          price_bucket(preferences["budget_range"], self.bucket_width), catalog_version)
+
+    def assemble(self, state: AgentState, catalog_version: int, serialise: Callable[[List[Sneaker]], str]) -> PromptParts:
+        """Parts with the pre-ranked candidates as the catalog block."""
+        sneakers = list(state.get("aggregated_sneakers", []))
+        key = self.segment_key(state, catalog_version)
+        block_key = f"candidates|{key!r}|{_urls_digest(sneakers)}"
+        catalog = self._blocks.get(block_key)
+        PROMPT_BLOCKS.inc(kind="candidates", result="miss" if catalog is None else "hit")
+        if catalog is None:
+            catalog = f"{CANDIDATES_HEADING}\n{serialise(sneakers)}"
+            self._blocks.set(block_key, catalog)
+        return PromptParts(SYSTEM_INSTRUCTION, catalog, user_block(state["user_preferences"]), key)
+
+    def assemble_segment(self, state: AgentState, catalog_version: int,
+                         serialise: Callable[[List[Sneaker]], str]) -> Optional[PromptParts]:
+        """Parts with the segment catalog as the block and the candidates as a shortlist of its ids.
+        None when the segment can't be read; candidates outside it are listed inline in the user part."""
+        key = self.segment_key(state, catalog_version)
+        block = self.segment_block(key)
+        if block is None:
+            return None
+        sneakers = list(state.get("aggregated_sneakers", []))
+        shortlist = [block.ids[s["url"]] for s in sneakers if s["url"] in block.ids]
+        extra_lines = [f"\nShortlist (segment catalog ids): {', '.join(map(str, shortlist))}"]
+        missing = [s for s in sneakers if s["url"] not in block.ids]
+        if missing:
+            extra_lines += [CANDIDATES_HEADING, serialise(missing)]
+        return PromptParts(SYSTEM_INSTRUCTION, block.text, user_block(state["user_preferences"], extra_lines), key)
+
+    def segment_block(self, key: SegmentKey) -> Optional[SegmentBlock]:
+        block_key = f"segment|{key!r}"
+        block = self._blocks.get(block_key)
+        PROMPT_BLOCKS.inc(kind="segment", result="miss" if block is None else "hit")
+        if block is not None:
+            return block
+        try:
+            sneakers = sorted(self.fetch(key), key=lambda s: (s["price"], s["url"]))[: self.segment_limit]
+        except Exception as e:
+            logger.warning("PromptAssembler: Could not read segment %s: %s", key, e)
+            return None
+        entries = [
+            {"id": i, "brand": s["brand"], "name": s["name"], "price": s["price"], "description": s["description"],
+             "url": s["url"], "image_url": s.get("image_url") or ""}
+            for i, s in enumerate(sneakers, start=1)
+        ]
+        block = SegmentBlock(f"{SEGMENT_HEADING}\n{json.dumps(entries, separators=(',', ':'), ensure_ascii=False)}",
+                             {entry["url"]: entry["id"] for entry in entries})
+        self._blocks.set(block_key, block)
+        return block
+
+    def clear(self) -> None:
+        self._blocks.clear()
@@ -0,0 +1,108 @@
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from .state_management import AgentState, Sneaker, UserPreferences
+from .sneaker_table import SneakerTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = int(os.getenv("SNEAKER_PRERANK_TOP_K", "15"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+def preference_terms(preferences: UserPreferences) -> List[str]:
+    # Style, color and use case are the free-text preferences the LLM would otherwise match by reading descriptions
+    terms: List[str] = []
+    for field in ("style", "color", "use_case"):
+        terms.extend(tokenize(preferences.get(field)))
+    return terms
+
+class PreRankerAgent:
+    """Scores candidates locally (BM25 over name + description, plus price fit) and keeps the top K.
+
+    Shrinks the Gemini prompt from the whole aggregated list to the few sneakers worth judging.
+    """
+
+    def __init__(self, top_k: Optional[int] = None, k1: float = 1.5, b: float = 0.75, price_weight: float = 0.5,
+                 semantic_weight: float = 2.0):
+        self.top_k = top_k if top_k is not None else DEFAULT_TOP_K
+        self.k1 = k1
+        self.b = b
+        self.price_weight = price_weight
+        self.semantic_weight = semantic_weight  # Only used when an embedding index is loaded
+
+    def score_candidates(self, sneakers: Sequence[Sneaker], preferences: UserPreferences) -> List[float]:
+        query_terms = preference_terms(preferences)
+        names, descriptions, prices = self._columns(sneakers)
+        documents = [Counter(tokenize(f"{name} {description}")) for name, description in zip(names, descriptions)]
+        n_docs = len(documents)
+        avg_length = (sum(sum(doc.values()) for doc in documents) / n_docs) if n_docs else 0.0
+
+        # IDF over the candidate set itself: a term every candidate shares does not discriminate
+        idf: Dict[str, float] = {}
+        for term in set(query_terms):
+            df = sum(1 for doc in documents if term in doc)
+            idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+        min_price, max_price = preferences["budget_range"]
+        mid_price = (min_price + max_price) / 2
+        half_width = max((max_price - min_price) / 2, 1e-9)
+
+        scores = []
+        for price, doc in zip(prices, documents):
+            length = sum(doc.values())
+            score = 0.0
+            for term in query_terms:
+                tf = doc.get(term, 0)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length) if avg_length else self.k1
+                    score += idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            # Price fit in [0, 1]: 1 at the middle of the budget, 0 at its edges (or outside it)
+            price_fit = max(0.0, 1 - abs(price - mid_price) / half_width)
+            scores.append(score + self.price_weight * price_fit)
+
+        # With a learned embedder this catches matches BM25 misses (e.g. "jogging" vs "running")
+        similarities = self._semantic_similarities(sneakers, preferences)
+        if similarities is not None:
+            scores = [score + self.semantic_weight * float(sim) for score, sim in zip(scores, similarities)]
+        return scores
+
+    @staticmethod
+    def _columns(sneakers: Sequence[Sneaker]):
+        # A SneakerTable hands out just the columns scoring reads, without building a dict per row
+        if isinstance(sneakers, SneakerTable):
+            return sneakers.column("name"), sneakers.column("description"), sneakers.prices
+        return [s["name"] for s in sneakers], [s["description"] for s in sneakers], [s["price"] for s in sneakers]
+
+    def _semantic_similarities(self, sneakers: Sequence[Sneaker], preferences: UserPreferences) -> Optional[Any]:
+        try:
+            from .embedding_index import get_embedding_index, preferences_text  # Needs numpy; optional
+        except ImportError:
+            return None
+        index = get_embedding_index()
+        text = preferences_text(preferences)
+        if index is None or not text or self.semantic_weight == 0:
+            return None
+        urls = sneakers.column("url") if isinstance(sneakers, SneakerTable) else [s["url"] for s in sneakers]
+        return index.similarities(text, urls)
+
+    def rank_sneakers(self, state: AgentState) -> Dict[str, Any]:
+        logger.debug("---AGENT: Pre-Ranker---")
+        sneakers: Sequence[Sneaker] = state.get("aggregated_sneakers", [])
+        if not sneakers:
+            return {"candidate_scores": []}
+
+        scores = self.score_candidates(sneakers, state["user_preferences"])
+        # sorted() is stable, so equal scores keep the aggregator's order
+        order = sorted(range(len(sneakers)), key=lambda i: scores[i], reverse=True)[: self.top_k]
+        # The top K leave as plain Sneaker dicts: everything after this node (LLM prompt, fast path) is an edge
+        ranked = sneakers.take(order).to_sneakers() if isinstance(sneakers, SneakerTable) else [sneakers[i] for i in order]
+        logger.info("PreRanker: Kept top %s of %s candidates for the LLM.", len(ranked), len(sneakers))
+        return {"aggregated_sneakers": ranked, "candidate_scores": [scores[i] for i in order]}
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from .state_management import UserPreferences
+from .tracing import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+def _normalise_text(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = " ".join(value.lower().split())
+    return value or None
+
+def make_cache_key(preferences: UserPreferences, catalog_version: int, budget_step: float = 1.0) -> str:
+    """Canonical hash of the preferences plus the catalog version.
+
+    Brand order, letter case, extra whitespace and sub-`budget_step` budget differences
+    all map to the same key, so popular preference combos share one entry.
+    """
+    min_price, max_price = preferences["budget_range"]
+    canonical = {
+        "brands": sorted(set(preferences.get("preferred_brands") or [])),
+        "gender": preferences["gender_age_group"].lower(),
+        "budget": [round(min_price / budget_step) * budget_step, round(max_price / budget_step) * budget_step],
+        "style": _normalise_text(preferences.get("style")),
+        "color": _normalise_text(preferences.get("color")),
+        "use_case": _normalise_text(preferences.get("use_case")),
+        "catalog_version": catalog_version,
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class InMemoryCacheBackend:
+    """Per-process LRU with TTL expiry. Safe to share between worker threads."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class SharedCacheBackend:
+    """Cache shared between processes through a Redis-style client.
+
+    Any client exposing get(key) and set(key, value, ex=seconds) works (e.g. redis.Redis);
+    eviction is left to the server's maxmemory policy, expiry to the per-key TTL.
+    """
+
+    def __init__(self, client: Any, ttl_seconds: float = 600.0, prefix: str = "sneaker-recs:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl_seconds)))
+
+class RecommendationCache:
+    """Workflow result cache with hit/miss counters in front of any backend above."""
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:  # A broken shared cache should cost latency, not the request
+            logger.warning("RecommendationCache: Backend get failed: %s", e)
+            value = None
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache_lookup(value is not None)
+        if value is None:
+            return None
+        # Hand out copies so callers can't mutate the cached entry
+        return {**value, "recommendations": [dict(rec) for rec in value.get("recommendations", [])]}
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        try:
+            self.backend.set(key, result)
+        except Exception as e:
+            logger.warning("RecommendationCache: Backend set failed: %s", e)
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+# --- Process-wide cache used by run_sneaker_workflow ---
+
+_recommendation_cache: Optional[RecommendationCache] = None
+_recommendation_cache_lock = Lock()
+
+def _cache_from_env() -> RecommendationCache:
+    # RECOMMENDATION_CACHE_REDIS_URL selects the shared backend; otherwise an in-process LRU
+    ttl_seconds = float(os.getenv("RECOMMENDATION_CACHE_TTL", "600"))
+    redis_url = os.getenv("RECOMMENDATION_CACHE_REDIS_URL")
+    if redis_url:
+        import redis  # Optional dependency, only needed for the shared backend
+        return RecommendationCache(SharedCacheBackend(redis.Redis.from_url(redis_url), ttl_seconds=ttl_seconds))
+    max_entries = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+    return RecommendationCache(InMemoryCacheBackend(max_entries=max_entries, ttl_seconds=ttl_seconds))
+
+def get_recommendation_cache() -> RecommendationCache:
+    global _recommendation_cache
+    if _recommendation_cache is None:
+        with _recommendation_cache_lock:
+            if _recommendation_cache is None:
+                _recommendation_cache = _cache_from_env()
+    return _recommendation_cache
+
+def set_recommendation_cache(cache: Optional[RecommendationCache]) -> None:
+    """Swaps the process-wide cache (e.g. to plug in another shared backend). None re-reads the env."""
+    global _recommendation_cache
+    with _recommendation_cache_lock:
+        _recommendation_cache = cache
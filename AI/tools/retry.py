@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, NoReturn, Optional
+
+from .tracing import NODE_RETRIES
+
+logger = logging.getLogger(__name__)
+
+class NodeRetryError(Exception):
+    """A node still failing after its retries. Raised out of the graph so a checkpointed run stays resumable
+    at that node; `result` is the node's last (error) result. `out_of_time` is set when the request's deadline,
+    not the attempt limit, ended the retries."""
+
+    def __init__(self, node: str, result: Dict[str, Any], attempts: int, out_of_time: bool = False):
+        super().__init__(result.get("error_message") or f"{node} failed")
+        self.node = node
+        self.result = result
+        self.attempts = attempts
+        self.out_of_time = out_of_time
+
+class Backoff:
+    """Exponential backoff with full jitter: attempt n waits uniform(0, min(max_interval, initial * factor ** n)).
+
+    Full jitter keeps concurrent retries from hitting the provider in lockstep, and its mean wait is half
+    of a fixed schedule's. Defaults come from SNEAKER_LLM_MAX_ATTEMPTS / SNEAKER_LLM_RETRY_INITIAL / SNEAKER_LLM_RETRY_MAX.
+    """
+
+    def __init__(self, max_attempts: Optional[int] = None, initial_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None, factor: float = 2.0, rng: Optional[random.Random] = None):
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv("SNEAKER_LLM_MAX_ATTEMPTS", "3"))
+        self.initial_interval = initial_interval if initial_interval is not None else float(os.getenv("SNEAKER_LLM_RETRY_INITIAL", "0.25"))
+        self.max_interval = max_interval if max_interval is not None else float(os.getenv("SNEAKER_LLM_RETRY_MAX", "4"))
+        self.factor = factor
+        self._rng = rng or random.Random()
+
+    def delay(self, attempt: int) -> float:
+        # attempt: 1 after the first failure, 2 after the second, ...
+        return self._rng.uniform(0, min(self.max_interval, self.initial_interval * self.factor ** (attempt - 1)))
+
+def _out_of_time(deadline: Optional[float], delay: float = 0.0) -> bool:
+    return deadline is not None and time.time() + delay >= deadline
+
+def retry_node(node: str, call: Callable[[], Dict[str, Any]], failed: Callable[[Dict[str, Any]], bool],
+               backoff: Backoff, deadline: Optional[float] = None) -> Dict[str, Any]:
+    """Runs a node body until `failed(result)` is false, at most backoff.max_attempts times,
+    and never starts an attempt after `deadline` (a time.time() value)."""
+    for attempt in range(1, backoff.max_attempts + 1):
+        result = call()
+        if not failed(result):
+            return result
+        if attempt < backoff.max_attempts:
+            delay = backoff.delay(attempt)
+            if _out_of_time(deadline, delay):
+                return _exhausted(node, result, attempt, out_of_time=True)
+            logger.warning("Retry: %s failed (attempt %s/%s), retrying in %.2fs: %s",
+                           node, attempt, backoff.max_attempts, delay, result.get("error_message"))
+            NODE_RETRIES.inc(node=node, outcome="retried")
+            time.sleep(delay)
+    return _exhausted(node, result, attempt, out_of_time=_out_of_time(deadline))
+
+async def aretry_node(node: str, call: Callable[[], Awaitable[Dict[str, Any]]], failed: Callable[[Dict[str, Any]], bool],
+                      backoff: Backoff, deadline: Optional[float] = None) -> Dict[str, Any]:
+    for attempt in range(1, backoff.max_attempts + 1):
+        result = await call()
+        if not failed(result):
+            return result
+        if attempt < backoff.max_attempts:
+            delay = backoff.delay(attempt)
+            if _out_of_time(deadline, delay):
+                return _exhausted(node, result, attempt, out_of_time=True)
+            logger.warning("Retry: %s failed (attempt %s/%s), retrying in %.2fs: %s",
+                           node, attempt, backoff.max_attempts, delay, result.get("error_message"))
+            NODE_RETRIES.inc(node=node, outcome="retried")
+            await asyncio.sleep(delay)
+    return _exhausted(node, result, attempt, out_of_time=_out_of_time(deadline))
+
+def _exhausted(node: str, result: Dict[str, Any], attempts: int, out_of_time: bool) -> NoReturn:
+    NODE_RETRIES.inc(node=node, outcome="deadline" if out_of_time else "exhausted")
+    raise NodeRetryError(node, result, attempts, out_of_time)
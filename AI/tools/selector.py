@@ -1,19 +1,23 @@
+import logging
 from typing import Dict, Any, List
 from .state_management import AgentState, UserPreferences
+from .brand_registry import get_brand_registry
+
+logger = logging.getLogger(__name__)
 
 class BrandSelectorAgent:
     def select_brands(self, state: AgentState) -> Dict[str, Any]:
-        print("---AGENT: Brand Selector---")
+        logger.debug("---AGENT: Brand Selector---")
         user_preferences: UserPreferences = state["user_preferences"]
         preferred_brands = user_preferences.get("preferred_brands", [])
         
         # All known/supported brands by the system
-        all_known_brands = ["Nike", "Adidas", "Puma"]
+        all_known_brands = get_brand_registry().names()
         
         selected_brands: List[str] = []
 
         if not preferred_brands: # If user provided no specific brands
-            print("BrandSelectorAgent: No specific brands preferred by user. Selecting all known brands.")
+            logger.info("BrandSelectorAgent: No specific brands preferred by user. Selecting all known brands.")
             selected_brands = all_known_brands
         else:
             # Filter preferred brands to only those known by the system
@@ -21,17 +25,17 @@ class BrandSelectorAgent:
                 if brand in all_known_brands:
                     selected_brands.append(brand)
                 else:
-                    print(f"BrandSelectorAgent: User preferred brand '{brand}' is not currently supported.")
+                    logger.warning("BrandSelectorAgent: User preferred brand '%s' is not currently supported.", brand)
             
             if not selected_brands:
-                print("BrandSelectorAgent: None of the user-preferred brands are supported. Defaulting to all known brands to provide some options.")
+                logger.warning("BrandSelectorAgent: None of the user-preferred brands are supported. Defaulting to all known brands to provide some options.")
                 # Fallback: if user specified brands but none are supported, maybe offer all?
                 # Or, this could be an error state / lead to no brands selected.
                 # For a better UX, let's default to all known brands if their specific choices yield nothing.
                 # This could be refined based on desired product behavior.
                 selected_brands = all_known_brands 
 
-        print(f"BrandSelectorAgent: Selected brands for processing: {selected_brands}")
+        logger.info("BrandSelectorAgent: Selected brands for processing: %s", selected_brands)
         # Ensure brand_data is initialized for the merge strategy in AgentState
         # This is important because if this node is the first to try to write to brand_data (even if empty),
         # the key needs to exist for the Annotated merge function to work correctly if it's based on dict.update or similar.
@@ -0,0 +1,242 @@
+import os
+from array import array
+from bisect import bisect_right
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from .state_management import Sneaker
+
+TEXT_FIELDS = ("name", "url", "description", "image_url")
+
+def columnar_state_enabled() -> bool:
+    # SNEAKER_COLUMNAR_STATE=1 makes the collectors put SneakerTables into brand_data instead of dict lists
+    return os.getenv("SNEAKER_COLUMNAR_STATE", "0") == "1"
+
+class Interner:
+    """Process-wide string <-> small int codes, so brand/gender columns are one 16-bit code per row."""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.values: List[str] = []
+        self._lock = Lock()
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = self._codes[value] = len(self.values)
+                    self.values.append(value)
+        return code
+
+    def value(self, code: int) -> str:
+        return self.values[code]
+
+BRAND_CODES = Interner()
+GENDER_CODES = Interner()
+
+# --- Text stores: text columns stay where they already are and are only read when needed ---
+
+class RowTextStore:
+    """Texts read from existing Sneaker dicts (e.g. the catalog index); row id = position in `rows`."""
+
+    def __init__(self, rows: Sequence[Sneaker]):
+        self.rows = rows
+
+    def text(self, row_id: int, field: str) -> Optional[str]:
+        return self.rows[row_id].get(field)
+
+    def texts(self, row_ids: Iterable[int], field: str) -> List[Optional[str]]:
+        rows = self.rows
+        return [rows[row_id].get(field) for row_id in row_ids]
+
+class ColumnTextStore:
+    """Texts held as one list per field, e.g. straight from SQL rows without building a dict per row."""
+
+    def __init__(self, columns: Dict[str, List[Optional[str]]]):
+        self.columns = columns
+
+    def text(self, row_id: int, field: str) -> Optional[str]:
+        return self.columns[field][row_id]
+
+    def texts(self, row_ids: Iterable[int], field: str) -> List[Optional[str]]:
+        column = self.columns[field]
+        return [column[row_id] for row_id in row_ids]
+
+class ChainedTextStore:
+    """Several stores behind one id space: ids of store k are shifted by the row count of stores before it."""
+
+    def __init__(self, stores: List[Any], offsets: List[int]):
+        self.stores = stores
+        self.offsets = offsets  # Starting id of each store, ascending
+
+    def text(self, row_id: int, field: str) -> Optional[str]:
+        k = bisect_right(self.offsets, row_id) - 1
+        return self.stores[k].text(row_id - self.offsets[k], field)
+
+    def texts(self, row_ids: Iterable[int], field: str) -> List[Optional[str]]:
+        # Ids mostly come in per-store runs (concat output), so bisect only when a run ends
+        result: List[Optional[str]] = []
+        lo = hi = 0
+        store = None
+        for row_id in row_ids:
+            if not lo <= row_id < hi:
+                k = bisect_right(self.offsets, row_id) - 1
+                store, lo = self.stores[k], self.offsets[k]
+                hi = self.offsets[k + 1] if k + 1 < len(self.offsets) else float("inf")
+            result.append(store.text(row_id - lo, field))
+        return result
+
+Column = Union[array, memoryview]
+
+class SneakerTable:
+    """Columnar, read-only stand-in for a List[Sneaker] in AgentState.
+
+    Numeric columns (row ids, interned brand/gender codes, float prices) are arrays; name, url,
+    description and image_url stay in a shared text store and are resolved per row on access.
+    Slicing returns a view over the same buffers (no copy); take() gathers rows by position.
+    Indexing/iterating yields Sneaker dicts, so code at the edges can keep treating it as a list.
+    """
+
+    __slots__ = ("ids", "brand_codes", "gender_codes", "prices", "store")
+
+    def __init__(self, ids: Column, brand_codes: Column, gender_codes: Column, prices: Column, store: Any):
+        self.ids = ids
+        self.brand_codes = brand_codes
+        self.gender_codes = gender_codes
+        self.prices = prices
+        self.store = store
+
+    @classmethod
+    def from_sneakers(cls, sneakers: Sequence[Sneaker]) -> "SneakerTable":
+        return cls(
+            array("q", range(len(sneakers))),
+            array("H", (BRAND_CODES.code(s["brand"]) for s in sneakers)),
+            array("H", (GENDER_CODES.code(s["gender"]) for s in sneakers)),
+            array("d", (float(s["price"]) for s in sneakers)),
+            RowTextStore(sneakers),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]]) -> "SneakerTable":
+        """Builds from SQL rows in data_source.SNEAKER_COLUMNS order without creating Sneaker dicts."""
+        brand_codes, gender_codes, prices = array("H"), array("H"), array("d")
+        columns: Dict[str, List[Optional[str]]] = {field: [] for field in TEXT_FIELDS}
+        for brand, name, price, url, gender, description, image_url in rows:
+            brand_codes.append(BRAND_CODES.code(brand))
+            gender_codes.append(GENDER_CODES.code(gender))
+            prices.append(float(price))  # psycopg2 returns DECIMAL columns as Decimal
+            columns["name"].append(name)
+            columns["url"].append(url)
+            columns["description"].append(description)
+            columns["image_url"].append(image_url or None)
+        return cls(array("q", range(len(prices))), brand_codes, gender_codes, prices, ColumnTextStore(columns))
+
+    @classmethod
+    def coerce(cls, sneakers: Union["SneakerTable", Sequence[Sneaker]]) -> "SneakerTable":
+        return sneakers if isinstance(sneakers, SneakerTable) else cls.from_sneakers(list(sneakers))
+
+    @classmethod
+    def concat(cls, tables: List["SneakerTable"]) -> "SneakerTable":
+        # Numeric columns are copied (a few bytes per row); texts stay in the original stores
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.from_sneakers([])
+        if len(tables) == 1:
+            return tables[0]
+        ids, brand_codes, gender_codes, prices = array("q"), array("H"), array("H"), array("d")
+        stores, offsets = [], []
+        next_offset = 0
+        for table in tables:
+            stores.append(table.store)
+            offsets.append(next_offset)
+            ids.extend(row_id + next_offset for row_id in table.ids)
+            brand_codes.extend(table.brand_codes)
+            gender_codes.extend(table.gender_codes)
+            prices.extend(table.prices)
+            next_offset += max(table.ids, default=-1) + 1
+        return cls(ids, brand_codes, gender_codes, prices, ChainedTextStore(stores, offsets))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __repr__(self) -> str:
+        # Also what tracing serialises in place of the rows
+        return f"SneakerTable({len(self)} rows)"
+
+    def __getitem__(self, item: Union[int, slice]) -> Any:
+        if isinstance(item, slice):
+            # memoryview slices share the parent's buffers: a view, not a copy
+            return SneakerTable(memoryview(self.ids)[item], memoryview(self.brand_codes)[item],
+                                memoryview(self.gender_codes)[item], memoryview(self.prices)[item], self.store)
+        return self.row(item)
+
+    def __iter__(self) -> Iterator[Sneaker]:
+        for position in range(len(self)):
+            yield self.row(position)
+
+    def brand(self, position: int) -> str:
+        return BRAND_CODES.value(self.brand_codes[position])
+
+    def gender(self, position: int) -> str:
+        return GENDER_CODES.value(self.gender_codes[position])
+
+    def text(self, position: int, field: str) -> Optional[str]:
+        return self.store.text(self.ids[position], field)
+
+    def column(self, field: str) -> Sequence[Any]:
+        """One field for every row: prices as the float column itself, other fields resolved into a list."""
+        if field == "price":
+            return self.prices
+        if field == "brand":
+            return [BRAND_CODES.value(code) for code in self.brand_codes]
+        if field == "gender":
+            return [GENDER_CODES.value(code) for code in self.gender_codes]
+        return self.store.texts(self.ids, field)
+
+    def row(self, position: int) -> Sneaker:
+        if position < 0:
+            position += len(self)
+        row_id = self.ids[position]
+        return Sneaker(
+            brand=self.brand(position),
+            name=self.store.text(row_id, "name"),
+            price=self.prices[position],
+            url=self.store.text(row_id, "url"),
+            gender=self.gender(position),
+            description=self.store.text(row_id, "description"),
+            image_url=self.store.text(row_id, "image_url"),
+        )
+
+    def take(self, positions: Iterable[int]) -> "SneakerTable":
+        positions = list(positions)
+        return SneakerTable(
+            array("q", (self.ids[i] for i in positions)),
+            array("H", (self.brand_codes[i] for i in positions)),
+            array("H", (self.gender_codes[i] for i in positions)),
+            array("d", (self.prices[i] for i in positions)),
+            self.store,
+        )
+
+    def to_sneakers(self) -> List[Sneaker]:
+        return [self.row(position) for position in range(len(self))]
+
+    def __reduce__(self):
+        # Pickled by the checkpointers' msgpack fallback (tools.checkpointing): only this table's rows, plus the code
+        # vocabularies (interning is per process)
+        return (_table_from_columns, (list(BRAND_CODES.values), array("H", self.brand_codes), list(GENDER_CODES.values),
+                                      array("H", self.gender_codes), array("d", self.prices),
+                                      {field: self.column(field) for field in TEXT_FIELDS}))
+
+def _table_from_columns(brand_vocab: List[str], brand_codes: array, gender_vocab: List[str], gender_codes: array,
+                        prices: array, columns: Dict[str, List[Optional[str]]]) -> SneakerTable:
+    brand_map = [BRAND_CODES.code(brand) for brand in brand_vocab]
+    gender_map = [GENDER_CODES.code(gender) for gender in gender_vocab]
+    return SneakerTable(
+        array("q", range(len(prices))),
+        array("H", (brand_map[code] for code in brand_codes)),
+        array("H", (gender_map[code] for code in gender_codes)),
+        prices,
+        ColumnTextStore(columns),
+    )
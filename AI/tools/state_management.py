@@ -1,4 +1,5 @@
-from typing import List, Dict, TypedDict, Literal, Tuple, Optional, Annotated, Any
+import operator
+from typing import List, Dict, TypedDict, Literal, Tuple, Optional, Annotated, Any, Sequence
 
 # Custom merge function for brand_data dictionaries
 def merge_brand_data_dicts(d1: Dict[str, List[Any]], d2: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
@@ -13,13 +14,19 @@ def merge_brand_data_dicts(d1: Dict[str, List[Any]], d2: Dict[str, List[Any]]) -
             # If it could, decide on merging logic (e.g., extend list, overwrite, error)
             # For now, let's assume keys are unique per brand agent call.
             # If a brand agent could be called multiple times with updates, this would need adjustment.
-            merged[key].extend(value_list) # Example: if keys could collide and values are lists
+            merged[key] = _concat_brand_rows(merged[key], value_list) # New list/table: d1's value must not be mutated
         else:
             merged[key] = value_list
     return merged
 
+def _concat_brand_rows(rows: Any, more_rows: Any) -> Any:
+    if isinstance(rows, list) and isinstance(more_rows, list):
+        return rows + more_rows
+    from .sneaker_table import SneakerTable  # Columnar brand_data is optional (SNEAKER_COLUMNAR_STATE)
+    return SneakerTable.concat([SneakerTable.coerce(rows), SneakerTable.coerce(more_rows)])
+
 class UserPreferences(TypedDict):
-    preferred_brands: List[Literal["Nike", "Adidas", "Puma"]]
+    preferred_brands: List[str]  # Names from the brand registry (tools.brand_registry)
     gender_age_group: Literal["male", "female", "kid"]
     budget_range: Tuple[float, float]
     style: Optional[str]  # e.g., "sporty", "casual", "formal"
@@ -43,13 +50,37 @@ class Recommendation(TypedDict):
     reason: str
     image_url: Optional[str]
 
+class SneakerIndex(TypedDict):
+    # Built once by the aggregator; keys come from aggregator.sneaker_key / the sneaker's url
+    by_name: Dict[str, Sneaker]
+    by_url: Dict[str, Sneaker]
+
+class BrandTask(TypedDict):
+    # What the brand selector sends to each fanned-out collector task
+    user_preferences: UserPreferences
+    brand: str
+    deadline: Optional[float]  # The request's deadline (AgentState.deadline)
+
 class AgentState(TypedDict):
     user_preferences: UserPreferences
-    selected_brands: List[Literal["Nike", "Adidas", "Puma"]]
-    # Data from each brand agent will be collected here using our custom merge function
-    brand_data: Annotated[Dict[str, List[Sneaker]], merge_brand_data_dicts]
-    aggregated_sneakers: List[Sneaker]
+    selected_brands: List[str]
+    # Data from each brand agent will be collected here using our custom merge function.
+    # Values are List[Sneaker], or sneaker_table.SneakerTable when SNEAKER_COLUMNAR_STATE=1; both are Sequence[Sneaker]
+    brand_data: Annotated[Dict[str, Sequence[Sneaker]], merge_brand_data_dicts]
+    # A SneakerTable between aggregator and pre-ranker in columnar mode; the pre-ranker's top K is always dicts
+    aggregated_sneakers: Sequence[Sneaker]
+    # Lookup of every aggregated sneaker by (brand, name) and by url, for joining LLM picks back to the catalog
+    sneaker_index: SneakerIndex
+    # Pre-ranker scores, aligned with aggregated_sneakers once the pre_ranker node has run
+    candidate_scores: List[float]
     final_recommendations: List[Recommendation]
     error_message: Optional[str]
+    # Brands whose source timed out or failed; collected from the parallel collector tasks by list concatenation
+    incomplete_brands: Annotated[List[str], operator.add]
     # For Gemini API key
     gemini_api_key: str
+    # Set by the stream variants: the LLM node then emits each recommendation as a custom stream event
+    stream_recommendations: bool
+    # time.time() by which the answer is due (None: no budget). Collectors cap their timeouts by it, the LLM
+    # node bounds and hedges its calls by it, and a request out of time gets a fallback answer instead of waiting
+    deadline: Optional[float]
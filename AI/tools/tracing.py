@@ -0,0 +1,231 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+trace_logger = logging.getLogger("sneaker.trace")
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Verbosity switch for the whole workflow (SNEAKER_LOG_LEVEL, default WARNING).
+
+    Agents log through `logging` with lazy %-style arguments, so below the configured
+    level messages (including the full LLM prompt at DEBUG) are never formatted.
+    Node spans go to the "sneaker.trace" logger at INFO as one JSON object per line.
+    """
+    level = (level or os.getenv("SNEAKER_LOG_LEVEL", "WARNING")).upper()
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger().setLevel(level)
+
+# --- Prometheus-style metrics ---
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+def _render_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_render_labels(key)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self._series: Dict[LabelKey, List[float]] = {}  # per label set: bucket counts..., +Inf count, sum
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_render_labels(key, [('le', f'{bound:g}')])} {cumulative:g}")
+                cumulative += series[len(self.buckets)]
+                lines.append(f"{self.name}_bucket{_render_labels(key, [('le', '+Inf')])} {cumulative:g}")
+                lines.append(f"{self.name}_sum{_render_labels(key)} {series[-1]:g}")
+                lines.append(f"{self.name}_count{_render_labels(key)} {cumulative:g}")
+        return lines
+
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+_COUNT_BUCKETS = (0, 1, 3, 10, 30, 100, 300, 1000, 3000, 10000)
+_TOKEN_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000)
+
+NODE_DURATION = Histogram("sneaker_node_duration_seconds", "Wall time per workflow node.", _LATENCY_BUCKETS)
+NODE_DELTA_BYTES = Histogram("sneaker_node_state_delta_bytes", "Serialised size of the state update a node returns (SNEAKER_TRACE_PAYLOAD=1).", _BYTES_BUCKETS)
+NODE_SNEAKERS_IN = Histogram("sneaker_node_sneakers_in", "Sneakers in the state a node receives.", _COUNT_BUCKETS)
+NODE_SNEAKERS_OUT = Histogram("sneaker_node_sneakers_out", "Sneakers in the state update a node returns.", _COUNT_BUCKETS)
+LLM_PROMPT_BYTES = Histogram("sneaker_llm_prompt_bytes", "Size of prompts sent to Gemini.", _BYTES_BUCKETS)
+LLM_TOKENS = Histogram("sneaker_llm_tokens", "Gemini token usage per call, by kind.", _TOKEN_BUCKETS)
+CACHE_LOOKUPS = Counter("sneaker_recommendation_cache_lookups_total", "Recommendation cache lookups by result.")
+NODE_ERRORS = Counter("sneaker_node_errors_total", "Node invocations that raised.")
+NODE_RETRIES = Counter("sneaker_node_retries_total", "Node-level retries by node and outcome (retried, exhausted, deadline).")
+WORKFLOW_RESUMES = Counter("sneaker_workflow_resumes_total", "Requests resumed from a checkpoint, by the node they resumed at.")
+BRAND_FETCH_DURATION = Histogram("sneaker_brand_fetch_duration_seconds", "Wall time per brand source fetch, by brand.", _LATENCY_BUCKETS)
+BRAND_FETCHES = Counter("sneaker_brand_fetches_total", "Brand source fetches by brand and outcome (ok, timeout, error, unknown).")
+PROMPT_BLOCKS = Counter("sneaker_prompt_blocks_total", "Prompt catalog block lookups by kind (candidates, segment) and result (hit, miss).")
+CONTEXT_CACHE_EVENTS = Counter("sneaker_llm_context_cache_total", "Provider context cache lookups by result (hit, created, skipped, error).")
+# Hedge rate: outcome="sent" over sneaker_llm_prompt_bytes_count; fallback rate: over the llm path count
+LLM_HEDGES = Counter("sneaker_llm_hedges_total", "Hedged Gemini requests by outcome (sent, won).")
+LLM_FALLBACKS = Counter("sneaker_llm_fallbacks_total", "Requests answered without the primary model, by fallback (model, local) and cause (deadline: out of time; error: still failing after retries).")
+CATALOG_SWAPS = Counter("sneaker_catalog_snapshot_swaps_total", "In-process catalog snapshots swapped in, by kind (full, delta).")
+CATALOG_ROWS = Counter("sneaker_catalog_snapshot_rows_total", "Catalog rows and tombstones read into the in-process snapshot, by kind (full, delta).")
+
+METRICS: List[Any] = [NODE_DURATION, NODE_DELTA_BYTES, NODE_SNEAKERS_IN, NODE_SNEAKERS_OUT,
+                      LLM_PROMPT_BYTES, LLM_TOKENS, CACHE_LOOKUPS, NODE_ERRORS, NODE_RETRIES, WORKFLOW_RESUMES, BRAND_FETCH_DURATION, BRAND_FETCHES,
+                      PROMPT_BLOCKS, CONTEXT_CACHE_EVENTS, LLM_HEDGES, LLM_FALLBACKS, CATALOG_SWAPS, CATALOG_ROWS]
+
+def metrics_text() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    from .fast_path import path_metrics  # Path counters live with the fast-path policy
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(["# HELP sneaker_workflow_path_total Requests by recommendation path.", "# TYPE sneaker_workflow_path_total counter"])
+    for path, count in sorted(path_metrics.snapshot()["counts"].items()):
+        if ":" not in path:
+            lines.append(f'sneaker_workflow_path_total{{path="{path}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+# --- Node spans ---
+
+# Set while a node runs so code deep inside it (GeneralAgent) can attach LLM stats to the node's span
+_current_span: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("sneaker_current_span", default=None)
+
+# SNEAKER_TRACE_PAYLOAD=1 also records each node's serialised delta size (delta_bytes); off by default because
+# it json.dumps every state update on the request path
+MEASURE_PAYLOAD = os.getenv("SNEAKER_TRACE_PAYLOAD", "0") == "1"
+
+def _sneaker_count(values: Any) -> int:
+    if not isinstance(values, dict):
+        return 0
+    for key in ("final_recommendations", "aggregated_sneakers"):
+        if values.get(key):
+            return len(values[key])
+    brand_data = values.get("brand_data") or {}
+    return sum(len(sneakers or []) for sneakers in brand_data.values())
+
+def _payload_bytes(delta: Any) -> int:
+    return len(json.dumps(delta, default=str, separators=(",", ":")).encode("utf-8"))
+
+def record_llm_call(prompt: Union[str, Sequence[str]], response: Any = None) -> None:
+    """Attaches prompt size (what was sent: a cached prefix isn't counted) and Gemini token usage to the current node span and metrics."""
+    prompt_bytes = sum(len(part.encode("utf-8")) for part in ([prompt] if isinstance(prompt, str) else prompt))
+    LLM_PROMPT_BYTES.observe(prompt_bytes)
+    span = _current_span.get()
+    if span is not None:
+        span["prompt_bytes"] = span.get("prompt_bytes", 0) + prompt_bytes
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attribute in (("prompt", "prompt_token_count"), ("output", "candidates_token_count"), ("total", "total_token_count"),
+                            ("cached", "cached_content_token_count")):
+        count = getattr(usage, attribute, None)
+        if count is None:
+            continue
+        LLM_TOKENS.observe(count, kind=kind)
+        if span is not None:
+            span[f"{kind}_tokens"] = span.get(f"{kind}_tokens", 0) + count
+
+def record_cache_lookup(hit: bool) -> None:
+    CACHE_LOOKUPS.inc(result="hit" if hit else "miss")
+
+def _start_span(name: str, state: Any) -> Tuple[Dict[str, Any], contextvars.Token]:
+    span = {"event": "node", "node": name, "sneakers_in": _sneaker_count(state)}
+    return span, _current_span.set(span)
+
+def _finish_span(span: Dict[str, Any], token: contextvars.Token, started: float, delta: Any, error: Optional[BaseException]) -> None:
+    _current_span.reset(token)
+    duration = time.perf_counter() - started
+    name = span["node"]
+    span["duration_ms"] = round(duration * 1000, 3)
+    NODE_DURATION.observe(duration, node=name)
+    NODE_SNEAKERS_IN.observe(span["sneakers_in"], node=name)
+    if error is not None:
+        span["error"] = repr(error)
+        NODE_ERRORS.inc(node=name)
+    else:
+        span["sneakers_out"] = _sneaker_count(delta)
+        NODE_SNEAKERS_OUT.observe(span["sneakers_out"], node=name)
+        if MEASURE_PAYLOAD:
+            span["delta_bytes"] = _payload_bytes(delta)
+            NODE_DELTA_BYTES.observe(span["delta_bytes"], node=name)
+    if trace_logger.isEnabledFor(logging.INFO):
+        trace_logger.info(json.dumps(span, separators=(",", ":")))
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    """Wraps a LangGraph node (sync or async) to record a span and metrics per invocation."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            span, token = _start_span(name, state)
+            started = time.perf_counter()
+            delta, error = None, None
+            try:
+                delta = await fn(state, *args, **kwargs)
+                return delta
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _finish_span(span, token, started, delta, error)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        span, token = _start_span(name, state)
+        started = time.perf_counter()
+        delta, error = None, None
+        try:
+            delta = fn(state, *args, **kwargs)
+            return delta
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _finish_span(span, token, started, delta, error)
+    return wrapper
@@ -1,76 +1,213 @@
-from langgraph.graph import StateGraph, END
-from typing import List, Dict, Literal, Any, Optional
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+from threading import Lock
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, List, Dict, Literal, Any, Optional, Set, Tuple
 
-from tools.state_management import AgentState, UserPreferences, Recommendation, Sneaker
+from tools.state_management import AgentState, BrandTask, UserPreferences, Recommendation, Sneaker
 from tools.selector import BrandSelectorAgent
-from tools.nike import NikeDataCollectorAgent
-from tools.addidas import AdidasDataCollectorAgent # Corrected filename if it was addidas.py
-from tools.puma import PumaDataCollectorAgent
+from tools.collector import BrandCollectorAgent
 from tools.aggregator import AggregatorAgent
-from tools.general_agent import GeneralAgent
+from tools.ranker import PreRankerAgent
+from tools.fast_path import FastPathPolicy, RuleBasedRecommenderAgent, path_metrics, FAST_PATH, LLM_PATH, DEADLINE
+from tools.general_agent import GeneralAgent, is_llm_failure
+from tools.data_source import get_catalog_version
+from tools.recommendation_cache import make_cache_key, get_recommendation_cache
+from tools.tracing import traced_node, WORKFLOW_RESUMES, LLM_FALLBACKS
+from tools.hedging import time_left
+from tools.retry import Backoff, NodeRetryError, retry_node, aretry_node
+from tools.checkpointing import RequestInProgressError, RunRegistry, create_run_registry, get_checkpointer
+from tools.agent_registry import get_agent
+from tools.batch import (
+    collect_candidates_shared, pack_requests, run_batches,
+    DEFAULT_MAX_PROMPT_CHARS, DEFAULT_MAX_REQUESTS_PER_CALL, DEFAULT_MAX_CONCURRENCY,
+)
+
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
+
+logger = logging.getLogger(__name__)
+
+# Same value as langgraph.graph.END; kept local so importing this module doesn't pull in langgraph/langchain_core
+END = "__end__"
 
 # --- Define Nodes: Each node will call an agent method and update the state --- 
+# Agents are stateless, so each node reuses one process-wide instance from the registry
 
 def brand_selector_node(state: AgentState) -> Dict[str, Any]:
-    agent = BrandSelectorAgent()
+    agent = get_agent(BrandSelectorAgent)
     result = agent.select_brands(state)
     # Ensure brand_data is initialized if not already, for parallel branches
     if "brand_data" not in result:
         result["brand_data"] = {}
     return result
 
-def nike_data_collector_node(state: AgentState) -> Dict[str, Any]:
-    agent = NikeDataCollectorAgent()
-    return agent.collect_data(state) # Expected to return {"brand_data": {"Nike": [...]}}
-
-def adidas_data_collector_node(state: AgentState) -> Dict[str, Any]:
-    agent = AdidasDataCollectorAgent()
-    return agent.collect_data(state) # Expected to return {"brand_data": {"Adidas": [...]}}
-
-def puma_data_collector_node(state: AgentState) -> Dict[str, Any]:
-    agent = PumaDataCollectorAgent()
-    return agent.collect_data(state) # Expected to return {"brand_data": {"Puma": [...]}}
+def brand_collector_node(task: BrandTask) -> Dict[str, Any]:
+    # One invocation per selected brand, each with its own BrandTask (see route_from_brand_selector)
+    agent = get_agent(BrandCollectorAgent)
+    return agent.collect_brand(task) # Expected to return {"brand_data": {brand: [...]}}
 
 def aggregator_node(state: AgentState) -> Dict[str, Any]:
-    agent = AggregatorAgent()
+    agent = get_agent(AggregatorAgent)
     return agent.aggregate_sneakers(state)
 
+def pre_ranker_node(state: AgentState) -> Dict[str, Any]:
+    agent = get_agent(PreRankerAgent)
+    return agent.rank_sneakers(state)
+
+def fast_path_node(state: AgentState) -> Dict[str, Any]:
+    agent = get_agent(RuleBasedRecommenderAgent)
+    return agent.recommend(state, reason=FastPathPolicy().choose(state))
+
 def general_agent_node(state: AgentState) -> Dict[str, Any]:
-    # The API key is passed in the initial state when the graph is invoked
-    api_key = state.get("gemini_api_key")
+    api_key = _gemini_api_key(state)
     if not api_key:
         return {"error_message": "Gemini API key not found in state."}
-    agent = GeneralAgent(api_key=api_key)
-    return agent.get_recommendations(state)
+    agent = get_agent(GeneralAgent, api_key)
+    llm_state = _primary_budget(state)
+    # Failed or unparseable calls are retried here, so a transient LLM error doesn't rerun the whole graph
+    try:
+        if state.get("stream_recommendations"):
+            writer = _recommendation_writer()
+            return retry_node("general_agent_llm", lambda: agent.stream_recommendations(llm_state, writer), writer.retryable,
+                              Backoff(), llm_state.get("deadline"))
+        return retry_node("general_agent_llm", lambda: agent.get_recommendations(llm_state), is_llm_failure,
+                          Backoff(), llm_state.get("deadline"))
+    except NodeRetryError as e:
+        if not e.out_of_time:
+            raise
+        return _fallback_answer(state, api_key)
 
 def error_handler_node(state: AgentState) -> Dict[str, Any]:
-    print(f"---WORKFLOW ERROR HANDLER---")
+    logger.debug("---WORKFLOW ERROR HANDLER---")
     error = state.get("error_message", "An unspecified error occurred.")
-    print(f"Error in workflow: {error}")
+    logger.warning("Error in workflow: %s", error)
     # Potentially clear recommendations if an error occurs upstream
     return {"final_recommendations": [], "error_message": error}
 
+# --- Async node variants (used by the graph behind arun_sneaker_workflow) ---
+# Selector, aggregator and error handler are pure CPU and fast, so the async graph reuses them as-is.
+
+async def abrand_collector_node(task: BrandTask) -> Dict[str, Any]:
+    agent = get_agent(BrandCollectorAgent)
+    return await agent.acollect_brand(task)
+
+async def ageneral_agent_node(state: AgentState) -> Dict[str, Any]:
+    api_key = _gemini_api_key(state)
+    if not api_key:
+        return {"error_message": "Gemini API key not found in state."}
+    agent = get_agent(GeneralAgent, api_key)
+    llm_state = _primary_budget(state)
+    try:
+        if state.get("stream_recommendations"):
+            writer = _recommendation_writer()
+            return await aretry_node("general_agent_llm", lambda: agent.astream_recommendations(llm_state, writer), writer.retryable,
+                                     Backoff(), llm_state.get("deadline"))
+        return await aretry_node("general_agent_llm", lambda: agent.aget_recommendations(llm_state), is_llm_failure,
+                                 Backoff(), llm_state.get("deadline"))
+    except NodeRetryError as e:
+        if not e.out_of_time:
+            raise
+        return await _afallback_answer(state, api_key)
+
+# --- Deadline fallback ---
+# SNEAKER_FALLBACK_MODEL names a cheaper Gemini model that answers when the primary one hasn't by the deadline;
+# it gets the last SNEAKER_FALLBACK_MODEL_SECONDS of the budget. Without one, or if it fails too, the answer
+# is the top pre-ranked candidates with templated reasons (the fast path's recommender).
+
+def _fallback_model() -> str:
+    return os.getenv("SNEAKER_FALLBACK_MODEL", "")
+
+def _primary_budget(state: AgentState) -> AgentState:
+    # The primary model's share of the deadline: all of it, less the fallback model's reserve
+    deadline = state.get("deadline")
+    if deadline is None or not _fallback_model():
+        return state
+    return {**state, "deadline": deadline - float(os.getenv("SNEAKER_FALLBACK_MODEL_SECONDS", "1.5"))}
+
+def _fallback_agent(api_key: str) -> Optional[GeneralAgent]:
+    if not _fallback_model():
+        return None
+    try:
+        return get_agent(GeneralAgent, api_key, _fallback_model())
+    except Exception as e:
+        logger.warning("Fallback model %s unavailable: %s", _fallback_model(), e)
+        return None
+
+def _fallback_answer(state: AgentState, api_key: str) -> Dict[str, Any]:
+    agent = _fallback_agent(api_key)
+    if agent is not None and (time_left(state.get("deadline")) or 0) > 0:
+        result = agent.get_recommendations(state)
+        if not is_llm_failure(result):
+            LLM_FALLBACKS.inc(fallback="model", cause="deadline")
+            return result
+    return _local_answer(state)
+
+async def _afallback_answer(state: AgentState, api_key: str) -> Dict[str, Any]:
+    agent = _fallback_agent(api_key)
+    if agent is not None and (time_left(state.get("deadline")) or 0) > 0:
+        result = await agent.aget_recommendations(state)
+        if not is_llm_failure(result):
+            LLM_FALLBACKS.inc(fallback="model", cause="deadline")
+            return result
+    return _local_answer(state)
+
+def _local_answer(state: AgentState, cause: str = "deadline") -> Dict[str, Any]:
+    # cause: "deadline" (no answer in time) or "error" (the LLM still failing after its retries; batch runs)
+    LLM_FALLBACKS.inc(fallback="local", cause=cause)
+    logger.warning("No LLM answer (%s); recommending the top pre-ranked candidates.", cause)
+    return get_agent(RuleBasedRecommenderAgent).recommend(state, reason=DEADLINE)
+
+def _gemini_api_key(state: AgentState) -> Optional[str]:
+    # Passed in the initial state, or held in-process by thread id when checkpointing (so the key is never persisted)
+    api_key = state.get("gemini_api_key")
+    if api_key:
+        return api_key
+    from langgraph.config import get_config
+    try:
+        thread_id = get_config().get("configurable", {}).get("thread_id")
+    except RuntimeError:  # Called outside a graph run
+        return None
+    return _run_api_keys.get(thread_id)
+
+class _RecommendationWriter:
+    # Each pick becomes a "custom" stream event, read by stream_sneaker_workflow / astream_sneaker_workflow
+
+    def __init__(self, writer: Any):
+        self._writer = writer
+        self.written = 0
+
+    def __call__(self, recommendation: Recommendation) -> None:
+        self.written += 1
+        self._writer({"recommendation": recommendation})
+
+    def retryable(self, result: Dict[str, Any]) -> bool:
+        # Once picks have reached the client a retry would repeat them, so only an empty stream is retried
+        return not self.written and is_llm_failure(result)
+
+def _recommendation_writer() -> _RecommendationWriter:
+    from langgraph.config import get_stream_writer
+    return _RecommendationWriter(get_stream_writer())
+
 # --- Define Conditional Edges --- 
 
-def route_from_brand_selector(state: AgentState) -> List[str] | str:
+def route_from_brand_selector(state: AgentState) -> List[Any] | str:
     if state.get("error_message"):
         return "error_handler_route"
     selected_brands = state.get("selected_brands", [])
-    active_brand_routes = []
-    if "Nike" in selected_brands:
-        active_brand_routes.append("nike_agent_route")
-    if "Adidas" in selected_brands:
-        active_brand_routes.append("adidas_agent_route")
-    if "Puma" in selected_brands:
-        active_brand_routes.append("puma_agent_route")
-    
-    if not active_brand_routes:
-        print("BrandSelectorRouter: No brands selected or to process. Routing to aggregator.")
+    if not selected_brands:
+        logger.info("BrandSelectorRouter: No brands selected or to process. Routing to aggregator.")
         # If no brands are selected, we still go to aggregator to potentially handle this (e.g., return empty list)
         return "aggregator_direct_route"
-    
-    print(f"BrandSelectorRouter: Routing to {active_brand_routes}")
-    return active_brand_routes
+
+    # One brand_collector task per brand, all in the same superstep; the aggregator runs once they have all returned
+    from langgraph.types import Send
+    logger.info("BrandSelectorRouter: Fanning out to %s", selected_brands)
+    return [Send("brand_collector", BrandTask(user_preferences=state["user_preferences"], brand=brand, deadline=state.get("deadline")))
+            for brand in selected_brands]
 
 def route_after_aggregation(state: AgentState) -> str:
     if state.get("error_message"):
@@ -78,81 +215,598 @@ def route_after_aggregation(state: AgentState) -> str:
     
     aggregated_sneakers = state.get("aggregated_sneakers", [])
     if not aggregated_sneakers:
-        print("AggregatorRouter: No sneakers aggregated. Setting message and ending.")
+        logger.info("AggregatorRouter: No sneakers aggregated. Setting message and ending.")
         # This state will be returned to the user by the main run function
         # No need to route to LLM if there's nothing to recommend.
         # The main function will craft the final error/message.
         return END 
     return "general_agent_route"
 
+def route_after_pre_ranking(state: AgentState) -> str:
+    if state.get("error_message"):
+        return "error_handler_route"
+    reason = FastPathPolicy().choose(state)
+    if reason:
+        logger.info("PreRankerRouter: Fast path (%s), skipping the LLM.", reason)
+        path_metrics.record(FAST_PATH, reason)
+        if reason == DEADLINE:
+            LLM_FALLBACKS.inc(fallback="local", cause="deadline")
+        return "fast_path_route"
+    path_metrics.record(LLM_PATH)
+    return "general_agent_route"
+
 # --- Build the Graph --- 
-workflow = StateGraph(AgentState)
-
-# Add nodes
-workflow.add_node("brand_selector", brand_selector_node)
-workflow.add_node("nike_data_collector", nike_data_collector_node)
-workflow.add_node("adidas_data_collector", adidas_data_collector_node)
-workflow.add_node("puma_data_collector", puma_data_collector_node)
-workflow.add_node("aggregator", aggregator_node)
-workflow.add_node("general_agent_llm", general_agent_node)
-workflow.add_node("error_handler", error_handler_node)
-
-# Set entry point
-workflow.set_entry_point("brand_selector")
-
-# Conditional routing from brand selector
-workflow.add_conditional_edges(
-    "brand_selector",
-    route_from_brand_selector,
-    {
-        "nike_agent_route": "nike_data_collector",
-        "adidas_agent_route": "adidas_data_collector",
-        "puma_agent_route": "puma_data_collector",
-        "aggregator_direct_route": "aggregator", # If no brands selected, skip brand agents
-        "error_handler_route": "error_handler"
-    }
-)
+def build_workflow(async_nodes: bool = False) -> "StateGraph":
+    # A graph with coroutine nodes can only run via ainvoke, so the sync and async entry points get separate graphs
+    from langgraph.graph import StateGraph  # Deferred: langgraph imports langchain_core, which dominates cold start
+    workflow = StateGraph(AgentState)
 
-# Edges from brand data collectors to aggregator
-workflow.add_edge("nike_data_collector", "aggregator")
-workflow.add_edge("adidas_data_collector", "aggregator")
-workflow.add_edge("puma_data_collector", "aggregator")
-
-# Conditional routing from aggregator
-workflow.add_conditional_edges(
-    "aggregator",
-    route_after_aggregation,
-    {
-        "general_agent_route": "general_agent_llm",
-        "error_handler_route": "error_handler",
-        END: END # If no sneakers aggregated, end the flow
-    }
-)
+    def add_node(name, fn):
+        # Every node is wrapped for per-node timing, payload and sneaker-count metrics
+        workflow.add_node(name, traced_node(name, fn))
+
+    # Add nodes
+    add_node("brand_selector", brand_selector_node)
+    add_node("brand_collector", abrand_collector_node if async_nodes else brand_collector_node)
+    add_node("aggregator", aggregator_node)
+    add_node("pre_ranker", pre_ranker_node)
+    add_node("fast_path_recommender", fast_path_node)
+    add_node("general_agent_llm", ageneral_agent_node if async_nodes else general_agent_node)
+    add_node("error_handler", error_handler_node)
+
+    # Set entry point
+    workflow.set_entry_point("brand_selector")
+
+    # Conditional routing from brand selector
+    workflow.add_conditional_edges(
+        "brand_selector",
+        route_from_brand_selector,
+        {
+            "brand_collector": "brand_collector", # Target of the Send fan-out; listed so the diagram shows the edge
+            "aggregator_direct_route": "aggregator", # If no brands selected, skip brand agents
+            "error_handler_route": "error_handler"
+        }
+    )
+
+    # Edge from the brand collector tasks to aggregator
+    workflow.add_edge("brand_collector", "aggregator")
+
+    # Conditional routing from aggregator
+    workflow.add_conditional_edges(
+        "aggregator",
+        route_after_aggregation,
+        {
+            "general_agent_route": "pre_ranker", # Only the top-K candidates reach the LLM
+            "error_handler_route": "error_handler",
+            END: END # If no sneakers aggregated, end the flow
+        }
+    )
+
+    # Conditional routing from pre-ranker: unambiguous cases skip the LLM
+    workflow.add_conditional_edges(
+        "pre_ranker",
+        route_after_pre_ranking,
+        {
+            "general_agent_route": "general_agent_llm",
+            "fast_path_route": "fast_path_recommender",
+            "error_handler_route": "error_handler"
+        }
+    )
+
+    # Final steps
+    workflow.add_edge("general_agent_llm", END) # Successful path ends after LLM
+    workflow.add_edge("fast_path_recommender", END)
+    workflow.add_edge("error_handler", END)    # Error path ends
+    return workflow
+
+# Compiled graphs are built on first use and memoised, so importing this module stays cheap
+_compiled_graphs: Dict[bool, Any] = {}
+_compiled_graphs_lock = Lock()
+# Graphs whose checkpointer a forked worker inherited: its connection belongs to the parent process
+_inherited_checkpointers: Set[bool] = set()
+_inherited_graphs: List[Any] = []  # Kept referenced, never closed from the child
+_loop_closers: Set[Any] = set()  # See _close_with_loop
+# Request ids of each graph's checkpointed runs (tools.checkpointing.RunRegistry), built with the graph's first run
+_run_registries: Dict[bool, Optional[RunRegistry]] = {}
+_inherited_registries: List[RunRegistry] = []  # A forked worker's copies of the parent's connections, never closed
+
+def get_app(async_nodes: bool = False) -> Any:
+    graph = _compiled_graphs.get(async_nodes)
+    if graph is None or not _checkpointer_usable(async_nodes, graph):
+        with _compiled_graphs_lock:
+            graph = _compiled_graphs.get(async_nodes)
+            if graph is None:
+                graph = build_workflow(async_nodes=async_nodes).compile(checkpointer=get_checkpointer(async_nodes))
+                _close_with_loop(graph)
+            elif not _checkpointer_usable(async_nodes, graph):
+                _retire_checkpointer(async_nodes, graph)
+                # Same compiled graph with a checkpointer of its own; compiling again is what warm_up saves a worker
+                graph = graph.copy(update={"checkpointer": get_checkpointer(async_nodes)})
+                _close_with_loop(graph)
+            _compiled_graphs[async_nodes] = graph
+    return graph
+
+def _checkpointer_usable(async_nodes: bool, graph: Any) -> bool:
+    # A checkpointer's connection belongs to the process that opened it; AsyncSqliteSaver's also to its event loop
+    if async_nodes in _inherited_checkpointers:
+        return False
+    loop = getattr(graph.checkpointer, "loop", None)
+    if loop is None:
+        return True
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:  # No loop running here, so none to compare with
+        return True
+
+def _close_with_loop(graph: Any) -> None:
+    # AsyncSqliteSaver's aiosqlite connection runs on a non-daemon thread, which keeps the interpreter from exiting
+    # until the connection is closed. asyncio.run (uvicorn included) finalises a loop's unfinished async generators
+    # before closing it, so one parked here closes the connection on that loop, whoever started the loop.
+    if getattr(graph.checkpointer, "loop", None) is None:
+        return
+
+    async def close_at_loop_end():
+        try:
+            yield
+        finally:
+            _loop_closers.discard(closer)
+            await _aclose_connection(graph.checkpointer)
+
+    closer = close_at_loop_end()
+    try:
+        closer.asend(None).send(None)  # Runs to the yield; the loop now tracks the generator
+    except StopIteration:
+        _loop_closers.add(closer)
+
+def _retire_checkpointer(async_nodes: bool, graph: Any) -> None:
+    if async_nodes in _inherited_checkpointers:
+        _inherited_checkpointers.discard(async_nodes)
+        _inherited_graphs.append(graph)
+        return
+    conn = getattr(graph.checkpointer, "conn", None)
+    stop = getattr(conn, "stop", None)
+    if stop is not None:
+        stop()  # aiosqlite, from outside its loop: the worker thread closes the connection and ends; nothing waits
+    elif conn is not None:
+        conn.close()
 
-# Final steps
-workflow.add_edge("general_agent_llm", END) # Successful path ends after LLM
-workflow.add_edge("error_handler", END)    # Error path ends
+async def _aclose_connection(checkpointer: Any) -> None:
+    conn = getattr(checkpointer, "conn", None)
+    if hasattr(conn, "stop"):
+        await conn.close()  # aiosqlite: returns once the worker thread has closed the connection and ended
+    elif conn is not None:
+        conn.close()
 
-# Compile the graph
-app = workflow.compile()
+def _take_checkpointed_graphs() -> List[Tuple[bool, Any]]:
+    with _compiled_graphs_lock:
+        graphs = [(async_nodes, graph) for async_nodes, graph in _compiled_graphs.items() if graph.checkpointer is not None]
+        for async_nodes, _ in graphs:
+            del _compiled_graphs[async_nodes]
+    return graphs
+
+def _run_registry(async_nodes: bool) -> Optional[RunRegistry]:
+    if async_nodes not in _run_registries:
+        with _compiled_graphs_lock:
+            if async_nodes not in _run_registries:
+                _run_registries[async_nodes] = create_run_registry()
+    return _run_registries[async_nodes]
+
+def _close_run_registries() -> None:
+    with _compiled_graphs_lock:
+        registries = [registry for registry in _run_registries.values() if registry is not None]
+        _run_registries.clear()
+    for registry in registries:
+        registry.close()
+
+def close_checkpointers() -> None:
+    """Closes the compiled graphs' checkpointer connections (worker shutdown); the next run opens new ones.
+    From inside an event loop, use aclose_checkpointers so the aiosqlite close finishes before the loop does."""
+    for async_nodes, graph in _take_checkpointed_graphs():
+        _retire_checkpointer(async_nodes, graph)
+    _close_run_registries()
+
+async def aclose_checkpointers() -> None:
+    for async_nodes, graph in _take_checkpointed_graphs():
+        if async_nodes in _inherited_checkpointers:
+            _retire_checkpointer(async_nodes, graph)
+        else:
+            await _aclose_connection(graph.checkpointer)
+    _close_run_registries()
+
+def _reset_checkpointers_after_fork() -> None:
+    # Graphs without a checkpointer stay as the master compiled them (gunicorn preload)
+    global _compiled_graphs_lock
+    _inherited_checkpointers.update(async_nodes for async_nodes, graph in _compiled_graphs.items() if graph.checkpointer is not None)
+    _run_api_keys.clear()
+    _loop_closers.clear()  # The parent's loops don't run here
+    _inherited_registries.extend(registry for registry in _run_registries.values() if registry is not None)
+    _run_registries.clear()
+    _compiled_graphs_lock = Lock()
+
+os.register_at_fork(after_in_child=_reset_checkpointers_after_fork)
+
+def get_async_app() -> Any:
+    return get_app(async_nodes=True)
+
+def __getattr__(name: str) -> Any:
+    # Keeps `workflow.app` / `workflow.async_app` working for existing callers without compiling at import
+    if name == "app":
+        return get_app()
+    if name == "async_app":
+        return get_async_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- Main execution function (to be called by main.py) ---
-def run_sneaker_workflow(preferences: UserPreferences, gemini_api_key: str) -> Dict[str, Any]:
-    initial_state: AgentState = {
+def request_deadline(budget_seconds: Optional[float] = None) -> Optional[float]:
+    """The time.time() deadline of a request starting now: `budget_seconds`, or SNEAKER_REQUEST_BUDGET_SECONDS.
+    Opt-in: unset or 0 means no deadline, so batch and offline callers wait for Gemini unless they pass a budget;
+    interactive deployments set it (e.g. 10). Past it the LLM node answers with a fallback instead of waiting."""
+    budget = budget_seconds if budget_seconds is not None else float(os.getenv("SNEAKER_REQUEST_BUDGET_SECONDS", "0"))
+    return time.time() + budget if budget > 0 else None
+
+def run_sneaker_workflow(preferences: UserPreferences, gemini_api_key: str, use_cache: bool = True,
+                         request_id: Optional[str] = None, budget_seconds: Optional[float] = None) -> Dict[str, Any]:
+    deadline = request_deadline(budget_seconds)
+    # Identical (normalised) preferences against the same catalog version skip the graph and the LLM call
+    cache = get_recommendation_cache() if use_cache else None
+    cache_key = make_cache_key(preferences, get_catalog_version()) if cache else None
+    if cache:
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Workflow cache hit for preferences: %s", preferences)
+            return cached_result
+
+    logger.info("Starting workflow with preferences: %s", preferences)
+    app = get_app()
+    try:
+        graph_input, config = _start_or_resume(app, preferences, gemini_api_key, request_id, deadline=deadline)
+    except RequestInProgressError as e:
+        return _workflow_result({"error_message": str(e)})
+    try:
+        final_state = app.invoke(graph_input, config)
+    except NodeRetryError as e:
+        return _failed_result(app.get_state(config).values if config else {}, e)
+    finally:
+        _release_thread(app, config, request_id)
+    result = _workflow_result(final_state)
+
+    # Errors (LLM failures, empty catalogs) and brand timeouts may be transient, so only complete successes are cached
+    if cache and _cacheable(result):
+        cache.set(cache_key, result)
+    return result
+
+async def arun_sneaker_workflow(preferences: UserPreferences, gemini_api_key: str, use_cache: bool = True,
+                                request_id: Optional[str] = None, budget_seconds: Optional[float] = None) -> Dict[str, Any]:
+    deadline = request_deadline(budget_seconds)
+    # Async counterpart of run_sneaker_workflow: collectors and the Gemini call are awaited, not blocking a thread
+    cache = get_recommendation_cache() if use_cache else None
+    cache_key = make_cache_key(preferences, get_catalog_version()) if cache else None
+    if cache:
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Workflow cache hit for preferences: %s", preferences)
+            return cached_result
+
+    logger.info("Starting async workflow with preferences: %s", preferences)
+    app = get_async_app()
+    try:
+        graph_input, config = await _astart_or_resume(app, preferences, gemini_api_key, request_id, deadline=deadline)
+    except RequestInProgressError as e:
+        return _workflow_result({"error_message": str(e)})
+    try:
+        final_state = await app.ainvoke(graph_input, config)
+    except NodeRetryError as e:
+        return _failed_result((await app.aget_state(config)).values if config else {}, e)
+    finally:
+        await _arelease_thread(app, config, request_id)
+    result = _workflow_result(final_state)
+
+    if cache and _cacheable(result):
+        cache.set(cache_key, result)
+    return result
+
+def stream_sneaker_workflow(preferences: UserPreferences, gemini_api_key: str, use_cache: bool = True,
+                            request_id: Optional[str] = None, budget_seconds: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Streaming run_sneaker_workflow: yields {"recommendation": ...} for each pick as soon as the LLM
+    has written it, then one {"result": ...} with exactly what run_sneaker_workflow would return.
+    """
+    deadline = request_deadline(budget_seconds)
+    cache = get_recommendation_cache() if use_cache else None
+    cache_key = make_cache_key(preferences, get_catalog_version()) if cache else None
+    if cache:
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Workflow cache hit for preferences: %s", preferences)
+            yield from _stream_events(cached_result, 0)
+            return
+
+    logger.info("Starting streaming workflow with preferences: %s", preferences)
+    app = get_app()
+    try:
+        graph_input, config = _start_or_resume(app, preferences, gemini_api_key, request_id, stream=True, deadline=deadline)
+    except RequestInProgressError as e:
+        yield from _stream_events(_workflow_result({"error_message": str(e)}), 0)
+        return
+    final_state: Dict[str, Any] = {}
+    streamed = 0
+    try:
+        for mode, chunk in app.stream(graph_input, config, stream_mode=["custom", "values"]):
+            if mode == "custom" and "recommendation" in chunk:
+                streamed += 1
+                yield {"recommendation": chunk["recommendation"]}
+            elif mode == "values":
+                final_state = chunk
+    except NodeRetryError as e:
+        yield from _stream_events(_failed_result(final_state, e), streamed)
+        return
+    finally:
+        _release_thread(app, config, request_id)
+    result = _workflow_result(final_state)
+    yield from _stream_events(result, streamed)
+
+    if cache and _cacheable(result):
+        cache.set(cache_key, result)
+
+async def astream_sneaker_workflow(preferences: UserPreferences, gemini_api_key: str, use_cache: bool = True,
+                                   request_id: Optional[str] = None, budget_seconds: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+    deadline = request_deadline(budget_seconds)
+    # Async counterpart of stream_sneaker_workflow, on the async graph
+    cache = get_recommendation_cache() if use_cache else None
+    cache_key = make_cache_key(preferences, get_catalog_version()) if cache else None
+    if cache:
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Workflow cache hit for preferences: %s", preferences)
+            for event in _stream_events(cached_result, 0):
+                yield event
+            return
+
+    logger.info("Starting async streaming workflow with preferences: %s", preferences)
+    app = get_async_app()
+    try:
+        graph_input, config = await _astart_or_resume(app, preferences, gemini_api_key, request_id, stream=True, deadline=deadline)
+    except RequestInProgressError as e:
+        for event in _stream_events(_workflow_result({"error_message": str(e)}), 0):
+            yield event
+        return
+    final_state: Dict[str, Any] = {}
+    streamed = 0
+    try:
+        async for mode, chunk in app.astream(graph_input, config, stream_mode=["custom", "values"]):
+            if mode == "custom" and "recommendation" in chunk:
+                streamed += 1
+                yield {"recommendation": chunk["recommendation"]}
+            elif mode == "values":
+                final_state = chunk
+    except NodeRetryError as e:
+        for event in _stream_events(_failed_result(final_state, e), streamed):
+            yield event
+        return
+    finally:
+        await _arelease_thread(app, config, request_id)
+    result = _workflow_result(final_state)
+    for event in _stream_events(result, streamed):
+        yield event
+
+    if cache and _cacheable(result):
+        cache.set(cache_key, result)
+
+def _stream_events(result: Dict[str, Any], already_streamed: int) -> Iterator[Dict[str, Any]]:
+    # Cache hits and the fast path produce all picks at once; emit the ones not streamed yet, then the result
+    for recommendation in result.get("recommendations", [])[already_streamed:]:
+        yield {"recommendation": recommendation}
+    yield {"result": result}
+
+def run_sneaker_workflow_batch(
+    preferences_list: List[UserPreferences],
+    gemini_api_key: str,
+    max_prompt_chars: int = DEFAULT_MAX_PROMPT_CHARS,
+    max_requests_per_call: int = DEFAULT_MAX_REQUESTS_PER_CALL,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    use_cache: bool = True,
+    budget_seconds: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """Recommendations for many users at once (e.g. the nightly email campaign), in input order.
+
+    Identical preference sets are computed once, the catalog is read once per (brand, gender),
+    and several users' candidate lists are packed into each Gemini prompt. The packed calls are retried,
+    hedged and bounded by the deadline like a single run's; the users of a call that still fails get the
+    top pre-ranked candidates instead of an error.
+    """
+    deadline = request_deadline(budget_seconds)
+    catalog_version = get_catalog_version()
+    cache = get_recommendation_cache() if use_cache else None
+    keys = [make_cache_key(preferences, catalog_version) for preferences in preferences_list]
+
+    results_by_key: Dict[str, Dict[str, Any]] = {}
+    pending: Dict[str, UserPreferences] = {}
+    for key, preferences in zip(keys, preferences_list):
+        if key in results_by_key or key in pending:
+            continue
+        cached_result = cache.get(key) if cache else None
+        if cached_result is not None:
+            results_by_key[key] = cached_result
+        else:
+            pending[key] = preferences
+    logger.info("Batch workflow: %s requests, %s unique preference sets to compute.", len(preferences_list), len(pending))
+
+    if pending:
+        pending_keys = list(pending)
+        states = dict(zip(pending_keys, collect_candidates_shared(list(pending.values()))))
+
+        # Users without candidates or with an unambiguous answer need no LLM call; _workflow_result explains empty outcomes.
+        # Short request ids keep the packed prompt small; they map back to cache keys afterwards.
+        fast_path_policy = FastPathPolicy()
+        key_by_request_id = {}
+        for i, key in enumerate(pending_keys):
+            state = states[key]
+            if not state["aggregated_sneakers"]:
+                continue
+            reason = fast_path_policy.choose(state)
+            if reason:
+                path_metrics.record(FAST_PATH, reason)
+                state.update(get_agent(RuleBasedRecommenderAgent).recommend(state, reason=reason))
+            else:
+                path_metrics.record(LLM_PATH)
+                key_by_request_id[f"u{i}"] = key
+        requests = [(request_id, states[key]["user_preferences"], states[key]["aggregated_sneakers"])
+                    for request_id, key in key_by_request_id.items()]
+        if requests:
+            agent = get_agent(GeneralAgent, gemini_api_key)
+            batches = pack_requests(agent, requests, max_prompt_chars, max_requests_per_call)
+            logger.info("Batch workflow: %s LLM requests packed into %s calls.", len(requests), len(batches))
+            def local_answer(request_id: str, error: NodeRetryError) -> Dict[str, Any]:
+                return _local_answer(states[key_by_request_id[request_id]], "deadline" if error.out_of_time else "error")
+
+            for request_id, node_result in run_batches(agent, batches, max_concurrency, deadline, local_answer).items():
+                states[key_by_request_id[request_id]].update(node_result)
+
+        for key, state in states.items():
+            result = _workflow_result(state)
+            if cache and _cacheable(result):
+                cache.set(key, result)
+            results_by_key[key] = result
+
+    # Duplicates share a result, so hand each position its own copy
+    return [{**results_by_key[key], "recommendations": [dict(rec) for rec in results_by_key[key]["recommendations"]]}
+            for key in keys]
+
+# --- Checkpointed runs ---
+# With a checkpointer (tools.checkpointing) each run is a thread keyed by its request id. A run whose LLM node
+# is still failing after its retries keeps its checkpoints, and the client's retry with the same request id
+# resumes at that node; finished runs and runs without a request id are deleted as they end. The graph's
+# RunRegistry refuses a request id that another run is using, and kept runs the client never retried are
+# deleted once SNEAKER_CHECKPOINT_TTL_SECONDS has passed, by whichever run ends next.
+
+def _start_or_resume(app: Any, preferences: UserPreferences, gemini_api_key: str, request_id: Optional[str],
+                     stream: bool = False, deadline: Optional[float] = None) -> Tuple[Optional[AgentState], Optional[Dict[str, Any]]]:
+    """The graph input and run config: None as input resumes the request's interrupted run.
+    Raises RequestInProgressError if another run has the request id."""
+    if app.checkpointer is None:
+        return _initial_state(preferences, gemini_api_key, stream, deadline), None
+    registry = _run_registry(False)
+    if request_id and not registry.claim(request_id):
+        raise RequestInProgressError(request_id)
+    config = _thread_config(gemini_api_key, request_id)
+    try:
+        if request_id:
+            snapshot = app.get_state(config)
+            if _resumable(snapshot, preferences):
+                # The retry has a budget of its own, not what was left of the failed attempt's
+                app.update_state(config, {"deadline": deadline})
+                return None, config
+            if snapshot.values:
+                app.checkpointer.delete_thread(request_id)
+    except BaseException:
+        _forget_run(registry, config, request_id)
+        raise
+    return _initial_state(preferences, "", stream, deadline), config
+
+async def _astart_or_resume(app: Any, preferences: UserPreferences, gemini_api_key: str, request_id: Optional[str],
+                            stream: bool = False, deadline: Optional[float] = None) -> Tuple[Optional[AgentState], Optional[Dict[str, Any]]]:
+    if app.checkpointer is None:
+        return _initial_state(preferences, gemini_api_key, stream, deadline), None
+    registry = _run_registry(True)
+    # The registry is plain sqlite3, so its calls (which may wait on another worker's write) run off the loop
+    if request_id and not await asyncio.to_thread(registry.claim, request_id):
+        raise RequestInProgressError(request_id)
+    config = _thread_config(gemini_api_key, request_id)
+    try:
+        if request_id:
+            snapshot = await app.aget_state(config)
+            if _resumable(snapshot, preferences):
+                await app.aupdate_state(config, {"deadline": deadline})
+                return None, config
+            if snapshot.values:
+                await app.checkpointer.adelete_thread(request_id)
+    except BaseException:
+        await asyncio.to_thread(_forget_run, registry, config, request_id)
+        raise
+    return _initial_state(preferences, "", stream, deadline), config
+
+# API keys of the checkpointed runs in progress, by thread id. Not in the run config: LangGraph copies every
+# string in `configurable` into the checkpoint metadata, which the sqlite checkpointer writes to disk.
+# The registry's claim keeps two runs from sharing a thread id, and so an entry here.
+_run_api_keys: Dict[str, str] = {}
+
+def _thread_config(gemini_api_key: str, request_id: Optional[str]) -> Dict[str, Any]:
+    # A run without a request id gets a throwaway thread
+    thread_id = request_id or uuid.uuid4().hex
+    _run_api_keys[thread_id] = gemini_api_key
+    return {"configurable": {"thread_id": thread_id}}
+
+def _forget_run(registry: RunRegistry, config: Dict[str, Any], request_id: Optional[str]) -> None:
+    _run_api_keys.pop(config["configurable"]["thread_id"], None)
+    if request_id:
+        registry.release(request_id, keep=False)
+
+def _resumable(snapshot: Any, preferences: UserPreferences) -> bool:
+    # An unfinished run for the same preferences; a reused request id with other preferences starts over
+    saved = snapshot.values.get("user_preferences")
+    if not snapshot.next or not saved or make_cache_key(saved, 0, 0.01) != make_cache_key(preferences, 0, 0.01):
+        return False
+    logger.info("Resuming request %s at %s", snapshot.config["configurable"]["thread_id"], ", ".join(snapshot.next))
+    WORKFLOW_RESUMES.inc(node=snapshot.next[0])
+    return True
+
+def _release_thread(app: Any, config: Optional[Dict[str, Any]], request_id: Optional[str]) -> None:
+    if config is None:
+        return
+    registry = _run_registry(False)
+    _run_api_keys.pop(config["configurable"]["thread_id"], None)  # A resumed run brings the key again
+    keep = bool(request_id and app.get_state(config).next)
+    if not keep:
+        app.checkpointer.delete_thread(config["configurable"]["thread_id"])
+    if request_id:
+        registry.release(request_id, keep)
+    expired = registry.take_expired()
+    for thread_id in expired:
+        app.checkpointer.delete_thread(thread_id)
+    if expired:
+        registry.forget(expired)
+        logger.info("Deleted %s expired checkpointed runs.", len(expired))
+
+async def _arelease_thread(app: Any, config: Optional[Dict[str, Any]], request_id: Optional[str]) -> None:
+    if config is None:
+        return
+    registry = _run_registry(True)
+    _run_api_keys.pop(config["configurable"]["thread_id"], None)
+    keep = bool(request_id and (await app.aget_state(config)).next)
+    if not keep:
+        await app.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+    if request_id:
+        await asyncio.to_thread(registry.release, request_id, keep)
+    expired = await asyncio.to_thread(registry.take_expired)
+    for thread_id in expired:
+        await app.checkpointer.adelete_thread(thread_id)
+    if expired:
+        await asyncio.to_thread(registry.forget, expired)
+        logger.info("Deleted %s expired checkpointed runs.", len(expired))
+
+def _failed_result(state: Dict[str, Any], error: NodeRetryError) -> Dict[str, Any]:
+    # Same shape as a failed run before node retries: the node's last error on top of the state it failed in
+    logger.warning("Workflow node %s failed after %s attempts.", error.node, error.attempts)
+    return _workflow_result({**state, **error.result})
+
+def _initial_state(preferences: UserPreferences, gemini_api_key: str, stream: bool = False,
+                   deadline: Optional[float] = None) -> AgentState:
+    return {
         "user_preferences": preferences,
         "selected_brands": [],
         "brand_data": {}, # Crucial for operator.add to work correctly from the start
         "aggregated_sneakers": [],
+        "sneaker_index": {"by_name": {}, "by_url": {}},
+        "incomplete_brands": [],
+        "candidate_scores": [],
         "final_recommendations": [],
         "error_message": None,
-        "gemini_api_key": gemini_api_key
+        "gemini_api_key": gemini_api_key,
+        "stream_recommendations": stream,
+        "deadline": deadline,
     }
-    
-    print(f"Starting workflow with preferences: {preferences}")
-    # config = {"recursion_limit": 25} # Default, adjust if needed
-    final_state = app.invoke(initial_state) #, config=config)
-    
-    print("--- Workflow Ended --- Final State ---")
+
+def _workflow_result(final_state: Dict[str, Any]) -> Dict[str, Any]:
+    logger.debug("--- Workflow Ended --- Final State ---")
     # print(final_state) # For debugging the entire final state
 
     recommendations = final_state.get("final_recommendations", [])
@@ -167,14 +821,45 @@ def run_sneaker_workflow(preferences: UserPreferences, gemini_api_key: str) -> D
         else:
             error_message = "The AI advisor reviewed the available sneakers but could not find a specific match for your detailed preferences (style, color, use case). Try broadening your criteria."
 
+    # Brands whose source timed out or failed: the answer is built from the others, and says so
+    incomplete_brands = sorted(set(final_state.get("incomplete_brands") or []))
+    partial = {"incomplete_brands": incomplete_brands} if incomplete_brands else {}
+
     if error_message:
-        print(f"Workflow resulted in an error/no recommendations: {error_message}")
-        return {"error": error_message, "recommendations": []}
+        logger.warning("Workflow resulted in an error/no recommendations: %s", error_message)
+        return {"error": error_message, "recommendations": [], **partial}
     
-    print(f"Workflow successful. Recommendations: {len(recommendations)}")
-    return {"recommendations": recommendations}
+    logger.info("Workflow successful. Recommendations: %s", len(recommendations))
+    return {"recommendations": recommendations, **partial}
+
+def _cacheable(result: Dict[str, Any]) -> bool:
+    return not result.get("error") and not result.get("incomplete_brands")
+
+# --- Diagram export (explicit, never on import) ---
+# Run from the AI/ directory:  python workflow.py export-graph --out workflow_graph.png
+# PNG rendering goes through the mermaid.ink web service; --format mermaid writes the diagram source offline.
+
+def export_graph(path: str, fmt: str = "png", async_nodes: bool = False) -> None:
+    graph = get_app(async_nodes=async_nodes).get_graph(xray=True)
+    if fmt == "mermaid":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(graph.draw_mermaid())
+    else:
+        with open(path, "wb") as f:
+            f.write(graph.draw_mermaid_png())
+
+def main():
+    parser = argparse.ArgumentParser(description="Sneaker workflow utilities")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    export = subcommands.add_parser("export-graph", help="Render the workflow graph diagram")
+    export.add_argument("--out", default="workflow_graph.png")
+    export.add_argument("--format", choices=["png", "mermaid"], default="png")
+    export.add_argument("--async-nodes", action="store_true", help="Export the graph used by arun_sneaker_workflow")
+    args = parser.parse_args()
+
+    if args.command == "export-graph":
+        export_graph(args.out, args.format, args.async_nodes)
+        print(f"Workflow graph written to {args.out}")
 
-save_path = "workflow_graph.png"
-graph = app.get_graph(xray=True).draw_mermaid_png()
-with open(save_path, "wb") as f:
-    f.write(graph)
+if __name__ == "__main__":
+    main()
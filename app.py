@@ -1,40 +1,243 @@
-from flask import Flask
-import psycopg2
-from psycopg2 import pool
+import json
+import logging
+import os
+import sys
+from threading import Event, Lock
+
+from flask import Flask, Response, request, stream_with_context
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
-# Database connection pool
-try:
-    db_pool = psycopg2.pool.SimpleConnectionPool(
-        1, 20,
-        user="postgres",
-        password="your_password",
-        host="127.0.0.1",
-        port="5432",
-        database="shoes_db"
-    )
-except Exception as e:
-    print(f"Error connecting to database: {e}")
+SHOE_COLUMNS = ("id", "brand", "name", "price", "url", "gender", "description", "image_url")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+CURSOR_ITERSIZE = 200  # Rows fetched per round trip by the server-side cursor
+AI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "AI")
+
+# The workflow modules import each other as top-level packages from the AI/ directory
+if AI_DIR not in sys.path:
+    sys.path.insert(0, AI_DIR)
+from tools.enrichment import normalise_gender
+from tools.data_source import catalog_snapshot_enabled, close_sneaker_source, create_postgres_pool, get_sneaker_source, start_catalog_listener
+from tools.tracing import configure_logging, metrics_text
+
+configure_logging()  # SNEAKER_LOG_LEVEL; at import, so the gunicorn master, its workers and the dev server all get it
+
+# --- Per-process database pool ---
+# Connection settings come from SHOES_DB_HOST/PORT/NAME/USER/PASSWORD (see tools.data_source.create_postgres_pool).
+# SHOES_DB_POOL_MAX should be at least the worker's thread count (SHOES_WEB_THREADS): a ThreadedConnectionPool
+# raises instead of waiting when every connection is borrowed.
+
+_db_pool = None
+_db_pool_lock = Lock()
+_inherited_pools = []  # Pools copied from a parent process by fork(); their sockets belong to the parent
+_draining = Event()
+
+def get_db_pool():
+    """This process's ThreadedConnectionPool, created on first use (so after fork), or None if Postgres is unreachable."""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                try:
+                    _db_pool = create_postgres_pool(int(os.getenv("SHOES_DB_POOL_MIN", "1")), int(os.getenv("SHOES_DB_POOL_MAX", "10")))
+                except Exception as e:
+                    logger.error("Error connecting to database: %s", e)  # Retried on the next request
+    return _db_pool
+
+def _forget_pool_after_fork():
+    # Kept referenced, never closed: finalising the parent's connections from here would end its sessions
+    global _db_pool, _db_pool_lock
+    if _db_pool is not None:
+        _inherited_pools.append(_db_pool)
+    _db_pool = None
+    _db_pool_lock = Lock()
+
+os.register_at_fork(after_in_child=_forget_pool_after_fork)
+
+def warm_up():
+    """Imports the workflow, compiles its graph and loads the catalog snapshot (SHOES_CATALOG_SNAPSHOT=1). Run in the
+    gunicorn master with preload, so every worker starts with them already in (copy-on-write) memory instead of
+    paying for them on its first request."""
+    from workflow import get_app
+    get_app()
+    if catalog_snapshot_enabled():
+        get_sneaker_source()  # Loads the catalog snapshot; workers inherit it and only fetch the changes since
+
+def init_worker():
+    """Called once per worker process after fork (gunicorn post_fork, ASGI lifespan startup)."""
+    _draining.clear()
+    get_db_pool()
+    start_catalog_listener()
+
+def shutdown():
+    """Graceful stop for this worker, after the server has finished its in-flight requests:
+    readiness turns 503 and every pool the process opened is closed."""
+    global _db_pool
+    _draining.set()
+    with _db_pool_lock:
+        pool, _db_pool = _db_pool, None
+    if pool is not None:
+        pool.closeall()
+    close_sneaker_source()
+    from workflow import close_checkpointers
+    close_checkpointers()
+    logger.info("Worker %s drained.", os.getpid())
+
+def build_shoes_query(after_id, limit, brand=None, gender=None, min_price=None, max_price=None):
+    # Keyset pagination: "id > last seen id" walks the primary key index, unlike OFFSET
+    clauses = ["id > %s"]
+    params = [after_id]
+    if brand:
+        clauses.append("brand = %s")
+        params.append(brand)
+    if gender:
+        # Stored genders are normalised at ingest ('Male' -> 'male'); a value outside the three groups is matched as given
+        clauses.append("gender = %s")
+        params.append(normalise_gender(gender) or gender)
+    if min_price is not None:
+        clauses.append("price >= %s")
+        params.append(min_price)
+    if max_price is not None:
+        clauses.append("price <= %s")
+        params.append(max_price)
+    query = f"SELECT {', '.join(SHOE_COLUMNS)} FROM shoes WHERE {' AND '.join(clauses)} ORDER BY id LIMIT %s"
+    params.append(limit)
+    return query, params
+
+def stream_shoes_page(db_pool, query, params, limit):
+    conn = db_pool.getconn()
+    cur = None
+    try:
+        # A named cursor lives on the server, so rows arrive itersize at a time instead of all at once
+        cur = conn.cursor(name="shoes_page")
+        cur.itersize = CURSOR_ITERSIZE
+        cur.execute(query, params)
+
+        yield '{"shoes": ['
+        count = 0
+        last_id = None
+        for row in cur:
+            shoe = dict(zip(SHOE_COLUMNS, row))
+            shoe["price"] = float(shoe["price"])
+            yield ("," if count else "") + json.dumps(shoe, ensure_ascii=False)
+            count += 1
+            last_id = shoe["id"]
+        # A full page means there may be more rows; the client passes this back as after_id
+        next_after_id = last_id if count == limit else None
+        yield f'], "count": {count}, "next_after_id": {json.dumps(next_after_id)}}}'
+    finally:
+        try:
+            if cur is not None:
+                cur.close()
+            conn.rollback()  # End the read transaction the named cursor opened
+        finally:
+            db_pool.putconn(conn)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def preferences_from_args(args):
+    brands = [brand.strip() for brand in args.get("brands", "").split(",") if brand.strip()]
+    return {
+        "preferred_brands": brands,
+        "gender_age_group": args.get("gender", "male"),
+        "budget_range": (args.get("min_price", 0.0, type=float), args.get("max_price", 1000.0, type=float)),
+        "style": args.get("style"),
+        "color": args.get("color"),
+        "use_case": args.get("use_case"),
+    }
+
+def stream_recommendation_events(preferences, request_id=None):
+    from workflow import stream_sneaker_workflow  # Deferred: the graph libraries are only needed by these routes
+
+    try:
+        for event in stream_sneaker_workflow(preferences, os.getenv("GEMINI_API_KEY", ""), request_id=request_id):
+            if "recommendation" in event:
+                yield sse_event("recommendation", event["recommendation"])
+            else:
+                yield sse_event("done", event["result"])
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
 
 @app.route('/')
 def index():
+    return ("Shoes API: GET /shoes?after_id=&limit=&brand=&gender=&min_price=&max_price= | "
+            "GET /recommendations?brands=Nike,Puma&gender=&min_price=&max_price=&style=&color=&use_case= | "
+            "GET /recommendations/stream?... (same parameters, server-sent events) | GET /healthz | GET /readyz | GET /metrics")
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is up and serving; dependencies are /readyz's concern
+    return {"status": "ok", "pid": os.getpid()}
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: take this worker out of rotation while it drains or while its catalog source (SHOES_DATA_SOURCE)
+    # can't serve. Postgres is only probed when the collectors query it per request.
+    if _draining.is_set():
+        return {"status": "draining"}, 503
+    try:
+        source = get_sneaker_source()
+    except Exception as e:
+        return {"status": "unavailable", "catalog": str(e)}, 503  # E.g. the Postgres pool or snapshot load failed
+    if getattr(source, "dialect", None) != "postgres" or getattr(source, "snapshot", None) is not None:
+        return {"status": "ready"}  # In-memory catalog, SQLite file, or an already loaded catalog snapshot
+    db_pool = source.pool
     try:
-        # Get a connection from the pool
         conn = db_pool.getconn()
-        cur = conn.cursor()
-        
-        # Example query
-        cur.execute("SELECT * FROM shoes")
-        shoes = cur.fetchall()
-        
-        # Clean up
-        cur.close()
-        db_pool.putconn(conn)
-        
-        return f"Shoes in database: {shoes}"
     except Exception as e:
-        return f"Error: {e}"
+        return {"status": "unavailable", "database": str(e)}, 503
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+    except Exception as e:
+        db_pool.putconn(conn, close=True)  # A broken connection must not go back into the pool
+        return {"status": "unavailable", "database": str(e)}, 503
+    db_pool.putconn(conn)
+    return {"status": "ready"}
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape target; counters are per worker process, so scrape each worker (or label by instance)
+    return Response(metrics_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/shoes')
+def list_shoes():
+    db_pool = get_db_pool()
+    if db_pool is None:
+        return {"error": "Database connection pool is not available."}, 503
+    # Malformed numbers fall back to the defaults (type= swallows the ValueError)
+    after_id = request.args.get("after_id", 0, type=int)
+    limit = min(max(request.args.get("limit", DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    query, params = build_shoes_query(
+        after_id, limit,
+        brand=request.args.get("brand"),
+        gender=request.args.get("gender"),
+        min_price=request.args.get("min_price", type=float),
+        max_price=request.args.get("max_price", type=float),
+    )
+    return Response(stream_with_context(stream_shoes_page(db_pool, query, params, limit)), mimetype="application/json")
+
+@app.route('/recommendations')
+def recommendations():
+    # The whole workflow result as one JSON document ({"recommendations": [...]} or {"error": ..., "recommendations": []}).
+    # A client retrying with the same X-Request-ID resumes a checkpointed run instead of starting over (SNEAKER_CHECKPOINTER).
+    from workflow import run_sneaker_workflow
+    return run_sneaker_workflow(preferences_from_args(request.args), os.getenv("GEMINI_API_KEY", ""),
+                                request_id=request.headers.get("X-Request-ID"))
+
+@app.route('/recommendations/stream')
+def stream_recommendations():
+    # Server-sent events: one "recommendation" event per pick as the LLM writes it, then "done" with the full result
+    return Response(
+        stream_with_context(stream_recommendation_events(preferences_from_args(request.args), request.headers.get("X-Request-ID"))),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # Keep proxies from buffering the stream
+    )
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Development server only; production runs several worker processes: gunicorn -c gunicorn.conf.py app:app
+    app.run(debug=os.getenv("FLASK_DEBUG", "0") == "1", threaded=True)
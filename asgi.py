@@ -0,0 +1,23 @@
+# ASGI serving: uvicorn asgi:application --workers 4 (or any ASGI server; needs asgiref)
+# Flask stays a WSGI app and runs on asgiref's thread pool; lifespan events open and drain the per-process pools.
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app, init_worker, shutdown
+
+_wsgi_app = WsgiToAsgi(app)
+
+async def application(scope, receive, send):
+    if scope["type"] != "lifespan":
+        await _wsgi_app(scope, receive, send)
+        return
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            init_worker()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            from workflow import aclose_checkpointers
+            await aclose_checkpointers()  # On this loop, which the async checkpointer's connection reports back to
+            shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
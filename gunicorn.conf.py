@@ -0,0 +1,32 @@
+# Production serving: gunicorn -c gunicorn.conf.py app:app
+# Each worker process opens its own ThreadedConnectionPool after fork and closes it when it exits.
+# Environment: WEB_CONCURRENCY (worker processes), SHOES_WEB_THREADS (threads per worker), SHOES_WEB_BIND,
+# SHOES_WEB_TIMEOUT, SHOES_WEB_GRACEFUL_TIMEOUT, SHOES_WEB_PRELOAD, plus SHOES_DB_* for the database.
+import multiprocessing
+import os
+
+bind = os.getenv("SHOES_WEB_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# Threads per process for the blocking parts (Postgres, Gemini, SSE streams); processes for the CPU-bound graph
+worker_class = "gthread"
+threads = int(os.getenv("SHOES_WEB_THREADS", "8"))
+timeout = int(os.getenv("SHOES_WEB_TIMEOUT", "120"))  # A recommendation waits on the LLM
+# SIGTERM: stop accepting, let in-flight requests finish for up to this long, then worker_exit drains the pools
+graceful_timeout = int(os.getenv("SHOES_WEB_GRACEFUL_TIMEOUT", "30"))
+# Imports (and the in-memory catalog) once in the master so workers share them copy-on-write
+preload_app = os.getenv("SHOES_WEB_PRELOAD", "1") == "1"
+accesslog = os.getenv("SHOES_WEB_ACCESS_LOG") or None
+
+def when_ready(server):
+    # Master, before the first fork: with preload, workers inherit the compiled graph
+    if preload_app:
+        from app import warm_up
+        warm_up()
+
+def post_fork(server, worker):
+    from app import init_worker
+    init_worker()
+
+def worker_exit(server, worker):
+    from app import shutdown
+    shutdown()
@@ -1,4 +1,7 @@
 -- Insert 30 Nike shoes from Nike website research into the shoes table
+-- These rows are raw: gender as 'Male' / 'Female' / 'Kids' and prices in THB. The app expects the ingest's
+-- normalised genders ('male', 'female', 'kid') and USD prices, so after loading this file backfill them from AI/:
+--     python -m tools.ingest --enrich-existing --currency THB
 INSERT INTO shoes (brand, name, price, url, gender, description, image_url)
 VALUES
 ('Nike', 'Nike Mercurial Vapor 16 Elite x Air Max 95 SE FG', 11600.00, 'https://www.nike.com/th/t/รองเท้าสตั๊ดฟุตบอลไม่หุ้มข้อ-fg-mercurial-vapor-16-elite-10-air-max-95-se-z8WERGo5/HV9915-001', 'Male', 'Special edition low-top FG football cleat celebrating the Air Max 95 anniversary, merging iconic Air Max colorways with Mercurial responsiveness for agility and superior ball control.', ''),
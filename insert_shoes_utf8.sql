@@ -1,3 +1,7 @@
+-- These rows are raw: gender as 'Male' / 'Female' / 'Unisex' and prices in THB. The app expects the ingest's
+-- normalised genders ('male', 'female', 'kid') and USD prices, so after loading this file backfill them from AI/:
+--     python -m tools.ingest --enrich-existing --currency THB
+-- 'Unisex' is none of the three groups, so the backfill reports those rows as bad_gender and leaves them as they are.
 INSERT INTO shoes (brand, name, price, url, gender, description, image_url)
 VALUES
 ('Puma', 'Suede Classic XXI Trainers', 1680.00, 'https://th.puma.com/th/en/pd/suede-classic-xxi-trainers/374915.html', 'Unisex', 'Iconic sneakers with a timeless design, featuring a full suede upper and comfortable rubber sole, perfect for everyday wear.', 'https://th.puma.com/on/demandware.static/-/Sites-PCom_THA/default/dwf4568c16/images/product/37/374915_05_01.jpg'),
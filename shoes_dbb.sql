@@ -1,21 +1,84 @@
+-- Catalog change log position, shared by row changes and deletions
+CREATE SEQUENCE shoes_change_seq;
+
 -- Create the shoes table
 CREATE TABLE shoes (
     id SERIAL PRIMARY KEY,
-    brand VARCHAR(50) CHECK (brand IN ('Adidas', 'Nike', 'Puma')) NOT NULL,
+    brand VARCHAR(50) NOT NULL, -- Any brand in the app's brand registry (SNEAKER_BRANDS); no fixed list here
     name VARCHAR(100) NOT NULL,
     price DECIMAL(10, 2) NOT NULL,
     url VARCHAR(255) NOT NULL,
     gender VARCHAR(20) NOT NULL,
     description TEXT NOT NULL,
-    image_url VARCHAR(255) NOT NULL
+    image_url VARCHAR(255) NOT NULL,
+    -- md5 of the content fields, set by the ingestion CLI (AI/tools/ingest.py) to skip unchanged rows
+    content_hash CHAR(32),
+    -- Enrichment, filled at ingest (AI/tools/enrichment.py): price is always USD, list_price is the feed's price in
+    -- currency. NULL currency marks a row that was never enriched (python -m tools.ingest --enrich-existing backfills it)
+    currency CHAR(3),
+    list_price DECIMAL(10, 2),
+    colors TEXT[] NOT NULL DEFAULT '{}',
+    use_cases TEXT[] NOT NULL DEFAULT '{}',
+    styles TEXT[] NOT NULL DEFAULT '{}',
+    -- Position in the catalog change log, set by the shoes_track_change trigger below; snapshot readers fetch rows past theirs
+    change_seq BIGINT NOT NULL DEFAULT nextval('shoes_change_seq'),
+    -- Upsert key for catalog feeds: a product page identifies one sneaker per brand
+    CONSTRAINT uq_shoes_brand_url UNIQUE (brand, url)
+);
+
+-- Composite index backing the collectors' brand/gender/price-range query
+CREATE INDEX idx_shoes_brand_gender_price ON shoes (brand, gender, price);
+
+-- GIN indexes for the collectors' facet pushdown (colors && ARRAY[...] etc.)
+CREATE INDEX idx_shoes_colors ON shoes USING GIN (colors);
+CREATE INDEX idx_shoes_use_cases ON shoes USING GIN (use_cases);
+CREATE INDEX idx_shoes_styles ON shoes USING GIN (styles);
+
+-- Bumped by every catalog ingestion so caches keyed on the catalog version are invalidated
+CREATE TABLE catalog_meta (
+    id INT PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL
 );
+INSERT INTO catalog_meta (id, version) VALUES (1, 0);
+
+-- Change tracking for the serving processes' in-process catalog snapshots (AI/tools/catalog_snapshot.py):
+-- inserts/updates take the next change_seq, deletes leave a tombstone, and every statement that touched
+-- shoes sends a NOTIFY on shoes_catalog at commit so listeners fetch the rows past their snapshot's position
+CREATE INDEX idx_shoes_change_seq ON shoes (change_seq);
+CREATE TABLE shoes_tombstones (
+    id INT PRIMARY KEY,
+    change_seq BIGINT NOT NULL
+);
+
+CREATE FUNCTION shoes_track_change() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO shoes_tombstones (id, change_seq) VALUES (OLD.id, nextval('shoes_change_seq'))
+        ON CONFLICT (id) DO UPDATE SET change_seq = excluded.change_seq;
+        RETURN OLD;
+    END IF;
+    NEW.change_seq := nextval('shoes_change_seq');
+    RETURN NEW;
+END $$;
+CREATE TRIGGER shoes_track_change BEFORE INSERT OR UPDATE OR DELETE ON shoes
+FOR EACH ROW EXECUTE FUNCTION shoes_track_change();
+
+CREATE FUNCTION shoes_notify_change() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('shoes_catalog', 'rows');
+    RETURN NULL;
+END $$;
+CREATE TRIGGER shoes_notify_change AFTER INSERT OR UPDATE OR DELETE ON shoes
+FOR EACH STATEMENT EXECUTE FUNCTION shoes_notify_change();
 
 -- Insert a sample row
-INSERT INTO shoes (brand, name, price, url, gender, description, image_url)
+INSERT INTO shoes (brand, name, price, currency, list_price, url, gender, description, image_url)
 VALUES (
     'Adidas',
     'Adidas Ultraboost Light',
     180.00,
+    'USD',
+    180.00,
     'https://adidas.com/ultraboostlight',
     'male',
     'Experience epic energy with the new Ultraboost Light, our lightest Ultraboost ever.',